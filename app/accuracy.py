@@ -0,0 +1,263 @@
+import os
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.alignment import error_rates
+from app.evaluate import list_audio_files, read_ground_truth
+
+
+# 准确率表存储位置，为空时使用 <voice_data>/.accuracy.sqlite3
+ACCURACY_DB = os.environ.get("ASR_ACCURACY_DB", "")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    filename TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    audio_hash TEXT NOT NULL,
+    gt_hash TEXT,
+    hypothesis TEXT NOT NULL,
+    avg_confidence REAL NOT NULL,
+    processing_time_ms REAL NOT NULL,
+    cer REAL,
+    char_errors INTEGER,
+    ref_chars INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (filename, model_id)
+);
+CREATE INDEX IF NOT EXISTS results_model ON results (model_id);
+"""
+
+_COLUMNS = ("filename", "model_id", "model_version", "audio_hash", "gt_hash", "hypothesis",
+            "avg_confidence", "processing_time_ms", "cer", "char_errors", "ref_chars", "updated_at")
+
+# (audio_path, model_type, content_hash) -> transcribe 结果
+TranscribeFn = Callable[[str, str, Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def gt_hash(ground_truth: Optional[str]) -> Optional[str]:
+    if ground_truth is None:
+        return None
+    return hashlib.sha256(ground_truth.encode("utf-8")).hexdigest()[:16]
+
+
+def _score(hypothesis: str, ground_truth: Optional[str]) -> Dict[str, Any]:
+    if ground_truth is None:
+        return {"gt_hash": None, "cer": None, "char_errors": None, "ref_chars": None}
+    rates = error_rates(ground_truth, hypothesis)
+    return {
+        "gt_hash": gt_hash(ground_truth),
+        "cer": round(rates["cer"] * 100, 2),
+        "char_errors": rates["char_errors"],
+        "ref_chars": rates["ref_chars"],
+    }
+
+
+class AccuracyTable:
+    """
+    按 (文件, 模型) 物化的识别结果与准确率：保存识别文本、平均置信度和 CER，
+    并记录产生该结果的模型版本、音频哈希和标注哈希。
+
+    - 标注变化：只用已保存的识别文本重新计算 CER（rescore），不再推理
+    - 音频或模型权重变化：refresh() 只对受影响的条目重新推理
+    - 排行榜直接由表聚合，不触发任何推理
+    """
+
+    def __init__(self, voice_dir: str, db_path: str = ACCURACY_DB):
+        self.voice_dir = voice_dir
+        self.db_path = db_path or os.path.join(voice_dir, ".accuracy.sqlite3")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    def stop(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---- 写入 ----
+
+    def record(self, filename: str, model_id: str, model_version: str, audio_hash: str,
+               result: Dict[str, Any], ground_truth: Optional[str] = None):
+        """保存一次识别结果并按当前标注评分"""
+        sentences = result.get("sentences", [])
+        hypothesis = result.get("text", "")
+        row = {
+            "filename": filename,
+            "model_id": model_id,
+            "model_version": model_version,
+            "audio_hash": audio_hash,
+            "hypothesis": hypothesis,
+            "avg_confidence": round(sum(s.get("confidence", 0) for s in sentences) / len(sentences), 4)
+            if sentences else 0.0,
+            "processing_time_ms": result.get("processing_time_ms", 0.0),
+            "updated_at": time.time(),
+            **_score(hypothesis, ground_truth),
+        }
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO results ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                [row[c] for c in _COLUMNS])
+
+    def rescore(self, filename: str, ground_truth: Optional[str]) -> int:
+        """标注变化后用已保存的识别文本重新计算该文件所有模型的 CER，返回更新的条目数"""
+        new_hash = gt_hash(ground_truth)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model_id, hypothesis FROM results WHERE filename = ? AND gt_hash IS NOT ?",
+                (filename, new_hash)).fetchall()
+            if not rows:
+                return 0
+            now = time.time()
+            self._conn.execute("BEGIN")
+            try:
+                for model_id, hypothesis in rows:
+                    score = _score(hypothesis, ground_truth)
+                    self._conn.execute(
+                        "UPDATE results SET gt_hash = ?, cer = ?, char_errors = ?, ref_chars = ?, updated_at = ? "
+                        "WHERE filename = ? AND model_id = ?",
+                        (score["gt_hash"], score["cer"], score["char_errors"], score["ref_chars"], now,
+                         filename, model_id))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def prune(self, filenames: set) -> int:
+        """删除 voice_data 中已不存在的文件的条目"""
+        with self._lock:
+            existing = [r[0] for r in self._conn.execute("SELECT DISTINCT filename FROM results")]
+            removed = [f for f in existing if f not in filenames]
+            for filename in removed:
+                self._conn.execute("DELETE FROM results WHERE filename = ?", (filename,))
+        return len(removed)
+
+    # ---- 查询 ----
+
+    def versions(self) -> Dict[tuple, tuple]:
+        """(filename, model_id) -> (model_version, audio_hash, gt_hash)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, model_id, model_version, audio_hash, gt_hash FROM results").fetchall()
+        return {(r[0], r[1]): (r[2], r[3], r[4]) for r in rows}
+
+    def files(self, model_id: Optional[str] = None, limit: int = 100, offset: int = 0,
+              sort: str = "filename") -> Dict[str, Any]:
+        """每个文件、每个模型的结果行；sort 可为 filename 或 cer（CER 从高到低）"""
+        where, args = "", []
+        if model_id:
+            where, args = "WHERE model_id = ?", [model_id]
+        order = "cer IS NULL, cer DESC, filename" if sort == "cer" else "filename, model_id"
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM results {where}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM results {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                args + [limit, offset]).fetchall()
+        return {"total": total, "rows": [dict(zip(_COLUMNS, r)) for r in rows]}
+
+    def leaderboard(self) -> List[Dict[str, Any]]:
+        """按模型聚合：CER = 总错误字数 / 总参考字数，按 CER 从低到高排序"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT model_id, COUNT(*), COUNT(cer), SUM(char_errors), SUM(ref_chars),
+                       AVG(avg_confidence), AVG(processing_time_ms), MAX(updated_at)
+                FROM results GROUP BY model_id
+                """).fetchall()
+        board = [
+            {
+                "model_id": r[0],
+                "files": r[1],
+                "scored_files": r[2],
+                "cer": round(r[3] / r[4] * 100, 2) if r[4] else None,
+                "char_errors": r[3] or 0,
+                "ref_chars": r[4] or 0,
+                "avg_confidence": round(r[5] * 100, 2) if r[5] is not None else None,
+                "avg_processing_time_ms": round(r[6], 2) if r[6] is not None else None,
+                "updated_at": r[7],
+            }
+            for r in rows
+        ]
+        board.sort(key=lambda e: (e["cer"] is None, e["cer"] or 0.0))
+        for rank, entry in enumerate(board, start=1):
+            entry["rank"] = rank
+        return board
+
+
+async def refresh(table: AccuracyTable, service, transcribe: TranscribeFn, models: List[str],
+                  concurrency: int = 2) -> Dict[str, Any]:
+    """
+    把准确率表与 voice_data 当前状态同步：
+    - 缺少条目、音频内容或模型版本变化的 (文件, 模型) 重新推理
+    - 只有标注变化的条目用已保存的识别文本重新评分
+    - 已删除文件的条目被清理
+    """
+    start = time.time()
+    voice_dir = table.voice_dir
+    files = await asyncio.to_thread(list_audio_files, voice_dir)
+    removed = await asyncio.to_thread(table.prune, set(files))
+    stored = await asyncio.to_thread(table.versions)
+    model_ids = {mt: service.registry.resolve(mt) for mt in models}
+    model_versions = {mt: service.model_identity(mt) for mt in models}
+
+    def plan():
+        to_infer, to_rescore, unchanged = [], [], 0
+        for filename in files:
+            path = os.path.join(voice_dir, filename)
+            ground_truth = read_ground_truth(voice_dir, filename)
+            audio_hash = service.content_hash(path)
+            rescore = False
+            for mt in models:
+                current = stored.get((filename, model_ids[mt]))
+                if current is None or current[0] != model_versions[mt] or current[1] != audio_hash:
+                    to_infer.append((filename, mt, audio_hash, ground_truth))
+                elif current[2] != gt_hash(ground_truth):
+                    rescore = True
+                else:
+                    unchanged += 1
+            if rescore:
+                to_rescore.append((filename, ground_truth))
+        return to_infer, to_rescore, unchanged
+
+    to_infer, to_rescore, unchanged = await asyncio.to_thread(plan)
+    rescored = 0
+    for filename, ground_truth in to_rescore:
+        rescored += await asyncio.to_thread(table.rescore, filename, ground_truth)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    failures: List[Dict[str, str]] = []
+
+    async def infer(filename: str, mt: str, audio_hash: str, ground_truth: Optional[str]):
+        async with semaphore:
+            try:
+                result = await transcribe(os.path.join(voice_dir, filename), mt, audio_hash)
+            except Exception as e:
+                failures.append({"filename": filename, "model_id": model_ids[mt], "error": str(e)})
+                return
+            await asyncio.to_thread(table.record, filename, model_ids[mt], model_versions[mt],
+                                    audio_hash, result, ground_truth)
+
+    await asyncio.gather(*[infer(*item) for item in to_infer])
+    return {
+        "files": len(files),
+        "inferred": len(to_infer) - len(failures),
+        "rescored": rescored,
+        "unchanged": unchanged,
+        "removed": removed,
+        "failures": failures,
+        "elapsed_ms": round((time.time() - start) * 1000, 2),
+    }
@@ -0,0 +1,255 @@
+import os
+import re
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# 去掉公共前后缀后任一侧超过该长度时，align 只计算编辑距离，不回溯差异区间（0 表示不限制）
+ALIGN_MAX_LEN = int(os.environ.get("ASR_ALIGN_MAX_LEN", "10000"))
+
+# 小于该规模（|a| * |b|）的子问题直接用完整 DP 回溯
+_BASE_CASE_CELLS = 4096
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+(?:'[A-Za-z0-9]+)*|\S")
+
+
+def tokenize_words(text: str) -> List[str]:
+    """
+    WER 分词：英文/数字按单词，中文等无空格文字按单字，标点丢弃。
+    这样中文转写不会整段被当成一个“词”。
+    """
+    return [tok.lower() for tok in _WORD_RE.findall(text) if tok[0].isalnum()]
+
+
+def normalize_chars(text: str) -> str:
+    """CER 归一化：去掉空白和标点，英文转小写"""
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+def _peq(pattern: Sequence[Hashable]) -> Dict[Hashable, int]:
+    """模式串中每个符号出现位置的位向量"""
+    peq: Dict[Hashable, int] = {}
+    for i, tok in enumerate(pattern):
+        peq[tok] = peq.get(tok, 0) | (1 << i)
+    return peq
+
+
+def _bit_parallel(a: Sequence[Hashable], b: Sequence[Hashable]) -> Tuple[int, int]:
+    """
+    Myers/Hyyrö 位并行编辑距离：以 a 为模式串逐个扫描 b 的符号，
+    返回处理完 b 后 DP 最后一列的纵向差分位向量 (Pv, Mv)。
+    第 i 位为 1 分别表示 D[i+1][n] - D[i][n] 为 +1 / -1。
+    """
+    m = len(a)
+    mask = (1 << m) - 1
+    peq = _peq(a)
+    pv, mv = mask, 0
+    for tok in b:
+        eq = peq.get(tok, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        # 全局编辑距离：第 0 行 D[0][j] = j，每列向下传入 +1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return pv, mv
+
+
+def _bits(value: int, m: int) -> np.ndarray:
+    raw = np.frombuffer(value.to_bytes((m + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:m].astype(np.int64)
+
+
+def _last_column(a: Sequence[Hashable], b: Sequence[Hashable]) -> np.ndarray:
+    """返回 D[i][len(b)]（i = 0..len(a)），即 a[:i] 与 b 的编辑距离"""
+    m, n = len(a), len(b)
+    if m == 0:
+        return np.array([n], dtype=np.int64)
+    if n == 0:
+        return np.arange(m + 1, dtype=np.int64)
+    pv, mv = _bit_parallel(a, b)
+    col = np.empty(m + 1, dtype=np.int64)
+    col[0] = n
+    np.cumsum(_bits(pv, m) - _bits(mv, m), out=col[1:])
+    col[1:] += n
+    return col
+
+
+def _trim(a: Sequence[Hashable], b: Sequence[Hashable]) -> Tuple[int, int]:
+    """公共前缀、后缀长度"""
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[len(a) - 1 - suffix] == b[len(b) - 1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def levenshtein(a: Sequence[Hashable], b: Sequence[Hashable]) -> int:
+    """编辑距离（字符串按字符，列表按元素），线性内存"""
+    prefix, suffix = _trim(a, b)
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    if not a or not b:
+        return max(len(a), len(b))
+    # 以较短序列作为模式串，位向量更短
+    if len(a) > len(b):
+        a, b = b, a
+    return int(_last_column(a, b)[-1])
+
+
+class _OpList:
+    """按游程合并的编辑操作序列"""
+
+    def __init__(self):
+        self.runs: List[List[Any]] = []
+
+    def add(self, op: str, count: int = 1):
+        if count <= 0:
+            return
+        if self.runs and self.runs[-1][0] == op:
+            self.runs[-1][1] += count
+        else:
+            self.runs.append([op, count])
+
+
+def _dp_align(a: Sequence[Hashable], b: Sequence[Hashable], ops: _OpList):
+    """小规模子问题：完整 DP + 回溯"""
+    m, n = len(a), len(b)
+    dp = [list(range(n + 1))]
+    for i in range(1, m + 1):
+        prev = dp[-1]
+        row = [i] + [0] * n
+        ai = a[i - 1]
+        for j in range(1, n + 1):
+            if ai == b[j - 1]:
+                row[j] = prev[j - 1]
+            else:
+                row[j] = 1 + min(prev[j - 1], prev[j], row[j - 1])
+        dp.append(row)
+
+    trace = []
+    i, j = m, n
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and a[i - 1] == b[j - 1] and dp[i][j] == dp[i - 1][j - 1]:
+            trace.append("equal")
+            i, j = i - 1, j - 1
+        elif i > 0 and j > 0 and dp[i][j] == dp[i - 1][j - 1] + 1:
+            trace.append("sub")
+            i, j = i - 1, j - 1
+        elif i > 0 and dp[i][j] == dp[i - 1][j] + 1:
+            trace.append("del")
+            i -= 1
+        else:
+            trace.append("ins")
+            j -= 1
+    for op in reversed(trace):
+        ops.add(op)
+
+
+def _hirschberg(a: Sequence[Hashable], b: Sequence[Hashable], ops: _OpList):
+    """Hirschberg 分治：每层用位并行求中间列，内存随输入线性增长"""
+    prefix, suffix = _trim(a, b)
+    ops.add("equal", prefix)
+    core_a = a[prefix:len(a) - suffix]
+    core_b = b[prefix:len(b) - suffix]
+
+    if not core_a:
+        ops.add("ins", len(core_b))
+    elif not core_b:
+        ops.add("del", len(core_a))
+    elif len(core_a) * len(core_b) <= _BASE_CASE_CELLS or len(core_b) == 1:
+        _dp_align(core_a, core_b, ops)
+    else:
+        mid = len(core_b) // 2
+        forward = _last_column(core_a, core_b[:mid])
+        backward = _last_column(core_a[::-1], core_b[mid:][::-1])
+        split = int(np.argmin(forward + backward[::-1]))
+        _hirschberg(core_a[:split], core_b[:mid], ops)
+        _hirschberg(core_a[split:], core_b[mid:], ops)
+
+    ops.add("equal", suffix)
+
+
+def align(ref: Sequence[Hashable], hyp: Sequence[Hashable], max_len: int = ALIGN_MAX_LEN) -> Dict[str, Any]:
+    """
+    计算 ref -> hyp 的最小编辑距离及对齐操作。
+
+    返回：
+    {
+      "distance": 3,
+      "counts": {"equal": 10, "sub": 1, "ins": 1, "del": 1},
+      "ops": [{"op": "equal" | "sub" | "ins" | "del",
+               "ref_start": 0, "ref_end": 4, "hyp_start": 0, "hyp_end": 4}, ...],
+      "truncated": false
+    }
+    ops 为合并后的区间，便于前端做差异高亮；sub 区间两侧长度相同。
+    去掉公共前后缀后任一侧长于 max_len 时只返回编辑距离：counts 为 None、ops 为空、truncated 为 true。
+    """
+    if max_len > 0:
+        prefix, suffix = _trim(ref, hyp)
+        if max(len(ref), len(hyp)) - prefix - suffix > max_len:
+            return {"distance": levenshtein(ref, hyp), "counts": None, "ops": [], "truncated": True}
+
+    ops = _OpList()
+    _hirschberg(ref, hyp, ops)
+
+    counts = {"equal": 0, "sub": 0, "ins": 0, "del": 0}
+    spans = []
+    i = j = 0
+    for op, count in ops.runs:
+        counts[op] += count
+        di = count if op in ("equal", "sub", "del") else 0
+        dj = count if op in ("equal", "sub", "ins") else 0
+        spans.append({"op": op, "ref_start": i, "ref_end": i + di, "hyp_start": j, "hyp_end": j + dj})
+        i += di
+        j += dj
+    return {
+        "distance": counts["sub"] + counts["ins"] + counts["del"],
+        "counts": counts,
+        "ops": spans,
+        "truncated": False,
+    }
+
+
+def _rate(distance: int, ref_len: int, hyp_len: int) -> float:
+    if ref_len == 0:
+        return 0.0 if hyp_len == 0 else 1.0
+    return distance / ref_len
+
+
+def _same_as_chars(words: List[str], chars: str) -> bool:
+    return len(words) == len(chars) and "".join(words) == chars
+
+
+def error_rates(reference: str, hypothesis: str, raw_distance: Optional[int] = None) -> Dict[str, Any]:
+    """
+    以 reference 为基准计算 CER 与 WER（0-1 之间的比例，可超过 1）。
+    CER 在去掉空白和标点后按字符计算；WER 使用 tokenize_words 分词。
+    raw_distance 为两段原文的编辑距离（如 align 的结果）：归一化不改变文本时直接作为字符编辑距离，不再重算。
+    """
+    ref_chars, hyp_chars = normalize_chars(reference), normalize_chars(hypothesis)
+    ref_words, hyp_words = tokenize_words(reference), tokenize_words(hypothesis)
+    if raw_distance is not None and ref_chars == reference and hyp_chars == hypothesis:
+        char_errors = raw_distance
+    else:
+        char_errors = levenshtein(ref_chars, hyp_chars)
+    # 纯中文等逐字分词时词序列与字符序列相同，WER 的编辑距离直接复用
+    if _same_as_chars(ref_words, ref_chars) and _same_as_chars(hyp_words, hyp_chars):
+        word_errors = char_errors
+    else:
+        word_errors = levenshtein(ref_words, hyp_words)
+    return {
+        "cer": _rate(char_errors, len(ref_chars), len(hyp_chars)),
+        "wer": _rate(word_errors, len(ref_words), len(hyp_words)),
+        "char_errors": char_errors,
+        "ref_chars": len(ref_chars),
+        "word_errors": word_errors,
+        "ref_words": len(ref_words),
+    }
@@ -1,10 +1,43 @@
 import os
 import re
+import json
 import time
-from typing import List, Dict, Any, Optional
-from funasr import AutoModel
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
 
+from app.alignment import align, error_rates, levenshtein
+from app.audio import decode_audio
+from app.backends import BACKEND, MODEL_BACKENDS, create_backend, parse_model_backends
+from app.confidence import align_char_probs, build_sentences_batch, to_prob_array
+from app.feature_store import FeatureStore
+from app.metrics import INFERENCE_LATENCY, INFERENCES, INFERENCES_IN_FLIGHT, stage
+from app.model_registry import (
+    MODELS_DIR, MODEL_MEMORY_BUDGET_MB, ModelLoadError, ModelRegistry, UnknownModelError, model_name_for,
+)
+from app.profiling import profiled
+from app.result_cache import FileHasher, ResultCache, hash_array
+from app.single_flight import Flight, SingleFlight
+from app.worker_pool import WORKER_DEVICE, WorkerPool
+
+
+# generate 返回结构的调试日志采样率（0 关闭）
+DEBUG_SAMPLE_RATE = float(os.environ.get("ASR_DEBUG_SAMPLE_RATE", "0"))
+
+# 音频输入：文件路径，或已解码的 16kHz float32 单声道缓冲区
+AudioInput = Union[str, np.ndarray]
+
+# 标记模型专用 worker 线程：这些线程中不能同步等待排在自己之后的推理
+_thread_state = threading.local()
+
+
+def _mark_model_worker():
+    _thread_state.model_worker = True
+
 
 class ASRService:
     """
@@ -18,41 +51,146 @@ class ASRService:
     def __init__(self,
                  base_model_path: str = "/root/demo_1_confidence/base_model/SenseVoiceSmall",
                  personal_model_path: str = "/root/demo_1_confidence/xu_zhuxi_model/SenseVoiceSmall",
-                 device: str = "cuda:0"):
+                 device: str = "cuda:0",
+                 result_cache: Optional[ResultCache] = None,
+                 preload: bool = True,
+                 models_dir: Optional[str] = MODELS_DIR,
+                 memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB,
+                 worker_processes: int = 0,
+                 feature_store: Optional[FeatureStore] = None,
+                 backend: str = BACKEND,
+                 model_backends: Optional[Dict[str, str]] = None):
+        """
+        preload 为 True 时在构造时加载 base / personal 模型（并行加载）；
+        为 False 时由调用方择机 start_loading()，或在首次请求时按需加载。
+        models_dir 下发现的其他微调模型以目录名作为 model_type，按需加载。
+        worker_processes > 0 时推理交给多进程 WorkerPool（各进程持有自己的模型），
+        本进程不加载模型。
+        feature_store 提供 voice_data 文件的预解码缓冲区，命中时跳过解码。
+        backend 为默认推理后端（torch / onnx），model_backends 按模型 id 或别名覆盖，
+        默认取自 ASR_BACKEND / ASR_MODEL_BACKENDS。
+        """
         self.base_model_path = base_model_path
         self.personal_model_path = personal_model_path
         self.device = device
-        self.model_base = None
-        self.model_personal = None
-        self._load_models()
+        # 可选的识别结果缓存（内存 LRU + 磁盘）
+        self.result_cache = result_cache
+        self.hasher = result_cache.hasher if result_cache else FileHasher()
+        self.feature_store = feature_store
+        # 推理后端：默认后端 + 按模型覆盖（后端实例按名称共享）
+        self.backend = backend
+        self.model_backends = dict(parse_model_backends(MODEL_BACKENDS) if model_backends is None else model_backends)
+        self._backends = {name: create_backend(name, device)
+                          for name in {backend, *self.model_backends.values()}}
+        # 合并进行中的相同推理（同一音频 + 模型 + 参数只推理一次）
+        self.inflight = SingleFlight()
+        # 模型注册表：base / personal 是两个默认模型的别名
+        self.registry = ModelRegistry(self._create_model, models_dir, memory_budget_mb)
+        self.registry.register(base_model_path, aliases=["base"])
+        self.registry.register(personal_model_path, aliases=["personal"])
+        self.default_models = ["base", "personal"]
+        # 每个模型一个专用单线程 worker：同一模型串行推理，不同模型互不阻塞
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
+        self.worker_pool: Optional[WorkerPool] = None
+        if worker_processes > 0:
+            self.worker_pool = WorkerPool({
+                "base_model_path": base_model_path,
+                "personal_model_path": personal_model_path,
+                "device": WORKER_DEVICE,
+                "models_dir": models_dir,
+                "memory_budget_mb": memory_budget_mb,
+            }, processes=worker_processes)
+        self._pool_started = False
+        if preload:
+            self._load_models()
+
+    def parallelism(self) -> int:
+        """同一模型可同时执行的推理数：本进程内为 1，多进程模式为进程数"""
+        return self.worker_pool.size if self.worker_pool else 1
+
+    def executor_for(self, model_type: str) -> ThreadPoolExecutor:
+        """返回指定模型的专用推理 worker（别名与规范 id 共用同一个）"""
+        model_id = self.registry.resolve(model_type)
+        with self._executors_lock:
+            executor = self._executors.get(model_id)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=self.parallelism(),
+                                              thread_name_prefix=f"asr-{model_id}",
+                                              initializer=_mark_model_worker)
+                self._executors[model_id] = executor
+            return executor
+
+    def executor_queue_depths(self) -> Dict[str, int]:
+        """各模型 worker 中排队等待执行的任务数"""
+        with self._executors_lock:
+            return {mt: ex._work_queue.qsize() for mt, ex in self._executors.items()}
+
+    def has_model(self, model_type: str) -> bool:
+        return self.registry.has(model_type)
+
+    def backend_name(self, model_type: str) -> str:
+        """模型使用的推理后端：按 id 或指向它的别名配置，否则为默认后端"""
+        model_id = self.registry.resolve(model_type)
+        if model_id in self.model_backends:
+            return self.model_backends[model_id]
+        for alias, target in self.registry.aliases.items():
+            if target == model_id and alias in self.model_backends:
+                return self.model_backends[alias]
+        return self.backend
+
+    def backend_for(self, model_type: str):
+        return self._backends[self.backend_name(model_type)]
+
+    def _create_model(self, path: str):
+        return self.backend_for(model_name_for(path)).load(path)
+
+    def start_loading(self, model_types: Optional[List[str]] = None) -> List[threading.Thread]:
+        """在后台线程中并行加载模型（默认 base / personal），立即返回；多进程模式下启动 worker 进程"""
+        if self.worker_pool is not None:
+            self._start_pool()
+            return []
+        print("ASRService: loading models in background...")
+        return self.registry.start_loading(model_types or self.default_models)
+
+    def _start_pool(self):
+        with self._executors_lock:
+            if not self._pool_started:
+                self._pool_started = True
+                self.worker_pool.start()
+
+    def close(self):
+        """停止多进程 worker（如有）"""
+        if self.worker_pool is not None and self._pool_started:
+            self.worker_pool.stop()
 
     def _load_models(self):
-        print("ASRService: loading models...")
+        """并行加载默认模型并等待完成"""
         load_start = time.time()
-        
-        # 加载基础模型
-        print(f"  Loading base model from: {self.base_model_path}")
-        self.model_base = AutoModel(
-            model=self.base_model_path,
-            trust_remote_code=False,
-            vad_model=None,
-            vad_kwargs={"max_single_segment_time": 30000},
-            device=self.device,
-        )
-        print(f"  Base model loaded in {time.time() - load_start:.2f}s")
-        
-        # 加载个人专属模型
-        personal_load_start = time.time()
-        print(f"  Loading personal model from: {self.personal_model_path}")
-        self.model_personal = AutoModel(
-            model=self.personal_model_path,
-            trust_remote_code=False,
-            vad_model=None,
-            vad_kwargs={"max_single_segment_time": 30000},
-            device=self.device,
-        )
-        print(f"  Personal model loaded in {time.time() - personal_load_start:.2f}s")
-        print("ASRService: all models loaded successfully!")
+        for thread in self.start_loading():
+            thread.join()
+        # 多进程模式：等待每个 worker 报告加载结果
+        while self.worker_pool is not None and any(
+                s["state"] == "loading" for s in self.load_status().values()):
+            time.sleep(0.1)
+        failed = {mt: s["error"] for mt, s in self.load_status().items() if s["state"] != "ready"}
+        if failed:
+            raise ModelLoadError(f"模型加载失败: {failed}")
+        print(f"ASRService: all models loaded successfully in {time.time() - load_start:.2f}s!")
+
+    def load_status(self) -> Dict[str, Dict[str, Any]]:
+        """默认模型的加载状态与耗时"""
+        if self.worker_pool is not None:
+            return self.worker_pool.load_status(self.default_models)
+        return self.registry.status(self.default_models)
+
+    def is_ready(self, lazy: bool = False) -> bool:
+        """
+        默认模型均已加载过（之后被淘汰的可按需重新加载）；
+        lazy 为 True（首次请求时才加载）时尚未加载的模型也视为就绪，只有加载中或加载失败时未就绪
+        """
+        ready_states = ("ready", "evicted", "pending") if lazy else ("ready", "evicted")
+        return all(s["state"] in ready_states for s in self.load_status().values())
 
     def _postprocess_text(self, text: str) -> str:
         text = rich_transcription_postprocess(text)
@@ -74,238 +212,323 @@ class ASRService:
             sentences.append(parts[-1].strip())
         return sentences if sentences else [text]
 
-    def _avg_conf(self, probs: List[float]) -> float:
-        """
-        更健壮地计算平均置信度。支持元素为数值或字典的情况。
-        字典会尝试按常见字段提取数值：'prob','confidence','score','p','probability'。
-        无法解析的元素会被跳过；若所有元素无法解析则返回 0.0。
-        """
-        if not probs:
-            return 0.0
-        return float(sum(probs) / len(probs))
+    def _model_name(self, model_type: str) -> str:
+        """模型名即注册表中的规范 id（如 base_model、xu_zhuxi_model）"""
+        return self.registry.resolve(model_type)
 
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """
-        计算两个文本的相似度（基于编辑距离）
-        返回 0-1 之间的相似度分数
-        """
-        if not text1 and not text2:
-            return 1.0
-        if not text1 or not text2:
-            return 0.0
-        
-        # 简单的字符级相似度计算
-        set1 = set(text1)
-        set2 = set(text2)
-        
-        if not set1 or not set2:
-            return 0.0
-        
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        
-        return intersection / union if union > 0 else 0.0
+    def _generate_kwargs(self) -> Dict[str, Any]:
+        """funasr generate 的公共推理参数"""
+        return {
+            "language": "auto",
+            "use_itn": True,
+            "batch_size_s": 60,
+            "merge_vad": True,
+            "merge_length_s": 15,
+        }
 
-    def _calculate_wer(self, reference: str, hypothesis: str) -> float:
+    def model_identity(self, model_type: str) -> str:
         """
-        计算 Word Error Rate (WER)
-        简化版本：基于空格分词
+        模型标识：名称 + 路径 + 权重文件签名，权重更新后缓存自动失效；
+        非 torch 后端附带后端名（签名取自该后端的权重文件），不同后端的结果不共用缓存
         """
-        ref_words = reference.split()
-        hyp_words = hypothesis.split()
-        
-        if not ref_words:
-            return 0.0 if not hyp_words else 1.0
-        
-        # 简单的编辑距离计算
-        m, n = len(ref_words), len(hyp_words)
-        dp = [[0] * (n + 1) for _ in range(m + 1)]
-        
-        for i in range(m + 1):
-            dp[i][0] = i
-        for j in range(n + 1):
-            dp[0][j] = j
-            
-        for i in range(1, m + 1):
-            for j in range(1, n + 1):
-                if ref_words[i-1] == hyp_words[j-1]:
-                    dp[i][j] = dp[i-1][j-1]
-                else:
-                    dp[i][j] = 1 + min(dp[i-1][j], dp[i][j-1], dp[i-1][j-1])
-        
-        return dp[m][n] / m if m > 0 else 0.0
+        model_name = self._model_name(model_type)
+        path = self.registry.path_of(model_type)
+        backend = self.backend_for(model_type)
+        try:
+            st = os.stat(backend.weights_file(path))
+            signature = f"{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            signature = "unknown"
+        if backend.name == "torch":
+            return f"{model_name}|{path}|{signature}"
+        return f"{model_name}|{path}|{signature}|{backend.name}"
+
+    def content_hash(self, audio: AudioInput) -> str:
+        """音频内容哈希：文件按字节（带 mtime/size 记忆），缓冲区按采样数据"""
+        if isinstance(audio, str):
+            return self.hasher.hash_file(audio)
+        return hash_array(audio)
+
+    def load_input(self, audio: AudioInput) -> AudioInput:
+        """voice_data 文件在预解码存储中有有效条目时，换成内存映射的 16kHz 缓冲区"""
+        if isinstance(audio, str) and self.feature_store is not None:
+            decoded = self.feature_store.get(audio)
+            if decoded is not None:
+                return decoded
+        return audio
+
+    def decode(self, audio_path: str) -> np.ndarray:
+        """解码为 16kHz 缓冲区，优先使用预解码存储"""
+        decoded = self.load_input(audio_path)
+        return decoded if not isinstance(decoded, str) else decode_audio(audio_path)
+
+    def _cache_keys(self, model_type: str, content_hash: str) -> Tuple[str, str, str]:
+        model_id = self.model_identity(model_type)
+        return model_id, ResultCache.model_key(model_id), ResultCache.entry_key(content_hash, self._generate_kwargs())
 
-    def transcribe(self, audio_path: str, model_type: str = "base") -> Dict[str, Any]:
+    def flight_key(self, audio: AudioInput, model_type: str, content_hash: Optional[str] = None) -> Optional[str]:
+        """single-flight 键（与结果缓存键一致）；未启用或无法确定内容哈希的缓冲区返回 None"""
+        if not self.inflight.enabled:
+            return None
+        if content_hash is None:
+            if not isinstance(audio, str):
+                return None
+            content_hash = self.content_hash(audio)
+        _, model_key, key = self._cache_keys(model_type, content_hash)
+        return f"{model_key}/{key}"
+
+    def run_flight(self, flight: Flight, audio: AudioInput, model_type: str, content_hash: Optional[str] = None):
+        """以 leader 身份执行一次推理，结果或异常交给所有等待者"""
+        self.inflight.start(flight)
+        try:
+            result = self.transcribe_batch([audio], model_type, [content_hash] if content_hash else None)[0]
+        except BaseException as e:
+            self.inflight.finish(flight, error=e)
+        else:
+            self.inflight.finish(flight, result)
+
+    def is_cached(self, content_hash: str, model_type: str) -> bool:
+        if self.result_cache is None:
+            return False
+        _, model_key, key = self._cache_keys(model_type, content_hash)
+        return self.result_cache.contains(model_key, key)
+
+    def transcribe(self, audio_path: AudioInput, model_type: str = "base",
+                   content_hash: Optional[str] = None, use_cache: bool = True,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         对音频文件执行推理，返回结构：
         {
           "text": "...",
           "sentences": [{"text": "...", "confidence": 0.95, "words": [{"text": "...","confidence":0.9}, ...]}, ...],
           "raw_prob": [...],
-          "model_type": "base" | "personal",
+          "model_type": "base" | "personal" | <模型 id>,
           "processing_time_ms": 123.45
         }
         
         Args:
-            audio_path: 音频文件路径
-            model_type: "base" 或 "personal"
+            audio_path: 音频文件路径，或 decode_audio() 得到的 16kHz 缓冲区
+            model_type: "base"、"personal" 或注册表中的模型 id
+            content_hash: 已知的音频内容哈希（可选，省去重复哈希）
+            use_cache: 为 False 时不查询也不写入结果缓存，也不与其他请求合并（如流式识别的中间结果）
+            timeout: 等待结果的超时（秒）；只影响当前调用方
+
+        相同音频 + 模型的推理正在进行时不再重复推理，等待同一结果（结果带 "coalesced": true）。
         """
-        model = self.model_base if model_type == "base" else self.model_personal
-        model_name = "base_model" if model_type == "base" else "xu_zhuxi_model"
-        
-        start_time = time.time()
-        
-        res = model.generate(
-            input=audio_path,
-            cache={},
-            language="auto",
-            use_itn=True,
-            batch_size_s=60,
-            merge_vad=True,
-            merge_length_s=15,
-        )
-        
-        # 调试：打印返回数据结构
-        print(f"[DEBUG] funasr 返回结果类型: {type(res)}")
-        if res:
-            print(f"[DEBUG] 返回结果长度: {len(res)}")
-            if isinstance(res[0], dict):
-                print(f"[DEBUG] 返回字典的键: {list(res[0].keys())}")
-                print(f"[DEBUG] 'prob' 字段类型: {type(res[0].get('prob'))}")
-                print(f"[DEBUG] 'prob' 字段值: {res[0].get('prob')}")
-                if not res[0].get('prob'):
-                    # 尝试打印其他可能包含置信度的字段
-                    for key in res[0].keys():
-                        if key != 'text':
-                            print(f"[DEBUG] 字段 '{key}': {res[0][key]}")
-        
+        key = self.flight_key(audio_path, model_type, content_hash) if use_cache else None
+        if key is None:
+            return self.transcribe_batch(
+                [audio_path], model_type, [content_hash] if content_hash else None, use_cache
+            )[0]
+        # 在模型专用 worker 线程中只等待已开始的推理，否则可能等待排在自己之后的 leader
+        flight, leader = self.inflight.join(key, self._model_name(model_type),
+                                            wait_queued=not getattr(_thread_state, "model_worker", False))
+        if flight is None:
+            return self.transcribe_batch([audio_path], model_type, [content_hash] if content_hash else None)[0]
+        if leader:
+            self.run_flight(flight, audio_path, model_type, content_hash)
+        return self.inflight.wait_sync(flight, leader, timeout)
+
+    @profiled
+    def transcribe_batch(self, audio_paths: List[AudioInput], model_type: str = "base",
+                         content_hashes: Optional[List[Optional[str]]] = None,
+                         use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        对一组音频执行一次 generate 调用（批量推理），按输入顺序返回每条结果。
+        结果结构与 transcribe() 相同；实际推理的结果额外包含 "batch_size"，
+        processing_time_ms 为整个批次 generate 的耗时。
+        启用缓存时先逐条查缓存，只对未命中的输入调用 generate，
+        每条结果的 "cache" 字段给出 hit/tier/lookup_ms。
+        """
+        if not audio_paths:
+            return []
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(audio_paths)
+        lookups: List[Optional[Tuple[str, str, str, Dict[str, Any]]]] = [None] * len(audio_paths)
+        if self.result_cache is not None and use_cache:
+            for i, audio in enumerate(audio_paths):
+                lookup_start = time.time()
+                known_hash = content_hashes[i] if content_hashes else None
+                with stage("cache_lookup"):
+                    model_id, model_key, key = self._cache_keys(model_type, known_hash or self.content_hash(audio))
+                    cached, tier = self.result_cache.get(model_key, key)
+                info = {"hit": cached is not None, "tier": tier,
+                        "lookup_ms": round((time.time() - lookup_start) * 1000, 3)}
+                if cached is not None:
+                    cached["model_type"] = model_type
+                    cached.pop("batch_size", None)
+                    cached["cache"] = info
+                    results[i] = cached
+                else:
+                    lookups[i] = (model_id, model_key, key, info)
+
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            generated = self._generate([audio_paths[i] for i in misses], model_type)
+            for i, result in zip(misses, generated):
+                if lookups[i] is not None:
+                    model_id, model_key, key, info = lookups[i]
+                    self.result_cache.put(model_key, key, result, model_id)
+                    result["cache"] = info
+                results[i] = result
+        return results
+
+    def _generate(self, audio_paths: List[AudioInput], model_type: str) -> List[Dict[str, Any]]:
+        """对输入列表执行一次 model.generate 并整理结果"""
+        model_name = metric_model = self._model_name(model_type)
+        # 缓存键已按原始路径计算，这里只替换送入模型的数据
+        audio_paths = [self.load_input(a) for a in audio_paths]
+        if self.worker_pool is not None:
+            return self._generate_remote(audio_paths, model_type)
+
+        # 占用期间模型不会被注册表淘汰；未常驻时在此按需加载
+        with self.registry.acquire(model_type) as model:
+            start_time = time.time()
+            INFERENCES_IN_FLIGHT.inc(model=metric_model)
+            try:
+                res = model.generate(
+                    input=audio_paths if len(audio_paths) > 1 else audio_paths[0],
+                    cache={},
+                    batch_size=len(audio_paths),
+                    **self._generate_kwargs(),
+                )
+            finally:
+                INFERENCES_IN_FLIGHT.dec(model=metric_model)
+
         processing_time = (time.time() - start_time) * 1000  # 转换为毫秒
-        
-        raw_text = res[0].get("text", "")
-        raw_prob = res[0].get("prob", []) or []
-        text = self._postprocess_text(raw_text)
+        INFERENCE_LATENCY.observe(processing_time / 1000, model=metric_model)
+        INFERENCES.inc(len(audio_paths), model=metric_model)
+
+        # 调试：按采样率输出返回数据结构摘要（不再打印完整 prob 数组）
+        if DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE and res and isinstance(res[0], dict):
+            prob = res[0].get("prob")
+            print("generate_result", json.dumps({
+                "model": model_name,
+                "batch_size": len(audio_paths),
+                "result_count": len(res),
+                "keys": list(res[0].keys()),
+                "text_len": len(res[0].get("text", "")),
+                "prob_type": type(prob).__name__,
+                "prob_len": len(prob) if hasattr(prob, "__len__") else None,
+                "generate_ms": round(processing_time, 2),
+            }, ensure_ascii=False))
+
+        if len(res) != len(audio_paths):
+            raise RuntimeError(
+                f"generate 返回 {len(res)} 条结果，与输入 {len(audio_paths)} 条不一致"
+            )
 
-        # 字符级概率长度可能与 text 不一致，安全处理
+        post_start = time.time()
+        results = self._build_results(res, model_type, model_name, processing_time)
+        postprocess_time = (time.time() - post_start) * 1000
+        for result in results:
+            result["batch_size"] = len(audio_paths)
+            result["timings_ms"] = {
+                "generate": round(processing_time, 2),
+                "postprocess": round(postprocess_time, 2),
+            }
+        return results
+
+    def _generate_remote(self, audio_paths: List[AudioInput], model_type: str) -> List[Dict[str, Any]]:
+        """在 worker 进程中执行 transcribe_batch（不查缓存），缓存仍由本进程负责"""
+        self._start_pool()
+        metric_model = self._model_name(model_type)
+        start_time = time.time()
+        INFERENCES_IN_FLIGHT.inc(model=metric_model)
+        try:
+            results = self.worker_pool.generate(audio_paths, model_type)
+        finally:
+            INFERENCES_IN_FLIGHT.dec(model=metric_model)
+        INFERENCE_LATENCY.observe(time.time() - start_time, model=metric_model)
+        INFERENCES.inc(len(audio_paths), model=metric_model)
+        return results
+
+    def _build_results(self, items: List[Dict[str, Any]], model_type: str, model_name: str,
+                       processing_time: float) -> List[Dict[str, Any]]:
+        """将一批 generate 输出整理为带句/词置信度的结果结构（置信度批量向量化计算）"""
+        metric_model = model_name
+        raw_probs = []
+        texts = []
         char_probs = []
-        # 先将 raw_prob 中可能的 dict 元素转换为数值列表
-        numeric_raw_prob: List[float] = []
-        if raw_prob:
-            # 如果 raw_prob 的元素为 dict 或复杂结构，尝试提取数值
-            converted = []
-            for el in raw_prob:
-                if isinstance(el, (int, float)):
-                    converted.append(float(el))
-                elif isinstance(el, dict):
-                    # 尝试提取常见字段
-                    v = None
-                    for key in ("prob", "confidence", "score", "p", "probability"):
-                        if key in el:
-                            v = el[key]
-                            break
-                    if isinstance(v, (int, float)):
-                        converted.append(float(v))
-                    elif isinstance(v, list):
-                        nums = [float(x) for x in v if isinstance(x, (int, float))]
-                        converted.append(sum(nums) / len(nums) if nums else 0.0)
-                    elif isinstance(v, dict):
-                        found = None
-                        for subkey in ("prob", "confidence", "score", "p", "probability"):
-                            if subkey in v and isinstance(v[subkey], (int, float)):
-                                found = float(v[subkey])
-                                break
-                        converted.append(found if found is not None else 0.0)
-                    else:
-                        converted.append(0.0)
-                else:
-                    try:
-                        converted.append(float(el))
-                    except Exception:
-                        converted.append(0.0)
-
-            # 如果 converted 中全部为 0.0（或长度为0），保留原 raw_prob empty
-            numeric_raw_prob = converted
-
-        if len(numeric_raw_prob) == len(raw_text):
-            # 假设 raw_prob 与 raw_text 对应（最常见）
-            # 把 raw_prob 对齐到处理后 text（简单策略：截断或用最后值填充）
-            if len(text) == len(raw_text):
-                char_probs = numeric_raw_prob
-            else:
-                # 处理长度不等时，尝试按比例映射
-                if numeric_raw_prob:
-                    scale = len(numeric_raw_prob) / max(1, len(text))
-                    for i in range(len(text)):
-                        idx = min(int(i * scale), len(numeric_raw_prob) - 1)
-                        char_probs.append(numeric_raw_prob[idx])
-        else:
-            # fallback: 如果没有 prob 或长度不匹配，使用均值 0.9（保守）
-            if numeric_raw_prob:
-                avg = self._avg_conf(numeric_raw_prob)
-                char_probs = [avg] * len(text)
-            elif raw_prob:
-                # raw_prob 存在但无法解析为数值，尝试从原始结构取平均
-                avg = self._avg_conf(raw_prob)
-                char_probs = [avg] * len(text)
-            else:
-                char_probs = [0.9] * len(text)
+        with stage("postprocess_text", metric_model):
+            for item in items:
+                raw_text = item.get("text", "")
+                raw_prob = item.get("prob", []) or []
+                text = self._postprocess_text(raw_text)
+                # 字符级概率长度可能与 text 不一致，安全处理
+                probs = to_prob_array(raw_prob)
+                char_probs.append(align_char_probs(probs, len(raw_text), len(text)))
+                raw_probs.append(raw_prob)
+                texts.append(text)
 
         # 分句并计算句子与词置信度（按字符平均）
-        sentences = []
-        sent_boundaries = []
-        # 计算每个句子的字符范围（简单按分句函数）
-        sents = self._split_sentences(text)
-        cursor = 0
-        for s in sents:
-            length = len(s)
-            sent_probs = char_probs[cursor:cursor + length] if cursor + length <= len(char_probs) else char_probs[cursor:]
-            sent_conf = self._avg_conf(sent_probs)
-            # 词级（用空白分词）
-            words = []
-            word_cursor = 0
-            for w in s.split():
-                wlen = len(w)
-                w_probs = sent_probs[word_cursor:word_cursor + wlen] if word_cursor + wlen <= len(sent_probs) else sent_probs[word_cursor:]
-                words.append({"text": w, "confidence": round(self._avg_conf(w_probs), 4)})
-                word_cursor += wlen + 1  # +1 for the space removed by split (approx)
-            sentences.append({"text": s, "confidence": round(sent_conf, 4), "words": words})
-            cursor += length
+        with stage("sentences", metric_model):
+            all_sentences = build_sentences_batch(texts, char_probs, self._split_sentences)
 
-        return {
-            "text": text, 
-            "sentences": sentences, 
-            "raw_prob": raw_prob,
-            "model_type": model_type,
-            "model_name": model_name,
-            "processing_time_ms": round(processing_time, 2)
-        }
+        return [
+            {
+                "text": text,
+                "sentences": sentences,
+                "raw_prob": raw_prob,
+                "model_type": model_type,
+                "model_name": model_name,
+                "processing_time_ms": round(processing_time, 2)
+            }
+            for text, sentences, raw_prob in zip(texts, all_sentences, raw_probs)
+        ]
 
-    def compare_models(self, audio_path: str) -> Dict[str, Any]:
+    @profiled
+    def compare_models(self, audio_path: AudioInput, content_hash: Optional[str] = None,
+                       base_type: str = "base", personal_type: str = "personal") -> Dict[str, Any]:
         """
-        同时调用两个模型进行对比
-        返回两个模型的识别结果和统计分析
+        同时调用两个模型进行对比（默认 base 与 personal，可指定任意已注册模型）
+        返回两个模型的识别结果和统计分析；timing 字段给出解码、
+        各模型耗时以及整体墙钟时间
         """
-        # 并行调用两个模型
-        import asyncio
-        
-        async def run_comparison():
-            loop = asyncio.get_running_loop()
-            
-            # 在线程池中并行执行两个模型的推理
-            base_result, personal_result = await asyncio.gather(
-                loop.run_in_executor(None, lambda: self.transcribe(audio_path, "base")),
-                loop.run_in_executor(None, lambda: self.transcribe(audio_path, "personal")),
-            )
-            
-            return base_result, personal_result
-        
-        # 如果在同步环境中执行
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            base_result, personal_result = executor.submit(
-                lambda: (self.transcribe(audio_path, "base"), 
-                         self.transcribe(audio_path, "personal"))
-            ).result()
-        
+        wall_start = time.time()
+
+        audio = audio_path
+        if (self.result_cache is not None or self.inflight.enabled) and content_hash is None \
+                and isinstance(audio_path, str):
+            with stage("hash"):
+                content_hash = self.content_hash(audio_path)
+        hash_time = (time.time() - wall_start) * 1000
+
+        # 只解码一次，两个模型共享同一份 16kHz 缓冲区；两个模型都命中缓存时无需解码
+        all_cached = content_hash is not None and all(
+            self.is_cached(content_hash, mt) for mt in (base_type, personal_type)
+        )
+        if isinstance(audio_path, str) and not all_cached:
+            with stage("decode"):
+                audio = self.decode(audio_path)
+        decode_time = (time.time() - wall_start) * 1000 - hash_time
+
+        inference_start = time.time()
+        done_at: Dict[str, float] = {}
+
+        def start(model_type: str):
+            """提交一个模型的推理；已有相同推理进行中时直接等待其结果"""
+            key = self.flight_key(audio, model_type, content_hash)
+            if key is None:
+                future = self.executor_for(model_type).submit(
+                    self.transcribe_batch, [audio], model_type, [content_hash] if content_hash else None)
+                future.add_done_callback(lambda _: done_at.setdefault(model_type, time.time()))
+                return lambda: future.result()[0]
+            flight, leader = self.inflight.join(key, self._model_name(model_type))
+            if leader:
+                self.executor_for(model_type).submit(self.run_flight, flight, audio, model_type, content_hash)
+            flight.future.add_done_callback(lambda _: done_at.setdefault(model_type, time.time()))
+            return lambda: self.inflight.wait_sync(flight, leader)
+
+        # 两个模型分别在各自的专用 worker 上并行推理
+        base_wait = start(base_type)
+        personal_wait = start(personal_type)
+        base_result = base_wait()
+        personal_result = personal_wait()
+        base_time = (done_at.get(base_type, time.time()) - inference_start) * 1000
+        personal_time = (done_at.get(personal_type, time.time()) - inference_start) * 1000
+        inference_wall_time = (time.time() - wall_start) * 1000 - decode_time - hash_time
+
         # 计算统计分析
         text1 = base_result.get("text", "")
         text2 = personal_result.get("text", "")
@@ -317,27 +540,41 @@ class ASRService:
         avg_base_conf = sum(s.get("confidence", 0) for s in base_conf) / len(base_conf) if base_conf else 0
         avg_personal_conf = sum(s.get("confidence", 0) for s in personal_conf) / len(personal_conf) if personal_conf else 0
         
-        # 计算相似度和 WER
-        similarity = self._calculate_similarity(text1, text2)
-        wer = self._calculate_wer(text1, text2)
-        
-        # 统计差异
-        same_chars = sum(1 for c1, c2 in zip(text1, text2) if c1 == c2)
-        diff_chars = abs(len(text1) - len(text2)) + sum(1 for c1, c2 in zip(text1[:min(len(text1), len(text2))], text2[:min(len(text1), len(text2))]) if c1 != c2)
-        
+        # 字符级对齐：编辑距离、相似度及差异区间（用于前端高亮）
+        with stage("compare_stats"):
+            alignment = align(text1, text2)
+            distance = alignment["distance"]
+            similarity = 1.0 - distance / max(len(text1), len(text2)) if (text1 or text2) else 1.0
+            # 原文无需归一化时 CER/WER 直接复用对齐的编辑距离
+            rates = error_rates(text1, text2, raw_distance=distance)
+
         return {
             "base_model": base_result,
             "personal_model": personal_result,
             "statistics": {
                 "similarity": round(similarity * 100, 2),  # 百分比
-                "wer": round(wer * 100, 2),  # Word Error Rate 百分比
+                "wer": round(rates["wer"] * 100, 2),  # Word Error Rate 百分比
+                "cer": round(rates["cer"] * 100, 2),  # Character Error Rate 百分比
                 "avg_confidence_base": round(avg_base_conf * 100, 2),
                 "avg_confidence_personal": round(avg_personal_conf * 100, 2),
                 "char_count_base": len(text1),
                 "char_count_personal": len(text2),
-                "same_chars": same_chars,
-                "diff_chars": diff_chars,
+                # 文本过长时只计算编辑距离，没有逐项计数
+                "same_chars": alignment["counts"]["equal"] if alignment["counts"] else None,
+                "diff_chars": distance,
+                "edit_counts": alignment["counts"],
                 "total_chars": max(len(text1), len(text2)),
             },
+            # 以 base 结果为 ref、personal 结果为 hyp 的对齐区间（alignment_truncated 时为空）
+            "alignment": alignment["ops"],
+            "alignment_truncated": alignment["truncated"],
+            "timing": {
+                "hash_ms": round(hash_time, 2),
+                "decode_ms": round(decode_time, 2),
+                "base_ms": round(base_time, 2),
+                "personal_ms": round(personal_time, 2),
+                "inference_wall_ms": round(inference_wall_time, 2),
+                "wall_ms": round((time.time() - wall_start) * 1000, 2),
+            },
             "comparison_timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
         }
@@ -0,0 +1,101 @@
+import json
+import shutil
+import subprocess
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+from funasr.utils.load_utils import load_audio_text_image_video
+
+
+# SenseVoice 前端使用的采样率
+SAMPLE_RATE = 16000
+
+# voice_data 中识别的音频扩展名
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".webm", ".flac", ".m4a")
+
+
+def decode_audio(audio_path: str, fs: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    将音频文件解码并重采样为 fs 单声道 float32 数组。
+    返回的数组可直接作为 model.generate 的 input，多个模型共享同一份缓冲区。
+    """
+    data = load_audio_text_image_video(audio_path, fs=fs, audio_fs=fs, data_type="sound")
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    return np.ascontiguousarray(data, dtype=np.float32).reshape(-1)
+
+
+def stream_audio(audio_path: str, fs: int = SAMPLE_RATE, chunk_s: float = 10.0) -> Iterator[np.ndarray]:
+    """
+    逐块解码为 fs 单声道 float32，每块约 chunk_s 秒。
+    有 ffmpeg 时边解码边产出，内存占用与文件长度无关；
+    否则退化为 decode_audio 整体解码后分块。
+    """
+    chunk_samples = max(1, int(fs * chunk_s))
+    if shutil.which("ffmpeg") is None:
+        data = decode_audio(audio_path, fs)
+        for start in range(0, len(data), chunk_samples):
+            yield data[start:start + chunk_samples]
+        return
+
+    proc = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", audio_path,
+         "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(fs), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    finished = False
+    try:
+        produced = 0
+        while True:
+            data = proc.stdout.read(chunk_samples * 4)
+            if not data:
+                break
+            samples = np.frombuffer(data[: len(data) // 4 * 4], dtype="<f4")
+            produced += len(samples)
+            yield samples
+        finished = True
+    finally:
+        if not finished:
+            # 调用方提前结束迭代
+            proc.kill()
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", "replace").strip()
+        proc.stderr.close()
+        proc.wait()
+    if proc.returncode != 0 and produced == 0:
+        raise RuntimeError(f"ffmpeg 解码失败: {stderr or proc.returncode}")
+
+
+def probe_info(audio_path: str) -> Dict[str, Any]:
+    """
+    读取音频头信息：时长（秒）、采样率、声道数，不解码全部数据。
+    优先使用 soundfile，其次 ffprobe；无法获取的字段为 None。
+    """
+    try:
+        import soundfile
+        info = soundfile.info(audio_path)
+        return {"duration": float(info.duration), "sample_rate": int(info.samplerate),
+                "channels": int(info.channels)}
+    except Exception:
+        pass
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "format=duration:stream=sample_rate,channels", "-of", "json", audio_path],
+            capture_output=True, timeout=10, check=True,
+        ).stdout
+        data = json.loads(out)
+        stream = (data.get("streams") or [{}])[0]
+        duration = data.get("format", {}).get("duration")
+        return {
+            "duration": float(duration) if duration is not None else None,
+            "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+            "channels": int(stream["channels"]) if stream.get("channels") else None,
+        }
+    except Exception:
+        return {"duration": None, "sample_rate": None, "channels": None}
+
+
+def probe_duration(audio_path: str) -> Optional[float]:
+    """读取音频时长（秒），无法获取时返回 None"""
+    return probe_info(audio_path)["duration"]
@@ -0,0 +1,219 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from funasr import AutoModel
+
+from app.audio import decode_audio
+
+try:
+    import onnxruntime as ort
+except ImportError:  # 可选依赖：未安装时不提供 onnx 后端
+    ort = None
+
+
+# 默认推理后端：torch（funasr AutoModel）或 onnx（ONNX Runtime，CPU）
+BACKEND = os.environ.get("ASR_BACKEND", "torch")
+# 按模型指定后端，如 "base=onnx,personal=torch"（键为模型 id 或别名）
+MODEL_BACKENDS = os.environ.get("ASR_MODEL_BACKENDS", "")
+# torch 后端的 intra-op 线程数，0 表示保持 torch 默认
+TORCH_THREADS = int(os.environ.get("ASR_TORCH_THREADS", "0"))
+# onnx 后端的线程设置与是否使用 int8 量化模型
+ONNX_INTRA_THREADS = int(os.environ.get("ASR_ONNX_INTRA_THREADS", "4"))
+ONNX_INTER_THREADS = int(os.environ.get("ASR_ONNX_INTER_THREADS", "1"))
+ONNX_QUANTIZED = os.environ.get("ASR_ONNX_QUANTIZED", "1") != "0"
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANT_MODEL_FILE = "model_quant.onnx"
+
+# SenseVoice 的语言与文本规整查询 id（与 funasr 的 SenseVoiceSmall 一致）
+_LANGUAGE_IDS = {"auto": 0, "zh": 3, "en": 4, "yue": 7, "ja": 11, "ko": 12, "nospeech": 13}
+_TEXTNORM_IDS = {"withitn": 14, "woitn": 15}
+_BLANK_ID = 0
+
+
+def parse_model_backends(spec: str) -> Dict[str, str]:
+    """解析 "base=onnx,personal=torch" 形式的按模型后端配置"""
+    backends = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        model_id, sep, backend = part.partition("=")
+        if not sep or not model_id.strip() or not backend.strip():
+            raise ValueError(f"无效的后端配置: {part!r}（应为 模型=后端）")
+        backends[model_id.strip()] = backend.strip()
+    return backends
+
+
+class TorchBackend:
+    """funasr AutoModel + PyTorch（默认后端）"""
+
+    name = "torch"
+    _threads_lock = threading.Lock()
+    _threads_set = False
+
+    def __init__(self, device: str = "cuda:0", threads: int = TORCH_THREADS):
+        self.device = device
+        self.threads = threads
+
+    def weights_file(self, path: str) -> str:
+        return os.path.join(path, "model.pt")
+
+    def _set_threads(self):
+        if self.threads <= 0:
+            return
+        with TorchBackend._threads_lock:
+            if TorchBackend._threads_set:
+                return
+            TorchBackend._threads_set = True
+        import torch
+        torch.set_num_threads(self.threads)
+
+    def load(self, path: str):
+        self._set_threads()
+        return AutoModel(
+            model=path,
+            trust_remote_code=False,
+            vad_model=None,
+            vad_kwargs={"max_single_segment_time": 30000},
+            device=self.device,
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {"device": self.device, "threads": self.threads or None}
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime（CPU）后端：加载 app.export_onnx 导出到检查点目录中的
+    model_quant.onnx（int8）或 model.onnx，特征提取使用 funasr_onnx 的 WavFrontend，
+    解码为 CTC 贪心解码，逐字概率取每个 token 的 softmax 最大值。
+    """
+
+    name = "onnx"
+
+    def __init__(self, quantized: bool = ONNX_QUANTIZED, intra_threads: int = ONNX_INTRA_THREADS,
+                 inter_threads: int = ONNX_INTER_THREADS):
+        self.quantized = quantized
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+
+    def weights_file(self, path: str) -> str:
+        return os.path.join(path, ONNX_QUANT_MODEL_FILE if self.quantized else ONNX_MODEL_FILE)
+
+    def load(self, path: str):
+        if ort is None:
+            raise RuntimeError("未安装 onnxruntime，无法使用 onnx 后端")
+        model_file = self.weights_file(path)
+        if not os.path.isfile(model_file):
+            raise RuntimeError(f"{model_file} 不存在，请先运行 python -m app.export_onnx 导出")
+        return OnnxSenseVoice(path, model_file, self.intra_threads, self.inter_threads)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"quantized": self.quantized, "intra_threads": self.intra_threads,
+                "inter_threads": self.inter_threads}
+
+
+BACKENDS = {"torch": TorchBackend, "onnx": OnnxBackend}
+
+
+def create_backend(name: str, device: str = "cuda:0"):
+    if name not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {name}（可选 {', '.join(BACKENDS)}）")
+    return TorchBackend(device) if name == "torch" else BACKENDS[name]()
+
+
+def _token_char_probs(pieces: List[str], probs: List[float], text_len: int) -> List[float]:
+    """按每个 token 解码出的字符数展开 token 概率，并对齐到解码文本长度"""
+    expanded: List[float] = []
+    for piece, prob in zip(pieces, probs):
+        expanded.extend([prob] * len(piece))
+    if len(expanded) == text_len or not expanded:
+        return expanded
+    idx = np.minimum((np.arange(text_len) * len(expanded) / max(1, text_len)).astype(np.int64),
+                     len(expanded) - 1)
+    return [expanded[i] for i in idx]
+
+
+def ctc_greedy(logits: np.ndarray) -> Tuple[List[int], List[float]]:
+    """CTC 贪心解码：合并连续重复、去掉 blank；每个 token 的概率取其所在连续帧中的最大 softmax 值"""
+    if len(logits) == 0:
+        return [], []
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    probs = exp / exp.sum(axis=-1, keepdims=True)
+    ids = probs.argmax(axis=-1)
+    best = probs[np.arange(len(ids)), ids]
+    tokens: List[int] = []
+    token_probs: List[float] = []
+    prev = -1
+    for token, prob in zip(ids.tolist(), best.tolist()):
+        if token != prev and token != _BLANK_ID:
+            tokens.append(token)
+            token_probs.append(prob)
+        elif token == prev and token != _BLANK_ID:
+            token_probs[-1] = max(token_probs[-1], prob)
+        prev = token
+    return tokens, token_probs
+
+
+class OnnxSenseVoice:
+    """与 funasr AutoModel.generate 返回结构相同（key / text / prob）的 ONNX Runtime 推理"""
+
+    def __init__(self, model_dir: str, model_file: str, intra_threads: int, inter_threads: int):
+        import yaml
+        import sentencepiece
+        from funasr_onnx.utils.frontend import WavFrontend
+
+        with open(os.path.join(model_dir, "config.yaml"), "r", encoding="utf-8") as fh:
+            config = yaml.safe_load(fh)
+        frontend_conf = dict(config.get("frontend_conf") or {})
+        # 推理时不加抖动，保证同一音频结果确定
+        frontend_conf["dither"] = 0.0
+        self.frontend = WavFrontend(cmvn_file=os.path.join(model_dir, "am.mvn"), **frontend_conf)
+        bpemodel = os.path.basename((config.get("tokenizer_conf") or {}).get(
+            "bpemodel", "chn_jpn_yue_eng_ko_spectok.bpe.model"))
+        self.tokenizer = sentencepiece.SentencePieceProcessor()
+        self.tokenizer.Load(os.path.join(model_dir, bpemodel))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_threads
+        options.inter_op_num_threads = inter_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.model_file = model_file
+
+    def _features(self, audio: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        feats, lengths = [], []
+        for waveform in audio:
+            feat, _ = self.frontend.fbank(waveform)
+            feat, feat_len = self.frontend.lfr_cmvn(feat)
+            feats.append(feat)
+            lengths.append(int(feat_len))
+        batch = np.zeros((len(feats), max(lengths), feats[0].shape[1]), dtype=np.float32)
+        for i, feat in enumerate(feats):
+            batch[i, :len(feat)] = feat
+        return batch, np.asarray(lengths, dtype=np.int32)
+
+    def generate(self, input: Any, cache: Optional[Dict] = None, batch_size: int = 1,
+                 language: str = "auto", use_itn: bool = True, **kwargs) -> List[Dict[str, Any]]:
+        inputs = input if isinstance(input, list) else [input]
+        audio = [decode_audio(x) if isinstance(x, str) else np.asarray(x, dtype=np.float32) for x in inputs]
+        feats, lengths = self._features(audio)
+        n = len(audio)
+        language_ids = np.full(n, _LANGUAGE_IDS.get(language, 0), dtype=np.int32)
+        textnorm_ids = np.full(n, _TEXTNORM_IDS["withitn" if use_itn else "woitn"], dtype=np.int32)
+        ctc_logits, out_lens = self.session.run(
+            None, dict(zip(self.input_names, (feats, lengths, language_ids, textnorm_ids))))[:2]
+
+        results = []
+        for i in range(n):
+            tokens, token_probs = ctc_greedy(ctc_logits[i, :int(out_lens[i])])
+            text = self.tokenizer.DecodeIds(tokens)
+            pieces = [self.tokenizer.IdToPiece(t).replace("▁", " ") for t in tokens]
+            prob = _token_char_probs(pieces, token_probs, len(text))
+            results.append({"key": f"item{i}", "text": text, "prob": [round(p, 4) for p in prob]})
+        return results
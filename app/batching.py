@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.asr_service import ASRService
+from app.single_flight import Flight
+
+
+# 批处理参数，可通过环境变量调整
+BATCH_MAX_SIZE = int(os.environ.get("ASR_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("ASR_BATCH_MAX_WAIT_MS", "10"))
+
+
+class _ModelQueue:
+    """单个模型的请求队列、工作协程及统计信息"""
+
+    def __init__(self, model_type: str):
+        self.model_type = model_type
+        self.queue: "asyncio.Queue[Tuple[str, Optional[str], Flight, float]]" = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+        self.running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+        self.failed_batches = 0
+        self.max_queue_depth = 0
+        self.batch_size_hist: Dict[int, int] = {}
+        # 最近请求的排队等待时间（毫秒），用于估算 p50/p99
+        self.recent_wait_ms: Deque[float] = deque(maxlen=1000)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.recent_wait_ms)
+
+        def pct(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 2)
+
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "batch_size_hist": {str(k): v for k, v in sorted(self.batch_size_hist.items())},
+            "queue_wait_ms": {"p50": pct(0.5), "p99": pct(0.99)},
+        }
+
+
+class BatchScheduler:
+    """
+    动态微批处理调度器：位于 ASRService.transcribe 之前。
+
+    每个模型维护一个队列，工作协程取出首个请求后，在 max_wait_ms 窗口内
+    继续收集请求，直到达到 max_batch_size，然后通过一次 transcribe_batch
+    （即一次 model.generate）完成整批推理，并将结果逐一返回给各调用方。
+    同一模型同时执行的批次数为 service.parallelism()。
+
+    提交时若相同音频 + 模型的推理已在排队或进行中（service.inflight），
+    不再入队而是等待同一结果。
+    """
+
+    def __init__(self, service: ASRService,
+                 max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.service = service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queues: Dict[str, _ModelQueue] = {}
+
+    def _get_queue(self, model_type: str) -> _ModelQueue:
+        # 按规范 id 建队列：别名（如 "base"）与 id 共用同一队列、同批推理、同一份统计
+        model_id = self.service.registry.resolve(model_type)
+        mq = self._queues.get(model_id)
+        if mq is None:
+            mq = _ModelQueue(model_id)
+            self._queues[model_id] = mq
+        if mq.worker is None or mq.worker.done():
+            mq.worker = asyncio.get_running_loop().create_task(self._worker(mq))
+        return mq
+
+    async def submit(self, audio_path: str, model_type: str = "base",
+                     content_hash: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        提交一个识别请求并等待其所在批次完成；content_hash 为已知的音频内容哈希。
+        timeout（秒）和取消只影响当前调用方，合并到同一推理的其他调用方不受影响
+        """
+        inflight = self.service.inflight
+        key = await asyncio.to_thread(self.service.flight_key, audio_path, model_type, content_hash)
+        if key is None:
+            flight, leader = Flight("", model_type), True
+        else:
+            flight, leader = inflight.join(key, self.service._model_name(model_type))
+        if leader:
+            mq = self._get_queue(model_type)
+            await mq.queue.put((audio_path, content_hash, flight, time.time()))
+            mq.max_queue_depth = max(mq.max_queue_depth, mq.queue.qsize())
+        result = await inflight.wait(flight, leader, timeout)
+        # 队列以规范 id 推理，结果中的 model_type 保持调用方请求的名称
+        result["model_type"] = model_type
+        return result
+
+    async def _collect(self, mq: _ModelQueue) -> List[Tuple[str, Optional[str], Flight, float]]:
+        batch = [await mq.queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # 窗口已到，仅取走已排队的请求
+                while len(batch) < self.max_batch_size and not mq.queue.empty():
+                    batch.append(mq.queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(mq.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self, mq: _ModelQueue):
+        loop = asyncio.get_running_loop()
+        # 与 compare 共用模型的专用 worker，保证同一模型不会并发 generate
+        executor = self.service.executor_for(mq.model_type)
+        # 多进程推理时同一模型可同时执行多个批次；单进程时为 1，取批与推理交替进行
+        slots = asyncio.Semaphore(self.service.parallelism())
+        while True:
+            await slots.acquire()
+            batch = await self._collect(mq)
+            # 所有调用方都已取消或超时的请求不再参与推理
+            inflight = self.service.inflight
+            batch = [item for item in batch
+                     if not inflight.abandon_if_unwaited(item[2]) and not item[2].future.done()]
+            if not batch:
+                slots.release()
+                continue
+
+            now = time.time()
+            for _, _, _, enqueued_at in batch:
+                mq.recent_wait_ms.append((now - enqueued_at) * 1000)
+            mq.batches += 1
+            mq.requests += len(batch)
+            mq.batch_size_hist[len(batch)] = mq.batch_size_hist.get(len(batch), 0) + 1
+
+            task = loop.create_task(self._run_batch(mq, executor, batch))
+            mq.running.add(task)
+            task.add_done_callback(mq.running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run_batch(self, mq: _ModelQueue, executor,
+                         batch: List[Tuple[str, Optional[str], Flight, float]]):
+        loop = asyncio.get_running_loop()
+        inflight = self.service.inflight
+        paths = [item[0] for item in batch]
+        hashes = [item[1] for item in batch]
+        for item in batch:
+            inflight.start(item[2])
+        try:
+            results = await loop.run_in_executor(
+                executor, self.service.transcribe_batch, paths, mq.model_type, hashes
+            )
+        except Exception as e:
+            mq.failed_batches += 1
+            if len(batch) == 1:
+                inflight.finish(batch[0][2], error=e)
+                return
+            # 整批失败时逐条重试，避免单个损坏文件拖垮同批的其他请求
+            for path, content_hash, flight, _ in batch:
+                try:
+                    result = await loop.run_in_executor(
+                        executor, self.service.transcribe_batch, [path], mq.model_type,
+                        [content_hash] if content_hash else None
+                    )
+                except Exception as item_error:
+                    inflight.finish(flight, error=item_error)
+                else:
+                    inflight.finish(flight, result[0])
+            return
+
+        for (_, _, flight, _), result in zip(batch, results):
+            inflight.finish(flight, result)
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {name: mq.queue.qsize() for name, mq in self._queues.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各模型的队列深度与批大小统计"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "single_flight": self.service.inflight.stats(),
+            "models": {name: mq.stats() for name, mq in self._queues.items()},
+        }
@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.asr_service import ASRService
+from app.audio import SAMPLE_RATE
+from app.long_audio import LONG_AUDIO_BATCH_SEGMENTS, _avg_confidence, _join_texts
+from app.metrics import Counter, REGISTRY
+from app.vad import VAD_MAX_SEGMENT_MS, SpeechSegmenter
+
+
+# 级联识别参数，可通过环境变量调整
+CASCADE_PRIMARY = os.environ.get("ASR_CASCADE_PRIMARY", "personal")
+CASCADE_FALLBACK = os.environ.get("ASR_CASCADE_FALLBACK", "base")
+# 首选模型片段置信度低于该值时交给第二个模型
+CASCADE_THRESHOLD = float(os.environ.get("ASR_CASCADE_THRESHOLD", "0.85"))
+
+CASCADE_SEGMENTS = REGISTRY.register(Counter(
+    "asr_cascade_segments_total", "Cascade segments by outcome (accepted / escalated / replaced)", ("outcome",)))
+CASCADE_AUDIO_SECONDS = REGISTRY.register(Counter(
+    "asr_cascade_audio_seconds_total", "Audio seconds recognised by each cascade stage", ("stage",)))
+
+# 首选模型片段置信度直方图的分桶宽度，用于估算不同阈值下的升级比例
+_HIST_STEP = 0.05
+
+
+class CascadeStats:
+    """级联识别累计统计：升级比例，以及首选模型片段置信度分布（估算其他阈值的升级比例）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.segments = 0
+        self.escalated = 0
+        self.replaced = 0
+        self.primary_audio_ms = 0
+        self.fallback_audio_ms = 0
+        self.confidence_hist = [0] * int(round(1 / _HIST_STEP))
+
+    def add(self, segments: List[Dict[str, Any]]):
+        with self._lock:
+            self.requests += 1
+            for seg in segments:
+                duration = seg["end_ms"] - seg["start_ms"]
+                self.segments += 1
+                self.primary_audio_ms += duration
+                bucket = min(len(self.confidence_hist) - 1, int(seg["primary_confidence"] / _HIST_STEP))
+                self.confidence_hist[bucket] += 1
+                if seg["escalated"]:
+                    self.escalated += 1
+                    self.fallback_audio_ms += duration
+                if seg["model_type"] != seg["primary_type"]:
+                    self.replaced += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            below = 0
+            rates = {}
+            for i, count in enumerate(self.confidence_hist):
+                below += count
+                threshold = round((i + 1) * _HIST_STEP, 2)
+                rates[f"{threshold:.2f}"] = round(below / self.segments, 4) if self.segments else None
+            return {
+                "default_threshold": CASCADE_THRESHOLD,
+                "requests": self.requests,
+                "segments": self.segments,
+                "escalated": self.escalated,
+                "replaced": self.replaced,
+                "escalation_rate": round(self.escalated / self.segments, 4) if self.segments else None,
+                "replacement_rate": round(self.replaced / self.escalated, 4) if self.escalated else None,
+                # 第二个模型额外处理的音频占比，即相对只跑首选模型的额外推理开销
+                "extra_compute_ratio": round(self.fallback_audio_ms / self.primary_audio_ms, 4)
+                if self.primary_audio_ms else None,
+                # 首选模型片段置信度低于各阈值的比例（即该阈值下的预计升级比例）
+                "escalation_rate_by_threshold": rates,
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+async def _run(service: ASRService, model_type: str, audios: List[np.ndarray],
+               batch_segments: int) -> List[Dict[str, Any]]:
+    """在模型专用 worker 上按批推理一组片段；片段不写入结果缓存（与长音频模式相同）"""
+    loop = asyncio.get_running_loop()
+    executor = service.executor_for(model_type)
+    results: List[Dict[str, Any]] = []
+    for i in range(0, len(audios), batch_segments):
+        results.extend(await loop.run_in_executor(
+            executor, service.transcribe_batch, audios[i:i + batch_segments], model_type, None, False
+        ))
+    return results
+
+
+async def transcribe_cascade(service: ASRService, audio_path: str,
+                             primary: str = CASCADE_PRIMARY, fallback: str = CASCADE_FALLBACK,
+                             threshold: float = CASCADE_THRESHOLD,
+                             batch_segments: int = LONG_AUDIO_BATCH_SEGMENTS) -> Dict[str, Any]:
+    """
+    置信度门控的级联识别：VAD 切分后先用 primary 识别全部片段，
+    只把平均置信度低于 threshold 的片段交给 fallback，每个片段取置信度较高的结果。
+
+    funasr 的句子不带时间戳，升级以 VAD 片段为单位（片段不超过 VAD_MAX_SEGMENT_MS）；
+    返回结构与 transcribe 相同（text / sentences），每个句子和片段标明产生它的模型，
+    cascade 字段给出阈值、升级与替换数量及各阶段耗时。
+    """
+    start_time = time.time()
+    batch_segments = max(1, batch_segments)
+    audio = await asyncio.to_thread(service.decode, audio_path)
+    segmenter = SpeechSegmenter(max_segment_ms=VAD_MAX_SEGMENT_MS)
+    audio = np.asarray(audio, dtype=np.float32)
+    segments = segmenter.feed(audio) + segmenter.flush()
+    if not segments and len(audio):
+        # VAD 未检出语音（如整体音量低于阈值）：整段交给首选模型，而不是直接返回空结果
+        segments = [{"start_ms": 0, "end_ms": round(len(audio) / SAMPLE_RATE * 1000), "audio": audio}]
+
+    primary_start = time.time()
+    primary_results = await _run(service, primary, [s["audio"] for s in segments], batch_segments)
+    primary_ms = (time.time() - primary_start) * 1000
+
+    low = [i for i, r in enumerate(primary_results) if _avg_confidence(r.get("sentences", [])) < threshold]
+    fallback_results: Dict[int, Dict[str, Any]] = {}
+    fallback_ms = 0.0
+    if low and fallback != primary:
+        fallback_start = time.time()
+        outputs = await _run(service, fallback, [segments[i]["audio"] for i in low], batch_segments)
+        fallback_ms = (time.time() - fallback_start) * 1000
+        fallback_results = dict(zip(low, outputs))
+
+    segments_out: List[Dict[str, Any]] = []
+    sentences_out: List[Dict[str, Any]] = []
+    for i, (segment, result) in enumerate(zip(segments, primary_results)):
+        primary_conf = _avg_confidence(result.get("sentences", []))
+        chosen, chosen_type, chosen_conf = result, primary, primary_conf
+        fallback_conf = None
+        if i in fallback_results:
+            fallback_conf = _avg_confidence(fallback_results[i].get("sentences", []))
+            if fallback_conf > primary_conf:
+                chosen, chosen_type, chosen_conf = fallback_results[i], fallback, fallback_conf
+        model_name = chosen.get("model_name")
+        segments_out.append({
+            "index": i,
+            "start_ms": segment["start_ms"],
+            "end_ms": segment["end_ms"],
+            "text": chosen.get("text", ""),
+            "confidence": chosen_conf,
+            "model_type": chosen_type,
+            "model_name": model_name,
+            "primary_type": primary,
+            "primary_confidence": primary_conf,
+            "fallback_confidence": fallback_conf,
+            "escalated": i in fallback_results,
+        })
+        for sentence in chosen.get("sentences", []):
+            sentences_out.append({**sentence, "segment": i, "model_type": chosen_type, "model_name": model_name,
+                                  "start_ms": segment["start_ms"], "end_ms": segment["end_ms"]})
+
+    escalated = len(fallback_results)
+    replaced = sum(1 for s in segments_out if s["model_type"] != primary)
+    for s in segments_out:
+        outcome = "accepted" if not s["escalated"] else ("replaced" if s["model_type"] != primary else "escalated")
+        CASCADE_SEGMENTS.inc(outcome=outcome)
+        CASCADE_AUDIO_SECONDS.inc((s["end_ms"] - s["start_ms"]) / 1000, stage="primary")
+        if s["escalated"]:
+            CASCADE_AUDIO_SECONDS.inc((s["end_ms"] - s["start_ms"]) / 1000, stage="fallback")
+    cascade_stats.add(segments_out)
+
+    total_ms = sum(s["end_ms"] - s["start_ms"] for s in segments_out)
+    escalated_ms = sum(s["end_ms"] - s["start_ms"] for s in segments_out if s["escalated"])
+    return {
+        "text": _join_texts([s["text"] for s in segments_out]),
+        "sentences": sentences_out,
+        "segments": segments_out,
+        "confidence": round(sum(s["confidence"] * (s["end_ms"] - s["start_ms"]) for s in segments_out) / total_ms, 4)
+        if total_ms else 0.0,
+        "cascade": {
+            "primary": primary,
+            "fallback": fallback,
+            "threshold": threshold,
+            "segments": len(segments_out),
+            "escalated": escalated,
+            "replaced": replaced,
+            "escalation_rate": round(escalated / len(segments_out), 4) if segments_out else 0.0,
+            "escalated_audio_ms": escalated_ms,
+            "audio_ms": total_ms,
+            "primary_ms": round(primary_ms, 2),
+            "fallback_ms": round(fallback_ms, 2),
+        },
+        "processing_time_ms": round((time.time() - start_time) * 1000, 2),
+    }
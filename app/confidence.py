@@ -0,0 +1,138 @@
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+# dict 元素中可能携带概率值的字段，按优先级排列
+_PROB_KEYS = ("prob", "confidence", "score", "p", "probability")
+
+# 无可用概率时的保守默认置信度
+DEFAULT_CONFIDENCE = 0.9
+
+
+def _element_prob(el: Any) -> float:
+    """将 raw_prob 中的单个复杂元素（dict 等）解析为数值，无法解析时为 0.0"""
+    if isinstance(el, (int, float)):
+        return float(el)
+    if isinstance(el, dict):
+        v = None
+        for key in _PROB_KEYS:
+            if key in el:
+                v = el[key]
+                break
+        if isinstance(v, (int, float)):
+            return float(v)
+        if isinstance(v, list):
+            nums = [float(x) for x in v if isinstance(x, (int, float))]
+            return sum(nums) / len(nums) if nums else 0.0
+        if isinstance(v, dict):
+            for subkey in _PROB_KEYS:
+                if subkey in v and isinstance(v[subkey], (int, float)):
+                    return float(v[subkey])
+        return 0.0
+    try:
+        return float(el)
+    except Exception:
+        return 0.0
+
+
+def to_prob_array(raw_prob: Sequence[Any]) -> np.ndarray:
+    """
+    将 funasr 返回的 raw_prob 一次性转换为 float64 数组。
+    纯数值列表直接走 NumPy 转换；含 dict 等复杂元素时才逐元素解析。
+    """
+    if len(raw_prob) == 0:
+        return np.zeros(0, dtype=np.float64)
+    try:
+        arr = np.asarray(raw_prob, dtype=np.float64)
+        # NumPy 会把 None 转成 NaN，此时交给逐元素解析（None 计为 0.0）
+        if arr.ndim == 1 and not np.isnan(arr).any():
+            return arr
+    except (TypeError, ValueError):
+        pass
+    return np.fromiter((_element_prob(el) for el in raw_prob), dtype=np.float64, count=len(raw_prob))
+
+
+def align_char_probs(probs: np.ndarray, raw_text_len: int, text_len: int) -> np.ndarray:
+    """
+    把 raw_prob 对齐到后处理后的 text：
+    - 长度与原始文本一致：等长时直接使用，否则按比例映射
+    - 否则：有概率时用均值填充，没有时用默认置信度填充
+    """
+    if len(probs) == raw_text_len:
+        if text_len == raw_text_len:
+            return probs
+        if len(probs) == 0:
+            return probs
+        scale = len(probs) / max(1, text_len)
+        idx = np.minimum((np.arange(text_len) * scale).astype(np.int64), len(probs) - 1)
+        return probs[idx]
+    if len(probs):
+        # 与逐元素求和的均值保持一致
+        return np.full(text_len, sum(probs.tolist()) / len(probs), dtype=np.float64)
+    return np.full(text_len, DEFAULT_CONFIDENCE, dtype=np.float64)
+
+
+def _range_means(prefix: np.ndarray, starts: List[int], ends: List[int]) -> np.ndarray:
+    """基于前缀和一次性计算所有 [start, end) 区间的均值，空区间为 0.0"""
+    a = np.asarray(starts, dtype=np.int64)
+    b = np.asarray(ends, dtype=np.int64)
+    lengths = b - a
+    sums = prefix[b] - prefix[a]
+    return np.divide(sums, lengths, out=np.zeros(len(a), dtype=np.float64), where=lengths > 0)
+
+
+def build_sentences_batch(texts: List[str], char_probs: List[np.ndarray],
+                          split_sentences: Callable[[str], List[str]]) -> List[List[Dict[str, Any]]]:
+    """
+    批量计算多条结果的句级和词级置信度。
+
+    所有结果的字符概率拼接为一个数组并只做一次前缀和，每个句子/词的
+    平均置信度都是 O(1) 的区间查询。切分规则与逐条实现保持一致：
+    句子按 split_sentences 的结果依次累加长度，词按空白分词、每词后跳过一个字符。
+    """
+    offsets = np.cumsum([0] + [len(p) for p in char_probs])
+    flat = np.concatenate(char_probs) if char_probs else np.zeros(0, dtype=np.float64)
+    prefix = np.concatenate(([0.0], np.cumsum(flat, dtype=np.float64)))
+
+    # 先收集所有区间，再一次性求均值
+    layout: List[List[Tuple[str, List[str]]]] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    for text, probs, base in zip(texts, char_probs, offsets):
+        n = len(probs)
+        item_layout = []
+        cursor = 0
+        for s in split_sentences(text):
+            length = len(s)
+            sent_end = min(cursor + length, n)
+            starts.append(base + min(cursor, n))
+            ends.append(base + max(min(cursor, n), sent_end))
+            words = s.split()
+            word_cursor = cursor
+            for w in words:
+                wlen = len(w)
+                w_start = min(word_cursor, sent_end)
+                starts.append(base + w_start)
+                ends.append(base + max(w_start, min(word_cursor + wlen, sent_end)))
+                word_cursor += wlen + 1  # +1 for the space removed by split (approx)
+            item_layout.append((s, words))
+            cursor += length
+        layout.append(item_layout)
+
+    means = _range_means(prefix, starts, ends).tolist() if starts else []
+
+    results = []
+    pos = 0
+    for item_layout in layout:
+        sentences = []
+        for s, words in item_layout:
+            sent_conf = means[pos]
+            pos += 1
+            word_items = []
+            for w in words:
+                word_items.append({"text": w, "confidence": round(means[pos], 4)})
+                pos += 1
+            sentences.append({"text": s, "confidence": round(sent_conf, 4), "words": word_items})
+        results.append(sentences)
+    return results
@@ -0,0 +1,242 @@
+import os
+import glob
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.alignment import align
+
+
+# 标注编辑历史存储，可通过环境变量调整
+EDIT_HISTORY_DB = os.environ.get("ASR_EDIT_HISTORY_DB", "")  # 为空时使用 <voice_data>/.edits_history.sqlite3
+# 压缩时每个文件至少保留的最近修订数
+EDIT_HISTORY_KEEP = int(os.environ.get("ASR_EDIT_HISTORY_KEEP", "20"))
+# 压缩时早于该天数的修订（超出保留数的部分）被删除
+EDIT_HISTORY_MAX_AGE_DAYS = float(os.environ.get("ASR_EDIT_HISTORY_MAX_AGE_DAYS", "90"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS revisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    ground_truth TEXT NOT NULL,
+    edits TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revisions_file_time ON revisions (filename, saved_at, id);
+CREATE INDEX IF NOT EXISTS revisions_time ON revisions (saved_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def write_atomic(path: str, text: str):
+    """先写同目录临时文件并 fsync，再 os.replace，读者不会看到写了一半的文件"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class EditHistory:
+    """
+    标注编辑历史：SQLite（WAL 模式）中的只追加修订表，按 (filename, saved_at) 建索引，
+    保存耗时不随历史规模增长，查询某个文件的历史也无需扫描目录。
+
+    save() 在同一事务中追加修订并原子替换 <base>.txt：标注文件写入失败时事务回滚，
+    两者不会出现不一致。旧修订由 compact() 按保留数和时间清理。
+    """
+
+    def __init__(self, voice_dir: str, db_path: str = EDIT_HISTORY_DB):
+        self.voice_dir = voice_dir
+        self.db_path = db_path or os.path.join(voice_dir, ".edits_history.sqlite3")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+        self.import_legacy(os.path.join(self.voice_dir, "edits_history"))
+
+    def stop(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def import_legacy(self, hist_dir: str) -> int:
+        """导入旧版 edits_history/<base>_<ts>.json 文件（只执行一次）"""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return 0
+        rows = []
+        for path in sorted(glob.glob(os.path.join(hist_dir, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                saved_at = datetime.fromisoformat(data["saved_at"]).timestamp()
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            rows.append((data.get("filename") or "", saved_at, data.get("ground_truth") or "",
+                         json.dumps(data.get("edits") or {}, ensure_ascii=False)))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO revisions (filename, saved_at, ground_truth, edits) VALUES (?, ?, ?, ?)",
+                    [r for r in rows if r[0]])
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                                   (str(len(rows)),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if rows:
+            print(f"EditHistory: imported {len(rows)} legacy revisions from {hist_dir}")
+        return len(rows)
+
+    # ---- 写入 ----
+
+    def gt_path(self, filename: str) -> str:
+        base, _ = os.path.splitext(filename)
+        return os.path.join(self.voice_dir, f"{base}.txt")
+
+    def save(self, filename: str, ground_truth: str, edits: Dict[str, Any]) -> Dict[str, Any]:
+        """追加一个修订并原子更新 ground truth 文件，返回修订摘要"""
+        saved_at = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "INSERT INTO revisions (filename, saved_at, ground_truth, edits) VALUES (?, ?, ?, ?)",
+                    (filename, saved_at, ground_truth, json.dumps(edits, ensure_ascii=False)))
+                write_atomic(self.gt_path(filename), ground_truth)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"revision": cur.lastrowid, "filename": filename, "saved_at": saved_at}
+
+    # ---- 查询 ----
+
+    @staticmethod
+    def _row(row: sqlite3.Row, full: bool) -> Dict[str, Any]:
+        data = {
+            "revision": row[0],
+            "filename": row[1],
+            "saved_at": row[2],
+            "saved_at_iso": datetime.utcfromtimestamp(row[2]).isoformat(),
+            "length": len(row[3]),
+        }
+        if full:
+            data["ground_truth"] = row[3]
+            data["edits"] = json.loads(row[4])
+        return data
+
+    def revisions(self, filename: str, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """文件的修订列表（新到旧）；before 为上一页最后一个修订号，用于翻页"""
+        sql = "SELECT id, filename, saved_at, ground_truth FROM revisions WHERE filename = ?"
+        args: List[Any] = [filename]
+        if before is not None:
+            sql += " AND id < ?"
+            args.append(before)
+        sql += " ORDER BY saved_at DESC, id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._row(r, full=False) for r in rows]
+
+    def get(self, filename: str, revision: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """指定修订（默认最新修订）的完整内容"""
+        sql = "SELECT id, filename, saved_at, ground_truth, edits FROM revisions WHERE filename = ?"
+        args: List[Any] = [filename]
+        if revision is not None:
+            sql += " AND id = ?"
+            args.append(revision)
+        sql += " ORDER BY saved_at DESC, id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, args).fetchone()
+        return self._row(row, full=True) if row else None
+
+    def previous(self, filename: str, revision: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, filename, saved_at, ground_truth, edits FROM revisions "
+                "WHERE filename = ? AND id < ? ORDER BY id DESC LIMIT 1", (filename, revision)).fetchone()
+        return self._row(row, full=True) if row else None
+
+    @staticmethod
+    def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        """两个修订 ground truth 的逐字对齐差异（区间附带对应文本）"""
+        a, b = old["ground_truth"], new["ground_truth"]
+        result = align(a, b)
+        for span in result["ops"]:
+            span["old_text"] = a[span["ref_start"]:span["ref_end"]]
+            span["new_text"] = b[span["hyp_start"]:span["hyp_end"]]
+        return {
+            "from": {k: old[k] for k in ("revision", "saved_at", "saved_at_iso", "length")},
+            "to": {k: new[k] for k in ("revision", "saved_at", "saved_at_iso", "length")},
+            **result,
+        }
+
+    # ---- 压缩 ----
+
+    def compact(self, keep: int = EDIT_HISTORY_KEEP, max_age_days: float = EDIT_HISTORY_MAX_AGE_DAYS) -> Dict[str, Any]:
+        """
+        删除每个文件最近 keep 个修订之外、且早于 max_age_days 天的修订，
+        然后回写 WAL 并回收空闲页。每个文件的最新修订总会保留。
+        """
+        cutoff = time.time() - max_age_days * 86400
+        keep = max(1, keep)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    """
+                    DELETE FROM revisions WHERE saved_at < ? AND id IN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (
+                                PARTITION BY filename ORDER BY saved_at DESC, id DESC) AS rn
+                            FROM revisions
+                        ) WHERE rn > ?
+                    )
+                    """, (cutoff, keep))
+                deleted = cur.rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            if deleted:
+                self._conn.execute("VACUUM")
+        return {"deleted": deleted, "keep": keep, "max_age_days": max_age_days, **self.stats()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            revisions, files = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT filename) FROM revisions").fetchone()
+        size = 0
+        for suffix in ("", "-wal"):
+            try:
+                size += os.path.getsize(self.db_path + suffix)
+            except OSError:
+                pass
+        return {"db_path": self.db_path, "revisions": revisions, "files": files, "bytes": size}
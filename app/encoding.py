@@ -0,0 +1,172 @@
+import os
+import gzip
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖：未安装时只提供 JSON
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时只协商 gzip
+    brotli = None
+
+
+# 响应压缩参数，可通过环境变量调整
+COMPRESS_MIN_BYTES = int(os.environ.get("ASR_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("ASR_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.environ.get("ASR_BROTLI_QUALITY", "4"))
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# msgpack 模式下以小端 float32 字节串编码的数值数组字段
+PACKED_FIELDS = ("raw_prob",)
+
+
+class ResponseOptions:
+    """
+    单个请求的响应形式（由查询参数和请求头协商）：
+    - fields: 只保留的字段路径（如 comparison.statistics），None 表示全部
+    - exclude: 在任意层级删除的字段名（如 raw_prob、words）
+    - format: json 或 msgpack
+    - encoding: 内容压缩方式 br / gzip，None 表示不压缩
+    """
+
+    def __init__(self, fields: Optional[List[List[str]]] = None, exclude: Optional[set] = None,
+                 format: str = "json", encoding: Optional[str] = None):
+        self.fields = fields
+        self.exclude = exclude or set()
+        self.format = format
+        self.encoding = encoding
+
+    @property
+    def is_default(self) -> bool:
+        return self.fields is None and not self.exclude and self.format == "json" and self.encoding is None
+
+
+response_options: ContextVar[Optional[ResponseOptions]] = ContextVar("response_options", default=None)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """解析 Accept / Accept-Encoding 头：取值 -> q"""
+    accepted = {}
+    for part in _split(header):
+        name, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str, available: Optional[List[str]] = None) -> Optional[str]:
+    """选出客户端接受的压缩方式（br 优先）；available 为可用的编码，默认按已安装的压缩库"""
+    accepted = _accepted(accept_encoding)
+    if available is None:
+        available = (["br"] if brotli is not None else []) + ["gzip"]
+    candidates = [e for e in ("br", "gzip") if e in available]
+    best = max(candidates, key=lambda e: accepted.get(e, accepted.get("*", 0.0)), default=None)
+    if best is None or accepted.get(best, accepted.get("*", 0.0)) <= 0:
+        return None
+    return best
+
+
+def parse_options(query: Dict[str, str], headers: Dict[str, str]) -> ResponseOptions:
+    """解析响应选项；format 无效时 400，请求 msgpack 但未安装时 406"""
+    fields = _split(query.get("fields"))
+    fmt = (query.get("format") or "").lower()
+    if not fmt:
+        accept = _accepted(headers.get("accept", ""))
+        fmt = "msgpack" if msgpack is not None and accept.get(MSGPACK_MEDIA_TYPE, 0) > accept.get(
+            "application/json", accept.get("*/*", 0)) else "json"
+    if fmt not in ("json", "msgpack"):
+        raise HTTPException(status_code=400, detail="format 必须是 'json' 或 'msgpack'")
+    if fmt == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=406, detail="服务端未安装 msgpack，无法返回 msgpack 编码")
+    return ResponseOptions(
+        fields=[f.split(".") for f in fields] if fields else None,
+        exclude=set(_split(query.get("exclude"))),
+        format=fmt,
+        encoding=negotiate_encoding(headers.get("accept-encoding", "")),
+    )
+
+
+def _select(data: Any, paths: List[List[str]]) -> Any:
+    """按字段路径投影；路径经过列表时作用于每个元素"""
+    if isinstance(data, list):
+        return [_select(item, paths) for item in data]
+    if not isinstance(data, dict) or any(not p for p in paths):
+        return data
+    out: Dict[str, Any] = {}
+    for key in dict.fromkeys(p[0] for p in paths):
+        if key in data:
+            out[key] = _select(data[key], [p[1:] for p in paths if p[0] == key])
+    return out
+
+
+def _transform(data: Any, exclude: set, pack: bool) -> Any:
+    """删除 exclude 中的字段；pack 为 True 时把 PACKED_FIELDS 数组编码为 float32 字节串"""
+    if isinstance(data, dict):
+        out = {}
+        for key, value in data.items():
+            if key in exclude:
+                continue
+            if pack and key in PACKED_FIELDS and isinstance(value, list):
+                try:
+                    out[key] = np.asarray(value, dtype="<f4").ravel().tobytes()
+                    continue
+                except (TypeError, ValueError):
+                    pass
+            out[key] = _transform(value, exclude, pack)
+        return out
+    if isinstance(data, list):
+        return [_transform(item, exclude, pack) for item in data]
+    return data
+
+
+def project(content: Any, options: ResponseOptions) -> Any:
+    if options.fields is not None:
+        content = _select(content, options.fields)
+    if options.exclude or options.format == "msgpack":
+        content = _transform(content, options.exclude, options.format == "msgpack")
+    return content
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+
+
+def encode_response(content: Any, options: Optional[ResponseOptions], status_code: int = 200,
+                    headers: Optional[Dict[str, str]] = None) -> Response:
+    """按协商结果投影、编码并压缩；未指定任何选项时与 JSONResponse 完全一致"""
+    if options is None or options.is_default:
+        return JSONResponse(content, status_code=status_code, headers=headers)
+    content = project(content, options)
+    if options.format == "msgpack":
+        body, media_type = msgpack.packb(content, use_bin_type=True), MSGPACK_MEDIA_TYPE
+    else:
+        body, media_type = JSONResponse(content).body, "application/json"
+    body, encoding = compress(body, options.encoding)
+    response = Response(body, status_code=status_code, headers=headers, media_type=media_type)
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
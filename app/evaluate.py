@@ -0,0 +1,252 @@
+"""
+全量语料评测：把 VOICE_DATA_DIR 中的每个音频送入指定模型，
+有 <base>.txt 标注时计算 CER，结果以 NDJSON 逐行输出并可断点续跑。
+
+命令行用法：
+    python -m app.evaluate --models base personal --out eval.ndjson --concurrency 2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.alignment import error_rates
+from app.audio import AUDIO_EXTENSIONS
+
+
+# (audio_path, model_type) -> transcribe 结果
+TranscribeFn = Callable[[str, str], Awaitable[Dict[str, Any]]]
+
+
+def list_audio_files(voice_dir: str) -> List[str]:
+    return sorted(f for f in os.listdir(voice_dir) if f.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def read_ground_truth(voice_dir: str, filename: str) -> Optional[str]:
+    """读取 /api/save-edits 写入的 <base>.txt 标注，不存在时返回 None"""
+    base, _ = os.path.splitext(filename)
+    gt_path = os.path.join(voice_dir, f"{base}.txt")
+    try:
+        with open(gt_path, "r", encoding="utf-8") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def load_completed(out_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读取已有 NDJSON 输出中成功完成的文件记录（用于续跑），忽略截断的末行；
+    同一文件有多条记录时以最后一条为准
+    """
+    completed: Dict[str, Dict[str, Any]] = {}
+    if not out_path or not os.path.exists(out_path):
+        return completed
+    with open(out_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("type") == "file" and not record.get("error"):
+                completed[record["filename"]] = record
+    return completed
+
+
+def _open_output(out_path: str, resume: bool):
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    return open(out_path, "a" if resume else "w", encoding="utf-8")
+
+
+class EvaluationAggregate:
+    """按模型累计的评测指标：CER 按总错误字数 / 总参考字数计算"""
+
+    def __init__(self, models: List[str]):
+        self.files = 0
+        self.errors = 0
+        self.models = {
+            mt: {"files": 0, "scored_files": 0, "char_errors": 0, "ref_chars": 0,
+                 "confidence_sum": 0.0, "processing_time_ms": 0.0}
+            for mt in models
+        }
+
+    def add(self, record: Dict[str, Any]):
+        if record.get("error"):
+            self.errors += 1
+            return
+        self.files += 1
+        for mt, res in record.get("models", {}).items():
+            agg = self.models.get(mt)
+            if agg is None:
+                continue
+            agg["files"] += 1
+            agg["confidence_sum"] += res.get("avg_confidence", 0.0)
+            agg["processing_time_ms"] += res.get("processing_time_ms", 0.0)
+            if res.get("cer") is not None:
+                agg["scored_files"] += 1
+                agg["char_errors"] += res["char_errors"]
+                agg["ref_chars"] += res["ref_chars"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        models = {}
+        for mt, agg in self.models.items():
+            models[mt] = {
+                "files": agg["files"],
+                "scored_files": agg["scored_files"],
+                "cer": round(agg["char_errors"] / agg["ref_chars"] * 100, 2) if agg["ref_chars"] else None,
+                "avg_confidence": round(agg["confidence_sum"] / agg["files"] * 100, 2) if agg["files"] else None,
+                "avg_processing_time_ms": round(agg["processing_time_ms"] / agg["files"], 2) if agg["files"] else None,
+            }
+        return {"files": self.files, "errors": self.errors, "models": models}
+
+
+async def evaluate_file(transcribe: TranscribeFn, voice_dir: str, filename: str,
+                        models: List[str]) -> Dict[str, Any]:
+    """评测单个文件，异常记录在 error 字段中而不是中断整个评测"""
+    audio_path = os.path.join(voice_dir, filename)
+    ground_truth = read_ground_truth(voice_dir, filename)
+    record: Dict[str, Any] = {
+        "type": "file",
+        "filename": filename,
+        "ground_truth_available": ground_truth is not None,
+        "models": {},
+    }
+    start = time.time()
+    try:
+        for mt in models:
+            result = await transcribe(audio_path, mt)
+            sentences = result.get("sentences", [])
+            entry = {
+                "text": result.get("text", ""),
+                "avg_confidence": round(sum(s.get("confidence", 0) for s in sentences) / len(sentences), 4) if sentences else 0.0,
+                "processing_time_ms": result.get("processing_time_ms", 0.0),
+                "cache_hit": result.get("cache", {}).get("hit", False),
+                "cer": None,
+            }
+            if ground_truth is not None:
+                rates = error_rates(ground_truth, entry["text"])
+                entry.update({
+                    "cer": round(rates["cer"] * 100, 2),
+                    "char_errors": rates["char_errors"],
+                    "ref_chars": rates["ref_chars"],
+                })
+            record["models"][mt] = entry
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed_ms"] = round((time.time() - start) * 1000, 2)
+    return record
+
+
+async def run_evaluation(transcribe: TranscribeFn, voice_dir: str, models: List[str],
+                         out_path: Optional[str] = None, concurrency: int = 2,
+                         resume: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    评测 voice_dir 下所有音频，逐条产出事件：
+    - {"type": "start", ...}
+    - {"type": "file", ..., "aggregate": {...}}  每个文件完成时
+    - {"type": "summary", "aggregate": {...}}
+    指定 out_path 时文件记录同步追加写入；resume 为 True 时跳过其中已包含全部 models 的成功记录，
+    缺少部分模型的文件（如续跑时新增了模型）只补跑缺少的模型，并与已有结果合并为一条新记录。
+    """
+    files = await asyncio.to_thread(list_audio_files, voice_dir)
+    completed = await asyncio.to_thread(load_completed, out_path) if (out_path and resume) else {}
+    aggregate = EvaluationAggregate(models)
+    # 文件名 -> 需要（补）跑的模型
+    pending: Dict[str, List[str]] = {}
+    partial = 0
+    for filename in files:
+        record = completed.get(filename)
+        missing = [mt for mt in models if record is None or mt not in record.get("models", {})]
+        if not missing:
+            aggregate.add(record)
+        else:
+            pending[filename] = missing
+            partial += record is not None
+    yield {"type": "start", "total": len(files), "skipped": len(files) - len(pending), "partial": partial,
+           "models": models, "concurrency": concurrency}
+
+    out_fh = await asyncio.to_thread(_open_output, out_path, resume) if out_path else None
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def bounded(filename: str, missing: List[str]) -> Dict[str, Any]:
+        async with semaphore:
+            record = await evaluate_file(transcribe, voice_dir, filename, missing)
+        previous = completed.get(filename)
+        if previous is not None and not record.get("error"):
+            record["models"] = {**previous["models"], **record["models"]}
+        return record
+
+    tasks = [asyncio.ensure_future(bounded(f, missing)) for f, missing in pending.items()]
+    try:
+        for done, next_record in enumerate(asyncio.as_completed(tasks), start=1):
+            record = await next_record
+            if out_fh:
+                # 每完成一个文件立即落盘，中断后可从这里续跑
+                out_fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out_fh.flush()
+            aggregate.add(record)
+            yield {**record, "progress": {"done": done, "pending": len(pending) - done},
+                   "aggregate": aggregate.to_dict()}
+    finally:
+        for task in tasks:
+            task.cancel()
+        if out_fh:
+            out_fh.close()
+
+    yield {"type": "summary", "aggregate": aggregate.to_dict()}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Evaluate ASR models on every file in the voice_data directory")
+    parser.add_argument("--voice-dir", default="/root/demo_1_confidence/voice_data")
+    parser.add_argument("--models", nargs="+", default=["base", "personal"],
+                        help="model ids: base, personal or any checkpoint under ASR_MODELS_DIR")
+    parser.add_argument("--out", required=True, help="NDJSON output path (also used to resume)")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of resuming from --out")
+    parser.add_argument("--device", default="cuda:0")
+    args = parser.parse_args(argv)
+
+    from app.asr_service import ASRService
+    from app.feature_store import FEATURE_STORE_ENABLED, FeatureStore
+    from app.result_cache import CACHE_ENABLED, ResultCache
+    from app.worker_pool import WORKER_PROCESSES
+
+    feature_store = FeatureStore(args.voice_dir) if FEATURE_STORE_ENABLED else None
+    if feature_store is not None:
+        # 未命中的文件在后台构建，供之后的评测复用
+        feature_store.start(warm=False)
+    service = ASRService(device=args.device, result_cache=ResultCache() if CACHE_ENABLED else None,
+                         preload=False, worker_processes=WORKER_PROCESSES, feature_store=feature_store)
+    unknown = [mt for mt in args.models if not service.has_model(mt)]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)} (available: {', '.join(service.registry.ids())})")
+    service.start_loading(args.models)
+
+    def transcribe(audio_path: str, model_type: str):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(service.executor_for(model_type), service.transcribe, audio_path, model_type)
+
+    async def run():
+        async for event in run_evaluation(transcribe, args.voice_dir, args.models, args.out,
+                                          args.concurrency, resume=not args.no_resume):
+            if event["type"] == "file":
+                # stdout 只输出精简进度，完整记录在 --out 文件中
+                event = {"type": "file", "filename": event["filename"], "error": event.get("error"),
+                         "progress": event["progress"], "aggregate": event["aggregate"]}
+            sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    try:
+        asyncio.run(run())
+    finally:
+        service.close()
+        if feature_store is not None:
+            feature_store.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+把 SenseVoiceSmall 检查点导出为 ONNX 并做 int8 动态量化，供 onnx 推理后端使用。
+导出文件写入各自的检查点目录（model.onnx / model_quant.onnx），需要 funasr、torch、onnx 与 onnxruntime：
+
+    python -m app.export_onnx --models base personal
+    ASR_MODEL_BACKENDS=base=onnx,personal=onnx ./start.sh
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+from app.backends import ONNX_MODEL_FILE, ONNX_QUANT_MODEL_FILE
+
+
+def _size_mb(path: str) -> Optional[float]:
+    try:
+        return round(os.path.getsize(path) / (1024 * 1024), 1)
+    except OSError:
+        return None
+
+
+def export_fp32(path: str) -> str:
+    """用 funasr 导出 fp32 ONNX 模型到检查点目录，返回 model.onnx 路径"""
+    from funasr import AutoModel
+
+    model = AutoModel(model=path, device="cpu", disable_update=True)
+    export_dir = model.export(type="onnx", quantize=False, output_dir=path) or path
+    for candidate in (os.path.join(path, ONNX_MODEL_FILE), os.path.join(export_dir, ONNX_MODEL_FILE)):
+        if os.path.isfile(candidate):
+            if os.path.dirname(candidate) != path:
+                os.replace(candidate, os.path.join(path, ONNX_MODEL_FILE))
+            return os.path.join(path, ONNX_MODEL_FILE)
+    raise RuntimeError(f"funasr 导出后未找到 {ONNX_MODEL_FILE}（导出目录 {export_dir}）")
+
+
+def quantize_int8(fp32_path: str, quant_path: str, per_channel: bool = False):
+    """对 MatMul 权重做 int8 动态量化（激活在运行时量化），CPU 上收益最大"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, quant_path, op_types_to_quantize=["MatMul"],
+                     per_channel=per_channel, weight_type=QuantType.QInt8)
+
+
+def export_model(path: str, quantize: bool = True, per_channel: bool = False,
+                 force: bool = False) -> Dict[str, Any]:
+    start = time.time()
+    fp32_path = os.path.join(path, ONNX_MODEL_FILE)
+    quant_path = os.path.join(path, ONNX_QUANT_MODEL_FILE)
+    weights_mtime = os.path.getmtime(os.path.join(path, "model.pt"))
+    # 权重比已导出的模型新时重新导出
+    if force or not os.path.isfile(fp32_path) or os.path.getmtime(fp32_path) < weights_mtime:
+        export_fp32(path)
+    if quantize and (force or not os.path.isfile(quant_path)
+                     or os.path.getmtime(quant_path) < os.path.getmtime(fp32_path)):
+        quantize_int8(fp32_path, quant_path, per_channel)
+    return {
+        "path": path,
+        "fp32_mb": _size_mb(fp32_path),
+        "int8_mb": _size_mb(quant_path) if quantize else None,
+        "elapsed_s": round(time.time() - start, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export SenseVoice checkpoints to ONNX and quantize them to int8")
+    parser.add_argument("--models", nargs="+", default=["base", "personal"],
+                        help="model ids: base, personal or any checkpoint under ASR_MODELS_DIR")
+    parser.add_argument("--no-quantize", action="store_true", help="only export the fp32 model.onnx")
+    parser.add_argument("--per-channel", action="store_true", help="per-channel weight quantization")
+    parser.add_argument("--force", action="store_true", help="re-export even if the ONNX files are up to date")
+    args = parser.parse_args(argv)
+
+    from app.asr_service import ASRService
+
+    service = ASRService(device="cpu", preload=False)
+    unknown = [mt for mt in args.models if not service.has_model(mt)]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)} (available: {', '.join(service.registry.ids())})")
+
+    failed = False
+    for model_type in args.models:
+        model_id = service.registry.resolve(model_type)
+        try:
+            report = export_model(service.registry.path_of(model_type), quantize=not args.no_quantize,
+                                  per_channel=args.per_channel, force=args.force)
+            report = {"model": model_id, **report}
+        except Exception as e:
+            failed = True
+            report = {"model": model_id, "error": str(e)}
+        sys.stdout.write(json.dumps(report, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.audio import AUDIO_EXTENSIONS, SAMPLE_RATE, decode_audio
+from app.metrics import Counter, REGISTRY
+
+
+# 预解码音频存储，可通过环境变量调整；默认关闭（float32 约 230 MB / 音频小时）
+FEATURE_STORE_ENABLED = os.environ.get("ASR_FEATURE_STORE_ENABLED", "0") != "0"
+FEATURE_STORE_DIR = os.environ.get("ASR_FEATURE_STORE_DIR", "/root/demo_1_confidence/.feature_store")
+# 启动时为 voice_data 中全部文件预先解码；默认只在首次未命中时构建
+FEATURE_STORE_WARM = os.environ.get("ASR_FEATURE_STORE_WARM", "0") != "0"
+# 存储占用上限（MB），超出后按最近使用时间淘汰条目；0 表示不限制
+FEATURE_STORE_MAX_MB = float(os.environ.get("ASR_FEATURE_STORE_MAX_MB", "2048"))
+
+FEATURE_STORE_LOOKUPS = REGISTRY.register(Counter(
+    "asr_feature_store_lookups_total", "Decoded-audio store lookups", ("result",)))
+FEATURE_STORE_SAVED = REGISTRY.register(Counter(
+    "asr_feature_store_decode_saved_seconds_total", "Decode time avoided by memory-mapped entries", ()))
+FEATURE_STORE_EVICTIONS = REGISTRY.register(Counter(
+    "asr_feature_store_evictions_total", "Entries evicted to stay within the size limit", ()))
+
+
+class FeatureStore:
+    """
+    voice_data 音频的预解码存储：每个文件解码为 16kHz float32 单声道，
+    以 .npy 保存在 store_dir，读取时内存映射（copy-on-write），
+    可直接作为 model.generate 的输入，不再重复解码和重采样。
+
+    条目记录源文件的 mtime/size，源文件变化后旧条目失效并在后台重建；
+    未命中的文件加入后台构建队列，下次请求即可命中。
+    总大小超过 max_mb 时按最近使用时间（命中时刷新 .npy 的 mtime）淘汰最久未用的条目。
+    """
+
+    def __init__(self, voice_dir: str, store_dir: str = FEATURE_STORE_DIR, max_mb: float = FEATURE_STORE_MAX_MB):
+        self.voice_dir = os.path.abspath(voice_dir)
+        self.store_dir = store_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._queued: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_failures = 0
+        self.decode_ms_saved = 0.0
+        self.build_ms = 0.0
+        self.evictions = 0
+
+    # ---- 生命周期 ----
+
+    def start(self, warm: bool = FEATURE_STORE_WARM):
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._worker, name="feature-store", daemon=True)
+        self._thread.start()
+        if warm:
+            self.warm()
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put("")
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def warm(self) -> int:
+        """为 voice_data 中尚无有效条目的文件排队构建，并清理已删除文件的条目"""
+        try:
+            names = sorted(f for f in os.listdir(self.voice_dir) if f.lower().endswith(AUDIO_EXTENSIONS))
+        except FileNotFoundError:
+            return 0
+        self.prune(set(names))
+        queued = 0
+        for name in names:
+            if self._valid_meta(name) is None:
+                self._enqueue(name)
+                queued += 1
+        return queued
+
+    # ---- 条目 ----
+
+    def _library_name(self, audio_path: str) -> Optional[str]:
+        """voice_data 中的文件返回文件名，其他路径（如上传的临时文件）返回 None"""
+        path = os.path.abspath(audio_path)
+        if os.path.dirname(path) != self.voice_dir:
+            return None
+        return os.path.basename(path)
+
+    def _paths(self, name: str):
+        base = os.path.join(self.store_dir, name)
+        return f"{base}.npy", f"{base}.json"
+
+    def _valid_meta(self, name: str) -> Optional[Dict[str, Any]]:
+        data_path, meta_path = self._paths(name)
+        try:
+            st = os.stat(os.path.join(self.voice_dir, name))
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if meta.get("mtime_ns") != st.st_mtime_ns or meta.get("size") != st.st_size:
+            return None
+        if not os.path.exists(data_path):
+            return None
+        return meta
+
+    def get(self, audio_path: str) -> Optional[np.ndarray]:
+        """返回内存映射的解码音频；不在存储中或已失效时返回 None 并排队构建"""
+        name = self._library_name(audio_path)
+        if name is None:
+            return None
+        meta = self._valid_meta(name)
+        if meta is not None:
+            try:
+                data = np.load(self._paths(name)[0], mmap_mode="c")
+            except (OSError, ValueError):
+                data = None
+            if data is not None:
+                try:
+                    # 记录最近使用时间，供按大小淘汰
+                    os.utime(self._paths(name)[0])
+                except OSError:
+                    pass
+                with self._lock:
+                    self.hits += 1
+                    self.decode_ms_saved += meta.get("decode_ms", 0.0)
+                FEATURE_STORE_LOOKUPS.inc(result="hit")
+                FEATURE_STORE_SAVED.inc(meta.get("decode_ms", 0.0) / 1000)
+                return data
+        with self._lock:
+            self.misses += 1
+        FEATURE_STORE_LOOKUPS.inc(result="miss")
+        self._enqueue(name)
+        return None
+
+    def build(self, name: str) -> bool:
+        """解码并写入一个条目（先写临时文件再替换）"""
+        src = os.path.join(self.voice_dir, name)
+        try:
+            st = os.stat(src)
+        except OSError:
+            return False
+        start = time.time()
+        try:
+            data = decode_audio(src, SAMPLE_RATE)
+        except Exception as e:
+            with self._lock:
+                self.build_failures += 1
+            print(f"FeatureStore: failed to decode {name}: {e}")
+            return False
+        decode_ms = (time.time() - start) * 1000
+
+        data_path, meta_path = self._paths(name)
+        tmp_data = f"{data_path}.tmp.npy"
+        tmp_meta = f"{meta_path}.tmp"
+        try:
+            np.save(tmp_data, data)
+            with open(tmp_meta, "w", encoding="utf-8") as fh:
+                json.dump({"mtime_ns": st.st_mtime_ns, "size": st.st_size, "samples": len(data),
+                           "sample_rate": SAMPLE_RATE, "decode_ms": round(decode_ms, 2)}, fh)
+            os.replace(tmp_data, data_path)
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            print(f"FeatureStore: failed to write {name}: {e}")
+            return False
+        with self._lock:
+            self.builds += 1
+            self.build_ms += (time.time() - start) * 1000
+        self.evict(keep=name)
+        return True
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """总大小超过上限时删除最久未使用的条目（不删除 keep），返回删除的条目数"""
+        if self.max_bytes <= 0:
+            return 0
+        entries = []
+        try:
+            for entry in os.scandir(self.store_dir):
+                if entry.name.endswith(".npy") and not entry.name.endswith(".tmp.npy"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.name[:-4]))
+        except FileNotFoundError:
+            return 0
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            for path in self._paths(name):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            FEATURE_STORE_EVICTIONS.inc(removed)
+        return removed
+
+    def prune(self, names: set):
+        """删除源文件已不存在的条目"""
+        try:
+            entries = os.listdir(self.store_dir)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.endswith(".json") and entry[:-5] not in names:
+                for path in self._paths(entry[:-5]):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    # ---- 后台构建 ----
+
+    def _enqueue(self, name: str):
+        if self._thread is None:
+            return
+        with self._lock:
+            if name in self._queued:
+                return
+            self._queued.add(name)
+        self._queue.put(name)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            name = self._queue.get()
+            if not name:
+                continue
+            try:
+                if self._valid_meta(name) is None:
+                    self.build(name)
+            finally:
+                with self._lock:
+                    self._queued.discard(name)
+
+    def stats(self) -> Dict[str, Any]:
+        entries: List[str] = []
+        total_bytes = 0
+        try:
+            for entry in os.listdir(self.store_dir):
+                if entry.endswith(".npy") and not entry.endswith(".tmp.npy"):
+                    entries.append(entry)
+                    total_bytes += os.path.getsize(os.path.join(self.store_dir, entry))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "dir": self.store_dir,
+                "entries": len(entries),
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes or None,
+                "evictions": self.evictions,
+                "pending_builds": len(self._queued),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "builds": self.builds,
+                "build_failures": self.build_failures,
+                "build_ms": round(self.build_ms, 2),
+                "decode_ms_saved": round(self.decode_ms_saved, 2),
+            }
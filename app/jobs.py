@@ -0,0 +1,261 @@
+import os
+import time
+import uuid
+import asyncio
+import itertools
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+# 作业队列参数，可通过环境变量调整
+JOB_QUEUE_MAX = int(os.environ.get("ASR_JOB_QUEUE_MAX", "64"))
+JOB_WORKERS = int(os.environ.get("ASR_JOB_WORKERS", "2"))
+# 已结束作业的结果保留时间（秒）
+JOB_RESULT_TTL_S = float(os.environ.get("ASR_JOB_RESULT_TTL_S", "3600"))
+# SSE 心跳间隔（秒），防止代理断开空闲连接
+JOB_SSE_HEARTBEAT_S = float(os.environ.get("ASR_JOB_SSE_HEARTBEAT_S", "15"))
+
+# 数值越小越先执行
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class QueueFullError(Exception):
+    """排队作业数已达上限"""
+
+    def __init__(self, retry_after_s: int):
+        super().__init__(f"作业队列已满，请 {retry_after_s} 秒后重试")
+        self.retry_after_s = retry_after_s
+
+
+class Job:
+    def __init__(self, kind: str, priority: str, run: Callable[[], Awaitable[Any]],
+                 cleanup: Optional[Callable[[], Awaitable[None]]] = None,
+                 meta: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.priority = priority
+        self.meta = meta or {}
+        self.status = "queued"  # queued / running / cancelling / done / failed / cancelled
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._run = run
+        self._cleanup = cleanup
+        self._task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # 唤醒当前等待者，之后的等待使用新的 Event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait_ms": round((self.started_at - self.created_at) * 1000, 2) if self.started_at else None,
+            "run_ms": round((self.finished_at - self.started_at) * 1000, 2)
+            if self.finished_at and self.started_at else None,
+            **self.meta,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.status == "done":
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    异步作业队列：提交后立即返回作业 id，由固定数量的 worker 协程按优先级执行。
+
+    interactive 作业先于 batch 作业执行（同优先级先进先出）；排队数达到 max_queued 时
+    submit 抛出 QueueFullError（附按近期平均耗时估算的 Retry-After）。
+    排队或运行中的作业可取消；已结束作业保留 result_ttl_s 秒后清理。
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX,
+                 result_ttl_s: float = JOB_RESULT_TTL_S):
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.result_ttl_s = result_ttl_s
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional["asyncio.PriorityQueue"] = None
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._recent_run_s: List[float] = []
+        self._stopping = False
+        self.completed = 0
+        self.rejected = 0
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        self._stopping = False
+        self._queue = asyncio.PriorityQueue()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._sweeper()))
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        for job in list(self._jobs.values()):
+            if job.status not in FINISHED_STATES:
+                await self.cancel(job.id)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---- 提交与取消 ----
+
+    def queued_count(self) -> int:
+        return sum(1 for j in self._jobs.values() if j.status == "queued")
+
+    def _retry_after(self) -> int:
+        avg = sum(self._recent_run_s) / len(self._recent_run_s) if self._recent_run_s else 5.0
+        return max(1, int(round(avg * self.queued_count() / self.workers)))
+
+    def submit(self, kind: str, run: Callable[[], Awaitable[Any]], priority: str = "interactive",
+               cleanup: Optional[Callable[[], Awaitable[None]]] = None,
+               meta: Optional[Dict[str, Any]] = None) -> Job:
+        """提交作业；run 为返回结果的协程工厂，cleanup 在作业结束（含取消）后调用"""
+        if self._queue is None:
+            raise RuntimeError("JobQueue 尚未启动")
+        if self.queued_count() >= self.max_queued:
+            self.rejected += 1
+            raise QueueFullError(self._retry_after())
+        job = Job(kind, priority, run, cleanup, meta)
+        self._jobs[job.id] = job
+        self._queue.put_nowait((PRIORITIES.get(priority, 1), next(self._seq), job.id))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """作业在队列中的位置（0 表示下一个执行），不在排队时返回 None"""
+        if job.status != "queued":
+            return None
+        key = (PRIORITIES.get(job.priority, 1), job.created_at)
+        return sum(
+            1 for j in self._jobs.values()
+            if j.status == "queued" and j is not job
+            and (PRIORITIES.get(j.priority, 1), j.created_at) < key
+        )
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        取消排队或运行中的作业；已结束的作业原样返回。
+        运行中的作业先标记为 cancelling，协程退出后由 worker 标记为 cancelled
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        if job.status in ("running", "cancelling") and job._task is not None:
+            # 运行中的协程被取消；已交给线程池的推理会继续执行但结果被丢弃
+            if job.status == "running":
+                job.status = "cancelling"
+                job._notify()
+            job._task.cancel()
+            return job
+        await self._finish(job, "cancelled")
+        return job
+
+    async def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        if job._cleanup is not None:
+            try:
+                await job._cleanup()
+            except Exception as e:
+                print(f"JobQueue: cleanup for job {job.id} failed: {e}")
+            job._cleanup = None
+        job._run = None
+        job._notify()
+
+    # ---- 后台协程 ----
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue
+            job.status = "running"
+            job.started_at = time.time()
+            job._notify()
+            job._task = asyncio.ensure_future(job._run())
+            try:
+                result = await job._task
+            except asyncio.CancelledError:
+                await self._finish(job, "cancelled")
+                if self._stopping:
+                    raise
+            except Exception as e:
+                if job.status == "cancelling":
+                    await self._finish(job, "cancelled")
+                else:
+                    await self._finish(job, "failed", error=getattr(e, "detail", None) or str(e))
+            else:
+                if job.status == "cancelling":
+                    # 取消请求到达时协程已完成，结果按取消处理
+                    await self._finish(job, "cancelled")
+                    continue
+                await self._finish(job, "done", result=result)
+                self.completed += 1
+                self._recent_run_s = (self._recent_run_s + [job.finished_at - job.started_at])[-50:]
+            finally:
+                job._task = None
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(min(60.0, max(1.0, self.result_ttl_s / 10)))
+            cutoff = time.time() - self.result_ttl_s
+            for job_id, job in list(self._jobs.items()):
+                if job.status in FINISHED_STATES and job.finished_at < cutoff:
+                    del self._jobs[job_id]
+
+    # ---- 订阅 ----
+
+    async def events(self, job: Job) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        作业状态变化时产出最新状态，结束后产出最终状态并停止；
+        超过心跳间隔无变化时产出 None（用于 SSE 心跳）
+        """
+        while True:
+            changed = job._changed
+            finished = job.status in FINISHED_STATES
+            yield job.to_dict(include_result=finished)
+            if finished:
+                return
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=JOB_SSE_HEARTBEAT_S)
+                    break
+                except asyncio.TimeoutError:
+                    yield None
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "result_ttl_s": self.result_ttl_s,
+            "jobs": counts,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_run_s": round(sum(self._recent_run_s) / len(self._recent_run_s), 3) if self._recent_run_s else None,
+        }
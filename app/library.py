@@ -0,0 +1,308 @@
+import os
+import json
+import queue
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.audio import AUDIO_EXTENSIONS, probe_info
+
+
+# 无 inotify 时的轮询间隔（秒）
+LIBRARY_POLL_INTERVAL_S = float(os.environ.get("ASR_LIBRARY_POLL_INTERVAL_S", "5"))
+# 元数据持久化文件，重启后无需重新探测未变化的文件
+INDEX_FILENAME = ".library_index.json"
+
+SORT_FIELDS = ("name", "size", "modified", "duration", "sample_rate", "channels")
+
+_META_FIELDS = ("duration", "sample_rate", "channels")
+
+
+def _sort_key(field: str):
+    if field == "name":
+        return lambda e: e["name"]
+    if field == "modified":
+        return lambda e: e["_mtime_ns"]
+    # 未知的元数据（None）排在最前
+    return lambda e: (e.get(field) is not None, e.get(field) or 0)
+
+
+class AudioLibrary:
+    """
+    voice_data 目录的内存索引。
+
+    启动时扫描一次，此后通过 inotify（需安装 inotify_simple）增量更新，
+    不可用时退化为后台轮询；请求路径上不再访问磁盘。
+    时长、采样率、声道数等元数据在后台线程中每个文件只探测一次，
+    并持久化到 INDEX_FILENAME。
+    """
+
+    def __init__(self, voice_dir: str, poll_interval: float = LIBRARY_POLL_INTERVAL_S):
+        self.voice_dir = voice_dir
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.watch_mode: Optional[str] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._sorted_cache: Dict[Tuple[str, bool], List[str]] = {}
+        # (version, 索引内容摘要)，索引变化后按需重新计算
+        self._state_digest: Tuple[int, str] = (-1, "")
+        self._lock = threading.RLock()
+        self._meta_queue: "queue.Queue[str]" = queue.Queue()
+        self._persist_dirty = False
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._persisted = self._load_persisted()
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        self.refresh()
+        self._persisted = {}
+        for target, name in ((self._metadata_worker, "library-meta"), (self._watch, "library-watch")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._meta_queue.put("")
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._persist()
+
+    # ---- 扫描与增量更新 ----
+
+    def _stat_entry(self, name: str, st: os.stat_result, has_gt: bool) -> Dict[str, Any]:
+        entry = {
+            "name": name,
+            "size": st.st_size,
+            "size_mb": round(st.st_size / (1024 * 1024), 2),
+            "modified": datetime.fromtimestamp(st.st_mtime).isoformat(),
+            "duration": None,
+            "sample_rate": None,
+            "channels": None,
+            "has_ground_truth": has_gt,
+            "_mtime_ns": st.st_mtime_ns,
+        }
+        # 文件未变化时沿用已有或持久化的元数据
+        previous = self._entries.get(name) or self._persisted.get(name)
+        if previous and previous.get("_mtime_ns") == st.st_mtime_ns and previous.get("size") == st.st_size:
+            for field in _META_FIELDS:
+                entry[field] = previous.get(field)
+            entry["_probed"] = previous.get("_probed", False)
+        else:
+            entry["_probed"] = False
+        return entry
+
+    def refresh(self) -> bool:
+        """全量扫描并与索引对比，返回是否有变化"""
+        audio: Dict[str, os.stat_result] = {}
+        gt_bases: Set[str] = set()
+        try:
+            with os.scandir(self.voice_dir) as it:
+                for de in it:
+                    lower = de.name.lower()
+                    if lower.endswith(AUDIO_EXTENSIONS):
+                        try:
+                            audio[de.name] = de.stat()
+                        except OSError:
+                            continue
+                    elif lower.endswith(".txt"):
+                        gt_bases.add(os.path.splitext(de.name)[0])
+        except FileNotFoundError:
+            pass
+
+        changed = False
+        with self._lock:
+            for name in list(self._entries):
+                if name not in audio:
+                    del self._entries[name]
+                    changed = True
+            for name, st in audio.items():
+                has_gt = os.path.splitext(name)[0] in gt_bases
+                changed |= self._apply(name, st, has_gt)
+            if changed:
+                self._bump()
+        return changed
+
+    def _apply(self, name: str, st: os.stat_result, has_gt: bool) -> bool:
+        current = self._entries.get(name)
+        if (current and current["_mtime_ns"] == st.st_mtime_ns and current["size"] == st.st_size
+                and current["has_ground_truth"] == has_gt):
+            return False
+        entry = self._stat_entry(name, st, has_gt)
+        self._entries[name] = entry
+        if not entry["_probed"]:
+            self._meta_queue.put(name)
+        return True
+
+    def notify_changed(self, name: str):
+        """单个文件变化（新增、修改、删除；.txt 标注变化会更新对应音频）"""
+        base, ext = os.path.splitext(name)
+        with self._lock:
+            if ext.lower() == ".txt":
+                has_gt = os.path.exists(os.path.join(self.voice_dir, name))
+                changed = False
+                for entry in self._entries.values():
+                    if os.path.splitext(entry["name"])[0] == base and entry["has_ground_truth"] != has_gt:
+                        entry["has_ground_truth"] = has_gt
+                        changed = True
+            elif name.lower().endswith(AUDIO_EXTENSIONS):
+                try:
+                    st = os.stat(os.path.join(self.voice_dir, name))
+                except OSError:
+                    changed = self._entries.pop(name, None) is not None
+                else:
+                    has_gt = os.path.exists(os.path.join(self.voice_dir, f"{base}.txt"))
+                    changed = self._apply(name, st, has_gt)
+            else:
+                return
+            if changed:
+                self._bump()
+
+    def _bump(self):
+        self.version += 1
+        self._sorted_cache.clear()
+        self._persist_dirty = True
+
+    # ---- 后台线程 ----
+
+    def _watch(self):
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            INotify = None
+
+        if INotify is not None and os.path.isdir(self.voice_dir):
+            self.watch_mode = "inotify"
+            inotify = INotify()
+            inotify.add_watch(
+                self.voice_dir,
+                flags.CREATE | flags.DELETE | flags.CLOSE_WRITE | flags.MOVED_FROM
+                | flags.MOVED_TO | flags.ATTRIB | flags.DELETE_SELF,
+            )
+            # inotify 建立前可能发生的变化
+            self.refresh()
+            while not self._stop.is_set():
+                for event in inotify.read(timeout=1000):
+                    if event.mask & flags.Q_OVERFLOW:
+                        self.refresh()
+                    elif event.name:
+                        self.notify_changed(event.name)
+            inotify.close()
+            return
+
+        self.watch_mode = "polling"
+        print(f"AudioLibrary: inotify unavailable, polling {self.voice_dir} every {self.poll_interval}s")
+        while not self._stop.wait(self.poll_interval):
+            self.refresh()
+
+    def _metadata_worker(self):
+        while not self._stop.is_set():
+            try:
+                name = self._meta_queue.get(timeout=1)
+            except queue.Empty:
+                if self._persist_dirty:
+                    self._persist()
+                continue
+            if not name:
+                continue
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is None or entry["_probed"]:
+                    continue
+                mtime_ns = entry["_mtime_ns"]
+            info = probe_info(os.path.join(self.voice_dir, name))
+            with self._lock:
+                entry = self._entries.get(name)
+                # 探测期间文件又被修改时丢弃结果，等待下一次入队
+                if entry is None or entry["_mtime_ns"] != mtime_ns:
+                    continue
+                entry.update(info)
+                entry["_probed"] = True
+                self._bump()
+
+    # ---- 持久化 ----
+
+    def _index_path(self) -> str:
+        return os.path.join(self.voice_dir, INDEX_FILENAME)
+
+    def _load_persisted(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as fh:
+                return json.load(fh).get("entries", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _persist(self):
+        if not os.path.isdir(self.voice_dir):
+            return
+        with self._lock:
+            self._persist_dirty = False
+            data = {"entries": {name: dict(entry) for name, entry in self._entries.items()}}
+        path = self._index_path()
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"AudioLibrary: failed to persist index: {e}")
+
+    # ---- 查询 ----
+
+    def _sorted(self, sort: str, descending: bool) -> List[str]:
+        key = (sort, descending)
+        names = self._sorted_cache.get(key)
+        if names is None:
+            sort_key = _sort_key(sort)
+            names = [e["name"] for e in sorted(self._entries.values(), key=sort_key, reverse=descending)]
+            self._sorted_cache[key] = names
+        return names
+
+    def _digest(self) -> str:
+        """索引内容（文件名、大小、mtime 与元数据）的摘要；version 只在本进程内有效，不能用于 ETag"""
+        with self._lock:
+            version, digest = self._state_digest
+            if version != self.version:
+                h = hashlib.sha1()
+                for name in sorted(self._entries):
+                    entry = self._entries[name]
+                    h.update(repr((name, entry["_mtime_ns"], entry["size"], entry["has_ground_truth"],
+                                   *(entry.get(f) for f in _META_FIELDS))).encode("utf-8"))
+                digest = h.hexdigest()[:16]
+                self._state_digest = (self.version, digest)
+            return digest
+
+    def etag(self, *params: Any) -> str:
+        digest = hashlib.sha1(repr(params).encode("utf-8")).hexdigest()[:12]
+        return f'W/"{self._digest()}-{digest}"'
+
+    def query(self, page: int = 1, page_size: Optional[int] = None, sort: str = "name",
+              order: str = "asc", q: Optional[str] = None,
+              has_ground_truth: Optional[bool] = None) -> Dict[str, Any]:
+        """分页、排序、过滤查询；page_size 为空时返回全部"""
+        with self._lock:
+            names = self._sorted(sort, order == "desc")
+            if q or has_ground_truth is not None:
+                needle = (q or "").lower()
+                names = [
+                    n for n in names
+                    if needle in n.lower()
+                    and (has_ground_truth is None or self._entries[n]["has_ground_truth"] == has_ground_truth)
+                ]
+            total = len(names)
+            if page_size:
+                names = names[(page - 1) * page_size: page * page_size]
+            files = [
+                {k: v for k, v in self._entries[n].items() if not k.startswith("_")}
+                for n in names
+            ]
+            return {
+                "files": files,
+                "total": total,
+                "page": page,
+                "page_size": page_size or total,
+                "version": self.version,
+            }
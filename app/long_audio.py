@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.asr_service import ASRService
+from app.audio import SAMPLE_RATE, stream_audio
+from app.vad import VAD_MAX_SEGMENT_MS, SpeechSegmenter
+
+
+# 每次 generate 合并的语音片段数
+LONG_AUDIO_BATCH_SEGMENTS = int(os.environ.get("ASR_LONG_AUDIO_BATCH_SEGMENTS", "8"))
+# 每次从解码器读取的音频长度（秒）
+LONG_AUDIO_CHUNK_S = float(os.environ.get("ASR_LONG_AUDIO_CHUNK_S", "10"))
+# 长音频模式的上传限制（普通接口见 app.uploads）
+LONG_AUDIO_MAX_MB = float(os.environ.get("ASR_LONG_AUDIO_MAX_MB", "1024"))
+LONG_AUDIO_MAX_DURATION_S = float(os.environ.get("ASR_LONG_AUDIO_MAX_DURATION_S", "14400"))
+
+
+def _avg_confidence(sentences: List[Dict[str, Any]]) -> float:
+    return round(sum(s.get("confidence", 0) for s in sentences) / len(sentences), 4) if sentences else 0.0
+
+
+def _join_texts(texts: List[str]) -> str:
+    """拼接各片段文本；两侧都是拉丁字母或数字时补一个空格"""
+    out = ""
+    for text in texts:
+        if not text:
+            continue
+        if out and out[-1].isascii() and out[-1].isalnum() and text[0].isascii() and text[0].isalnum():
+            out += " "
+        out += text
+    return out
+
+
+async def transcribe_long(service: ASRService, audio_path: str, model_type: str,
+                          duration_s: Optional[float] = None,
+                          batch_segments: int = LONG_AUDIO_BATCH_SEGMENTS) -> AsyncIterator[Dict[str, Any]]:
+    """
+    长音频识别：边解码边做 VAD 切分（片段不超过 VAD_MAX_SEGMENT_MS，
+    与模型的 max_single_segment_time 一致），每 batch_segments 个片段一次 generate，
+    并在推理的同时继续解码下一批。逐条产出事件：
+    - {"type": "start", "duration_ms": ...}
+    - {"type": "segment", "index", "start_ms", "end_ms", "text", "confidence", "sentences"}
+    - {"type": "progress", "processed_ms", "duration_ms", "percent", "segments"}
+    - {"type": "result", "text", "sentences", "segments", ...}  拼接后的整体结果
+    内存占用上限约为两批片段加一个解码块，与文件总时长无关。
+    """
+    loop = asyncio.get_running_loop()
+    executor = service.executor_for(model_type)
+    segmenter = SpeechSegmenter(max_segment_ms=VAD_MAX_SEGMENT_MS)
+    decoded = service.load_input(audio_path)
+    if isinstance(decoded, str):
+        chunks = stream_audio(audio_path, SAMPLE_RATE, LONG_AUDIO_CHUNK_S)
+    else:
+        # 预解码存储命中：按块切分内存映射的缓冲区
+        step = int(SAMPLE_RATE * LONG_AUDIO_CHUNK_S)
+        chunks = (decoded[i:i + step] for i in range(0, len(decoded), step))
+    duration_ms = round(duration_s * 1000) if duration_s else None
+    batch_segments = max(1, batch_segments)
+
+    start_time = time.time()
+    segments_out: List[Dict[str, Any]] = []
+    sentences_out: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    model_name = None
+    inference_ms = 0.0
+
+    yield {"type": "start", "model_type": model_type, "duration_ms": duration_ms,
+           "max_segment_ms": VAD_MAX_SEGMENT_MS}
+
+    def finish(batch: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        nonlocal model_name, inference_ms
+        events = []
+        inference_ms += results[0].get("processing_time_ms", 0.0) if results else 0.0
+        for segment, result in zip(batch, results):
+            model_name = result.get("model_name", model_name)
+            index = len(segments_out)
+            sentences = result.get("sentences", [])
+            summary = {
+                "index": index,
+                "start_ms": segment["start_ms"],
+                "end_ms": segment["end_ms"],
+                "text": result.get("text", ""),
+                "confidence": _avg_confidence(sentences),
+            }
+            segments_out.append(summary)
+            texts.append(summary["text"])
+            for sentence in sentences:
+                sentences_out.append({**sentence, "segment": index,
+                                      "start_ms": segment["start_ms"], "end_ms": segment["end_ms"]})
+            events.append({"type": "segment", **summary, "sentences": sentences})
+        processed_ms = batch[-1]["end_ms"]
+        events.append({
+            "type": "progress",
+            "processed_ms": processed_ms,
+            "duration_ms": duration_ms,
+            "percent": round(min(100.0, processed_ms / duration_ms * 100), 1) if duration_ms else None,
+            "segments": len(segments_out),
+            "elapsed_ms": round((time.time() - start_time) * 1000, 2),
+        })
+        return events
+
+    closing = threading.Event()
+
+    def read_chunk():
+        chunk = next(chunks, None)
+        if closing.is_set():
+            # 读取期间调用方已结束迭代：在解码线程里关闭生成器（结束 ffmpeg 子进程）
+            chunks.close()
+            return None
+        return chunk
+
+    pending: List[Dict[str, Any]] = []
+    in_flight = None  # (future, batch)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(read_chunk)
+            if chunk is None:
+                pending.extend(segmenter.flush())
+            else:
+                pending.extend(segmenter.feed(chunk))
+
+            while len(pending) >= batch_segments or (chunk is None and pending):
+                batch, pending = pending[:batch_segments], pending[batch_segments:]
+                if in_flight is not None:
+                    for event in finish(in_flight[1], await in_flight[0]):
+                        yield event
+                # 片段缓冲区直接作为 generate 输入；流式切分的片段不写入结果缓存
+                future = loop.run_in_executor(
+                    executor, service.transcribe_batch, [s["audio"] for s in batch], model_type, None, False
+                )
+                # 送入推理后不再保留音频，只留时间戳
+                in_flight = (future, [{"start_ms": s["start_ms"], "end_ms": s["end_ms"]} for s in batch])
+            if chunk is None:
+                break
+
+        if in_flight is not None:
+            for event in finish(in_flight[1], await in_flight[0]):
+                yield event
+            in_flight = None
+    finally:
+        closing.set()
+        try:
+            chunks.close()
+        except ValueError:
+            # 取消时解码线程仍在读取，由 read_chunk 在本次读取返回后关闭
+            pass
+        if in_flight is not None:
+            in_flight[0].cancel()
+
+    yield {
+        "type": "result",
+        "text": _join_texts(texts),
+        "sentences": sentences_out,
+        "segments": segments_out,
+        "model_type": model_type,
+        "model_name": model_name,
+        "duration_ms": duration_ms,
+        "inference_ms": round(inference_ms, 2),
+        "processing_time_ms": round((time.time() - start_time) * 1000, 2),
+    }
@@ -1,20 +1,43 @@
 import os
-import shutil
-import tempfile
+import time
 import asyncio
-from typing import List, Optional
+from contextlib import AsyncExitStack
+from typing import Any, List, Optional
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request, WebSocket
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Body
 from datetime import datetime
 import json
 
-from app.asr_service import ASRService
+from app.accuracy import AccuracyTable, refresh as refresh_accuracy
+from app.asr_service import ASRService, ModelLoadError
+from app.audio import AUDIO_EXTENSIONS, probe_duration
+from app.batching import BatchScheduler
+from app.cascade import CASCADE_FALLBACK, CASCADE_PRIMARY, CASCADE_THRESHOLD, cascade_stats, transcribe_cascade
+from app.edit_history import EditHistory
+from app.encoding import encode_response, parse_options, response_options
+from app.evaluate import read_ground_truth, run_evaluation
+from app.feature_store import FEATURE_STORE_ENABLED, FeatureStore
+from app.jobs import PRIORITIES, JobQueue, QueueFullError
+from app.library import SORT_FIELDS, AudioLibrary
+from app.long_audio import LONG_AUDIO_MAX_DURATION_S, LONG_AUDIO_MAX_MB, transcribe_long
+from app.metrics import (
+    BATCH_QUEUE_DEPTH, EXECUTOR_QUEUE_DEPTH, HTTP_LATENCY, HTTP_REQUESTS, REGISTRY,
+    request_timings, server_timing_header, stage,
+)
+from app.profiling import profiler
+from app.static_files import StaticAssets, file_response
+from app.streaming import StreamingSession
+from app.uploads import UploadLimitMiddleware, audio_source
+from app.worker_pool import WORKER_PROCESSES
+from app.result_cache import CACHE_ENABLED, ResultCache
 
 # 语音数据目录改为当前项目下的 voice_data
-VOICE_DATA_DIR = "/root/demo_1_confidence/voice_data"
+VOICE_DATA_DIR = os.environ.get("ASR_VOICE_DATA_DIR", "/root/demo_1_confidence/voice_data")
+# 模型加载方式：background 启动后在后台并行加载；lazy 在首次请求时加载
+MODEL_LOADING = os.environ.get("ASR_MODEL_LOADING", "background")
 
 app = FastAPI(title="ASR Model Comparison API")
 app.add_middleware(
@@ -24,35 +47,231 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 超过上传大小限制的 multipart 请求在读取表单前拒绝；长音频接口使用自己的上限
+app.add_middleware(UploadLimitMiddleware, route_limits=[
+    (r"^/api/transcribe/[^/]+/long$", int(LONG_AUDIO_MAX_MB * 1024 * 1024)),
+])
 
-# 全局 ASR 服务实例（加载模型可能比较慢）
-asr_service = ASRService(device="cuda:0")
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """
+    按需性能剖析：请求头 X-Profile 或查询参数 profile（cprofile / sample / torch）剖析本次请求，
+    在线采样按配置比例剖析 /api 请求；结果通过 X-Profile-Id / X-Profile-Url 头给出下载地址。
+    仅在 ASR_PROFILING_ENABLED=1 时生效
+    """
+    try:
+        mode, trigger = profiler.requested_mode(request.headers, request.query_params), "request"
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+    if mode is None and request.url.path.startswith("/api/") \
+            and not request.url.path.startswith("/api/admin/profil"):
+        mode, trigger = profiler.live_sample(), "live"
+    if mode is None:
+        return await call_next(request)
+
+    capture = profiler.begin(mode, trigger, request.method, request.url.path)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        await asyncio.to_thread(profiler.end, capture, status, dict(request_timings.get() or {}))
+    response.headers["X-Profile-Id"] = capture.id
+    response.headers["X-Profile-Url"] = f"/api/admin/profiles/{capture.id}"
+    return response
 
 
-@app.get("/api/audio-list")
-async def audio_list():
-    """获取音频文件列表"""
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    记录每个请求的延迟指标，并通过 Server-Timing 头返回分阶段耗时；
+    同时解析响应形式（fields / exclude / format 查询参数与 Accept、Accept-Encoding 头）
+    """
+    try:
+        options = parse_options(request.query_params, request.headers)
+    except HTTPException as e:
+        # 中间件中抛出的异常不经过异常处理器，这里直接返回
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code)
+    timings = {}
+    token = request_timings.set(timings)
+    options_token = response_options.set(options)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+        response_options.reset(options_token)
+    elapsed = time.perf_counter() - start
+
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_LATENCY.observe(elapsed, method=request.method, route=route)
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=str(response.status_code))
+    timings["total"] = round(elapsed * 1000, 3)
+    response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+async def record_accuracy(source, results: dict):
+    """voice_data 文件的识别结果写入准确率表（上传的临时文件不记录）；失败不影响请求"""
+    if source.is_temp:
+        return
+
+    def record():
+        audio_hash = source.content_hash or asr_service.content_hash(source.path)
+        ground_truth = read_ground_truth(VOICE_DATA_DIR, source.filename)
+        for model_type, result in results.items():
+            accuracy_table.record(source.filename, asr_service.registry.resolve(model_type),
+                                  asr_service.model_identity(model_type), audio_hash, result, ground_truth)
+
     try:
-        files = []
-        for f in os.listdir(VOICE_DATA_DIR):
-            if f.lower().endswith((".mp3", ".wav", ".webm", ".flac", ".m4a")):
-                file_path = os.path.join(VOICE_DATA_DIR, f)
-                stat = os.stat(file_path)
-                files.append({
-                    "name": f,
-                    "size": stat.st_size,
-                    "size_mb": round(stat.st_size / (1024 * 1024), 2),
-                    "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
-        files.sort(key=lambda x: x["name"])
-        return {"files": files, "total": len(files)}
+        await asyncio.to_thread(record)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"AccuracyTable: failed to record {source.filename}: {e}")
+
+
+def timed_json(content: Any, **kwargs) -> Response:
+    """
+    附带当前请求的分阶段耗时并计时序列化。
+    默认返回完整 JSON；请求指定字段投影、msgpack 或可接受压缩时按协商结果编码
+    """
+    if isinstance(content, dict):
+        content = {**content, "timings_ms": dict(request_timings.get() or {})}
+    with stage("serialize"):
+        return encode_response(content, response_options.get(), **kwargs)
+
+
+# 全局 ASR 服务实例；模型不在导入时加载，进程启动后即可提供静态文件和音频列表
+# 识别结果缓存：相同音频 + 模型 + 推理参数直接复用结果
+result_cache = ResultCache() if CACHE_ENABLED else None
+# voice_data 的预解码音频存储（内存映射），library 文件不再每次重新解码
+feature_store = FeatureStore(VOICE_DATA_DIR) if FEATURE_STORE_ENABLED else None
+asr_service = ASRService(device="cuda:0", result_cache=result_cache, preload=False,
+                         worker_processes=WORKER_PROCESSES, feature_store=feature_store)
+# voice_data 音频库内存索引（启动时构建，之后增量更新）
+audio_library = AudioLibrary(VOICE_DATA_DIR)
+# 动态微批处理：并发的单模型识别请求合并为一次 generate 调用
+batch_scheduler = BatchScheduler(asr_service)
+# 异步作业队列：/api/jobs/* 提交后立即返回作业 id
+job_queue = JobQueue()
+# 前端构建产物的内存索引（含 index.html 内容与预压缩版本）
+static_assets = StaticAssets()
+# 标注编辑历史（SQLite WAL），保存时原子更新 <base>.txt
+edit_history = EditHistory(VOICE_DATA_DIR)
+# 按 (文件, 模型) 物化的识别结果与 CER，标注变化时只重新评分
+accuracy_table = AccuracyTable(VOICE_DATA_DIR)
+
+
+@app.on_event("startup")
+async def start_audio_library():
+    await asyncio.to_thread(audio_library.start)
+
+
+@app.on_event("startup")
+async def start_model_loading():
+    # 多进程模式下 worker 进程总是在启动时创建，各自加载模型
+    if MODEL_LOADING != "lazy" or asr_service.worker_pool is not None:
+        asr_service.start_loading()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await asyncio.to_thread(asr_service.close)
+
+
+@app.on_event("startup")
+async def start_feature_store():
+    if feature_store is not None:
+        await asyncio.to_thread(feature_store.start)
+
+
+@app.on_event("shutdown")
+async def stop_feature_store():
+    if feature_store is not None:
+        await asyncio.to_thread(feature_store.stop)
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+
+@app.on_event("startup")
+async def scan_static_assets():
+    await asyncio.to_thread(static_assets.scan)
+
+
+@app.on_event("startup")
+async def start_edit_history():
+    await asyncio.to_thread(edit_history.start)
+
+
+@app.on_event("shutdown")
+async def stop_edit_history():
+    await asyncio.to_thread(edit_history.stop)
+
+
+@app.on_event("startup")
+async def start_accuracy_table():
+    await asyncio.to_thread(accuracy_table.start)
+
+
+@app.on_event("shutdown")
+async def stop_accuracy_table():
+    await asyncio.to_thread(accuracy_table.stop)
+
+
+@app.exception_handler(ModelLoadError)
+async def model_load_error(request: Request, exc: ModelLoadError):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "30"})
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_error(request: Request, exc: QueueFullError):
+    return JSONResponse({"detail": str(exc)}, status_code=429,
+                        headers={"Retry-After": str(exc.retry_after_s)})
+
+
+@app.on_event("shutdown")
+async def stop_audio_library():
+    await asyncio.to_thread(audio_library.stop)
+
+
+@app.get("/api/audio-list")
+async def audio_list(
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=1000),
+    sort: str = Query("name"),
+    order: str = Query("asc"),
+    q: Optional[str] = Query(None),
+    has_ground_truth: Optional[bool] = Query(None),
+):
+    """
+    获取音频文件列表（来自内存索引）
+    支持分页（page / page_size，不传 page_size 返回全部）、排序（sort / order）、
+    按文件名过滤（q）及是否已有标注（has_ground_truth）；列表未变化时返回 304。
+    """
+    if sort not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort 必须是 {', '.join(SORT_FIELDS)} 之一")
+    if order not in ["asc", "desc"]:
+        raise HTTPException(status_code=400, detail="order 必须是 'asc' 或 'desc'")
+
+    etag = audio_library.etag(page, page_size, sort, order, q, has_ground_truth)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    listing = audio_library.query(page, page_size, sort, order, q, has_ground_truth)
+    return JSONResponse(listing, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 
 @app.get("/api/audio/{filename}")
-async def get_audio_file(filename: str):
-    """获取指定音频文件"""
+async def get_audio_file(filename: str, request: Request):
+    """获取指定音频文件；支持 Range（206）及 ETag / Last-Modified 条件请求（304）"""
     # 安全检查：防止路径遍历
     if ".." in filename or "/" in filename:
         raise HTTPException(status_code=400, detail="Invalid filename")
@@ -62,10 +281,10 @@ async def get_audio_file(filename: str):
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    if not filename.lower().endswith((".mp3", ".wav", ".webm", ".flac", ".m4a")):
+    if not filename.lower().endswith(AUDIO_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Invalid file type")
     
-    return FileResponse(file_path)
+    return file_response(request, file_path)
 
 
 @app.post("/api/transcribe/{model_type}")
@@ -77,96 +296,132 @@ async def transcribe_single_model(
 ):
     """
     调用单个模型进行语音识别
-    model_type: "base" 或 "personal"
+    model_type: "base"、"personal" 或 /api/models 中已注册的模型 id
     """
     # 验证 model_type
-    if model_type not in ["base", "personal"]:
-        raise HTTPException(status_code=400, detail="model_type 必须是 'base' 或 'personal'")
-    
-    if file is None and not filename:
-        raise HTTPException(status_code=400, detail="请提供上传文件或已存在的 filename")
+    if not asr_service.has_model(model_type):
+        raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
 
-    temp_path = None
-    used_filename = None
-    try:
-        if file:
-            suffix = os.path.splitext(file.filename)[1] or ".wav"
-            tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-            contents = await file.read()
-            tmpf.write(contents)
-            tmpf.flush()
-            tmpf.close()
-            audio_path = tmpf.name
-            temp_path = tmpf.name
-            used_filename = file.filename
-        else:
-            audio_path = os.path.join(VOICE_DATA_DIR, filename)
-            if not os.path.exists(audio_path):
-                raise HTTPException(status_code=404, detail="指定文件在 voice_data 中不存在")
-            used_filename = filename
+    async with audio_source(file, filename, VOICE_DATA_DIR) as source:
+        # 通过批处理调度器排队，与并发请求合并推理
+        result = await batch_scheduler.submit(source.path, model_type, source.content_hash)
+        await record_accuracy(source, {model_type: result})
 
-        # 在后台线程运行阻塞的推理
-        loop = asyncio.get_running_loop()
-        result = await asyncio.to_thread(asr_service.transcribe, audio_path, model_type)
-
-        return JSONResponse({
+        return timed_json({
             "result": result, 
             "ground_truth": ground_truth, 
-            "filename": used_filename
+            "filename": source.filename
         })
-    finally:
-        if temp_path and os.path.exists(temp_path):
+
+
+@app.post("/api/transcribe/{model_type}/long")
+async def transcribe_long_audio(
+    model_type: str,
+    filename: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None)
+):
+    """
+    长音频识别：VAD 切分后分批推理，以 NDJSON 流式返回 start / segment / progress 事件，
+    最后一行为拼接后的 result（含各片段时间戳与置信度）
+    """
+    if not asr_service.has_model(model_type):
+        raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
+
+    # 音频（含上传的临时文件）需要保留到流式响应结束
+    stack = AsyncExitStack()
+    source = await stack.enter_async_context(audio_source(
+        file, filename, VOICE_DATA_DIR,
+        max_bytes=int(LONG_AUDIO_MAX_MB * 1024 * 1024), max_duration_s=LONG_AUDIO_MAX_DURATION_S,
+    ))
+
+    async def stream():
+        try:
+            duration = source.duration
+            if duration is None:
+                duration = await asyncio.to_thread(probe_duration, source.path)
+            yield json.dumps({"type": "file", "filename": source.filename}, ensure_ascii=False) + "\n"
             try:
-                os.remove(temp_path)
-            except Exception:
-                pass
+                async for event in transcribe_long(asr_service, source.path, model_type, duration):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            await stack.aclose()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.websocket("/api/transcribe/{model_type}/stream")
+async def transcribe_stream(websocket: WebSocket, model_type: str, sample_rate: int = 16000):
+    """
+    流式语音识别（WebSocket）
+    model_type: 已注册的模型 id（含 "base"、"personal"）或 "both"
+    客户端发送 16-bit PCM 单声道二进制帧（sample_rate 指定采样率），发送 {"type": "end"} 结束；
+    服务端按 VAD 分段推送 partial / final 结果及置信度
+    """
+    if (model_type != "both" and not asr_service.has_model(model_type)) or not 8000 <= sample_rate <= 48000:
+        await websocket.close(code=1008)
+        return
+    model_types = ["base", "personal"] if model_type == "both" else [model_type]
+    await StreamingSession(asr_service, model_types, sample_rate).run(websocket)
 
 
 @app.post("/api/compare")
 async def compare_models(
     filename: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    base_model: str = Form("base"),
+    personal_model: str = Form("personal")
 ):
     """
     同时调用两个模型进行对比分析
-    返回两个模型的识别结果和统计分析
+    返回两个模型的识别结果和统计分析；base_model / personal_model 可指定其他已注册模型
     """
-    if file is None and not filename:
-        raise HTTPException(status_code=400, detail="请提供上传文件或已存在的 filename")
-
-    temp_path = None
-    used_filename = None
-    try:
-        if file:
-            suffix = os.path.splitext(file.filename)[1] or ".wav"
-            tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-            contents = await file.read()
-            tmpf.write(contents)
-            tmpf.flush()
-            tmpf.close()
-            audio_path = tmpf.name
-            temp_path = tmpf.name
-            used_filename = file.filename
-        else:
-            audio_path = os.path.join(VOICE_DATA_DIR, filename)
-            if not os.path.exists(audio_path):
-                raise HTTPException(status_code=404, detail="指定文件在 voice_data 中不存在")
-            used_filename = filename
+    for model_type in (base_model, personal_model):
+        if not asr_service.has_model(model_type):
+            raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
 
+    async with audio_source(file, filename, VOICE_DATA_DIR) as source:
         # 并行调用两个模型进行对比
-        loop = asyncio.get_running_loop()
-        comparison_result = await asyncio.to_thread(asr_service.compare_models, audio_path)
+        comparison_result = await asyncio.to_thread(
+            asr_service.compare_models, source.path, source.content_hash, base_model, personal_model
+        )
+        await record_accuracy(source, {base_model: comparison_result["base_model"],
+                                       personal_model: comparison_result["personal_model"]})
 
-        return JSONResponse({
+        return timed_json({
             "comparison": comparison_result,
-            "filename": used_filename
+            "filename": source.filename
         })
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
+
+
+@app.post("/api/cascade")
+async def cascade_transcribe(
+    filename: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    primary: str = Form(CASCADE_PRIMARY),
+    fallback: str = Form(CASCADE_FALLBACK),
+    threshold: float = Form(CASCADE_THRESHOLD)
+):
+    """
+    置信度门控的级联识别：先用 primary 识别，只把置信度低于 threshold 的片段交给 fallback，
+    返回合并后的最佳结果，每个句子和片段标明所用模型，cascade 字段给出升级比例
+    """
+    for model_type in (primary, fallback):
+        if not asr_service.has_model(model_type):
+            raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
+    if not 0.0 <= threshold <= 1.0:
+        raise HTTPException(status_code=400, detail="threshold 必须在 0 到 1 之间")
+
+    async with audio_source(file, filename, VOICE_DATA_DIR) as source:
+        result = await transcribe_cascade(asr_service, source.path, primary, fallback, threshold)
+        return timed_json({"result": result, "filename": source.filename})
+
+
+@app.get("/api/cascade/stats")
+async def cascade_statistics():
+    """级联识别累计统计：升级/替换比例、额外推理开销，以及各阈值下的预计升级比例"""
+    return cascade_stats.to_dict()
 
 
 @app.post("/api/analyze")
@@ -179,41 +434,126 @@ async def analyze(ground_truth: Optional[str] = Form(None),
     - 上传文件：包含 multipart file 字段 `file`
     必填项：至少提供 file 或 filename
     """
-    if file is None and not filename:
-        raise HTTPException(status_code=400, detail="请提供上传文件或已存在的 filename")
+    async with audio_source(file, filename, VOICE_DATA_DIR) as source:
+        # 在后台线程运行阻塞的推理
+        result = await asyncio.to_thread(asr_service.transcribe, source.path, "personal", source.content_hash)
+        await record_accuracy(source, {"personal": result})
+
+        # 返回识别与置信度结构，同时回传 ground_truth 与使用的 filename 以便前端展示对比
+        return timed_json({"result": result, "ground_truth": ground_truth, "filename": source.filename})
+
 
-    # 保存上传文件到临时文件或使用已有文件路径
-    temp_path = None
-    used_filename = None
+async def _submit_job(kind: str, priority: str, file: Optional[UploadFile], filename: Optional[str],
+                      run_with_source, meta: dict) -> JSONResponse:
+    """保存音频后提交作业，音频（含上传的临时文件）保留到作业结束"""
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority 必须是 {' 或 '.join(PRIORITIES)}")
+    stack = AsyncExitStack()
+    source = await stack.enter_async_context(audio_source(file, filename, VOICE_DATA_DIR))
     try:
-        if file:
-            suffix = os.path.splitext(file.filename)[1] or ".wav"
-            tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-            contents = await file.read()
-            tmpf.write(contents)
-            tmpf.flush()
-            tmpf.close()
-            audio_path = tmpf.name
-            temp_path = tmpf.name
-            used_filename = file.filename
-        else:
-            audio_path = os.path.join(VOICE_DATA_DIR, filename)
-            if not os.path.exists(audio_path):
-                raise HTTPException(status_code=404, detail="指定文件在 voice_data 中不存在")
-            used_filename = filename
+        job = job_queue.submit(kind, lambda: run_with_source(source), priority,
+                               cleanup=stack.aclose, meta={**meta, "filename": source.filename})
+    except BaseException:
+        await stack.aclose()
+        raise
+    return JSONResponse(
+        {**job.to_dict(), "position": job_queue.position(job),
+         "status_url": f"/api/jobs/{job.id}", "events_url": f"/api/jobs/{job.id}/events"},
+        status_code=202,
+    )
+
+
+@app.post("/api/jobs/compare")
+async def submit_compare_job(
+    filename: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    base_model: str = Form("base"),
+    personal_model: str = Form("personal"),
+    priority: str = Form("interactive")
+):
+    """
+    提交对比作业，立即返回 202 与作业 id；结果通过 GET /api/jobs/{id} 轮询
+    或 GET /api/jobs/{id}/events（SSE）获取。队列已满时返回 429 与 Retry-After。
+    """
+    for model_type in (base_model, personal_model):
+        if not asr_service.has_model(model_type):
+            raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
 
-        # 在后台线程运行阻塞的推理
-        loop = asyncio.get_running_loop()
-        result = await asyncio.to_thread(asr_service.transcribe, audio_path, False)
+    async def run(source):
+        comparison = await asyncio.to_thread(
+            asr_service.compare_models, source.path, source.content_hash, base_model, personal_model
+        )
+        await record_accuracy(source, {base_model: comparison["base_model"],
+                                       personal_model: comparison["personal_model"]})
+        return {"comparison": comparison, "filename": source.filename}
+
+    return await _submit_job("compare", priority, file, filename, run,
+                             {"base_model": base_model, "personal_model": personal_model})
+
+
+@app.post("/api/jobs/transcribe/{model_type}")
+async def submit_transcribe_job(
+    model_type: str,
+    filename: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    priority: str = Form("interactive")
+):
+    """提交单模型识别作业（经批处理调度器推理），用法同 /api/jobs/compare"""
+    if not asr_service.has_model(model_type):
+        raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
+
+    async def run(source):
+        result = await batch_scheduler.submit(source.path, model_type, source.content_hash)
+        await record_accuracy(source, {model_type: result})
+        return {"result": result, "filename": source.filename}
+
+    return await _submit_job("transcribe", priority, file, filename, run, {"model_type": model_type})
 
-        # 返回识别与置信度结构，同时回传 ground_truth 与使用的 filename 以便前端展示对比
-        return JSONResponse({"result": result, "ground_truth": ground_truth, "filename": used_filename})
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
+
+def _get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="作业不存在或结果已过期")
+    return job
+
+
+@app.get("/api/jobs")
+async def job_stats():
+    """作业队列统计"""
+    return job_queue.stats()
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """作业状态；完成后包含 result"""
+    job = _get_job(job_id)
+    return encode_response({**job.to_dict(), "position": job_queue.position(job)}, response_options.get())
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """以 Server-Sent Events 推送作业状态变化，作业结束后推送最终结果并关闭"""
+    job = _get_job(job_id)
+
+    async def stream():
+        async for state in job_queue.events(job):
+            if state is None:
+                yield ": keep-alive\n\n"
+                continue
+            state["position"] = job_queue.position(job)
+            event = "result" if "result" in state or state["status"] in ("failed", "cancelled") else "status"
+            yield f"event: {event}\ndata: {json.dumps(state, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消排队或运行中的作业；运行中的作业返回 cancelling，结束后变为 cancelled"""
+    _get_job(job_id)
+    job = await job_queue.cancel(job_id)
+    return job.to_dict(include_result=False)
 
 
 @app.post("/api/save-edits")
@@ -221,58 +561,351 @@ async def save_edits(payload: dict = Body(...)):
     """
     Persist edited ground truth and save edit history.
     Expected payload: { "filename": "...", "ground_truth": "...", "edits": {...} }
+    标注文件原子替换，同时在编辑历史中追加一个修订。
     """
     filename = payload.get("filename")
     ground_truth = payload.get("ground_truth")
     edits = payload.get("edits", {})
     if not filename:
         raise HTTPException(status_code=400, detail="必须指定 filename（voice_data 目录下的文件名）")
+    if ".." in filename or "/" in filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
 
-    base, _ = os.path.splitext(filename)
-    gt_path = os.path.join(VOICE_DATA_DIR, f"{base}.txt")
     try:
-        # 写入 ground truth（覆盖）
-        with open(gt_path, "w", encoding="utf-8") as fh:
-            fh.write(ground_truth or "")
-
-        # 保存历史记录
-        hist_dir = os.path.join(VOICE_DATA_DIR, "edits_history")
-        os.makedirs(hist_dir, exist_ok=True)
-        timestamp = datetime.utcnow().isoformat().replace(":", "-")
-        hist_path = os.path.join(hist_dir, f"{base}_{timestamp}.json")
-        history = {
-            "filename": filename,
-            "ground_truth": ground_truth,
-            "edits": edits,
-            "saved_at": datetime.utcnow().isoformat(),
-        }
-        with open(hist_path, "w", encoding="utf-8") as hf:
-            json.dump(history, hf, ensure_ascii=False, indent=2)
-
-        return {"ok": True, "gt_path": gt_path, "history_path": hist_path}
+        revision = await asyncio.to_thread(edit_history.save, filename, ground_truth or "", edits)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    gt_path = edit_history.gt_path(filename)
+    audio_library.notify_changed(os.path.basename(gt_path))
+    # 已有识别结果用新标注重新评分，无需推理
+    rescored = await asyncio.to_thread(accuracy_table.rescore, filename, ground_truth or "")
+    return {"ok": True, "gt_path": gt_path, **revision, "rescored": rescored}
+
+
+def _get_revision(filename: str, revision: Optional[int] = None):
+    if ".." in filename or "/" in filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    rev = edit_history.get(filename, revision)
+    if rev is None:
+        raise HTTPException(status_code=404, detail="该文件没有对应的标注修订")
+    return rev
+
+
+@app.get("/api/edits/{filename}/revisions")
+async def list_revisions(filename: str, limit: int = Query(50, ge=1, le=500), before: Optional[int] = None):
+    """文件的标注修订列表（新到旧），before 传上一页最后一个修订号翻页"""
+    if ".." in filename or "/" in filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    revisions = await asyncio.to_thread(edit_history.revisions, filename, limit, before)
+    return {
+        "filename": filename,
+        "revisions": revisions,
+        "next_before": revisions[-1]["revision"] if len(revisions) == limit else None,
+    }
+
+
+@app.get("/api/edits/{filename}/revisions/{revision}")
+async def get_revision(filename: str, revision: int):
+    """单个修订的完整内容（ground truth 与 edits）"""
+    return await asyncio.to_thread(_get_revision, filename, revision)
+
+
+@app.get("/api/edits/{filename}/diff")
+async def diff_revisions(filename: str, from_rev: Optional[int] = Query(None, alias="from"),
+                         to_rev: Optional[int] = Query(None, alias="to")):
+    """
+    两个修订之间 ground truth 的逐字差异。
+    to 默认为最新修订，from 默认为 to 的上一个修订。
+    """
+    def load():
+        new = _get_revision(filename, to_rev)
+        old = _get_revision(filename, from_rev) if from_rev is not None \
+            else edit_history.previous(filename, new["revision"])
+        if old is None:
+            old = {"revision": None, "saved_at": None, "saved_at_iso": None, "length": 0, "ground_truth": ""}
+        return edit_history.diff(old, new)
+
+    return timed_json(await asyncio.to_thread(load))
+
+
+@app.post("/api/admin/edits/compact")
+async def compact_edit_history(payload: dict = Body({})):
+    """
+    压缩编辑历史。
+    Expected payload: { "keep": 20, "max_age_days": 90 }（均可省略，默认取环境变量配置）
+    每个文件保留最近 keep 个修订，其余早于 max_age_days 天的修订被删除。
+    """
+    kwargs = {}
+    if payload.get("keep") is not None:
+        kwargs["keep"] = int(payload["keep"])
+    if payload.get("max_age_days") is not None:
+        kwargs["max_age_days"] = float(payload["max_age_days"])
+    return await asyncio.to_thread(edit_history.compact, **kwargs)
+
+
+@app.get("/api/admin/edits")
+async def edit_history_stats():
+    """编辑历史存储统计：修订数、文件数、数据库大小"""
+    return await asyncio.to_thread(edit_history.stats)
+
+
+@app.post("/api/accuracy/refresh")
+async def submit_accuracy_refresh(payload: dict = Body({})):
+    """
+    同步准确率表与 voice_data 当前状态（作业方式执行，立即返回 202 与作业 id）。
+    Expected payload: { "models": ["base", "personal"], "concurrency": 2, "priority": "batch" }
+    只对缺少结果、音频或模型权重变化的条目推理；只有标注变化的条目直接重新评分。
+    """
+    models = payload.get("models") or ["base", "personal"]
+    unknown = [mt for mt in models if not asr_service.has_model(mt)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的模型: {', '.join(unknown)}")
+    priority = payload.get("priority") or "batch"
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority 必须是 {' 或 '.join(PRIORITIES)}")
+    concurrency = int(payload.get("concurrency") or 2)
+
+    async def run():
+        return await refresh_accuracy(accuracy_table, asr_service, batch_scheduler.submit, models, concurrency)
+
+    job = job_queue.submit("accuracy_refresh", run, priority, meta={"models": models})
+    return JSONResponse(
+        {**job.to_dict(), "position": job_queue.position(job),
+         "status_url": f"/api/jobs/{job.id}", "events_url": f"/api/jobs/{job.id}/events"},
+        status_code=202,
+    )
+
+
+@app.get("/api/accuracy/leaderboard")
+async def accuracy_leaderboard():
+    """各模型在 voice_data 上的聚合准确率（直接由准确率表计算，不触发推理）"""
+    return timed_json({"models": await asyncio.to_thread(accuracy_table.leaderboard)})
+
+
+@app.get("/api/accuracy/files")
+async def accuracy_files(
+    model: Optional[str] = None,
+    sort: str = "filename",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=1000),
+):
+    """每个文件、每个模型的识别文本、置信度与 CER；sort=cer 时错误率高的在前"""
+    if sort not in ["filename", "cer"]:
+        raise HTTPException(status_code=400, detail="sort 必须是 'filename' 或 'cer'")
+    model_id = None
+    if model:
+        if not asr_service.has_model(model):
+            raise HTTPException(status_code=400, detail=f"未知的 model_type: {model}")
+        model_id = asr_service.registry.resolve(model)
+    rows = await asyncio.to_thread(accuracy_table.files, model_id, page_size, (page - 1) * page_size, sort)
+    return timed_json({**rows, "page": page, "page_size": page_size})
+
+
+@app.post("/api/evaluate")
+async def evaluate(payload: dict = Body(...)):
+    """
+    对 voice_data 全量音频进行评测，以 NDJSON 流式返回每个文件的结果与累计指标。
+    Expected payload: { "models": ["base", "personal"], "concurrency": 2, "run_id": "..." }
+    相同 run_id 的评测会从上次中断处续跑（结果保存在 voice_data/evaluations/<run_id>.ndjson）；
+    续跑时 models 新增的模型会对已完成的文件补跑。
+    """
+    models = payload.get("models") or ["base", "personal"]
+    unknown = [mt for mt in models if not asr_service.has_model(mt)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的模型: {', '.join(unknown)}")
+    concurrency = int(payload.get("concurrency") or 2)
+    run_id = payload.get("run_id") or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    if ".." in run_id or "/" in run_id:
+        raise HTTPException(status_code=400, detail="Invalid run_id")
+    out_path = os.path.join(VOICE_DATA_DIR, "evaluations", f"{run_id}.ndjson")
+
+    async def stream():
+        yield json.dumps({"type": "run", "run_id": run_id}, ensure_ascii=False) + "\n"
+        # 经批处理调度器提交，并发评测的文件可合并推理
+        async for event in run_evaluation(batch_scheduler.submit, VOICE_DATA_DIR, models,
+                                          out_path, concurrency, resume=True):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/batching/stats")
+async def batching_stats():
+    """微批处理调度器统计：队列深度、批大小分布、排队等待时间"""
+    return batch_scheduler.stats()
+
+
+@app.get("/api/admin/cache")
+async def cache_stats():
+    """识别结果缓存统计"""
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@app.get("/api/admin/feature-store")
+async def feature_store_stats():
+    """预解码音频存储统计：条目数、占用空间、命中率及节省的解码时间"""
+    if feature_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(feature_store.stats)}
+
+
+@app.post("/api/admin/cache/invalidate")
+async def cache_invalidate(payload: dict = Body(...)):
+    """
+    失效识别结果缓存。
+    Expected payload: { "filename": "...", "model_type": "base" | "personal" | <模型 id> }
+    两者至少提供一个；同时提供时只失效该文件在该模型下的结果。
+    """
+    if result_cache is None:
+        raise HTTPException(status_code=400, detail="结果缓存未启用")
+
+    filename = payload.get("filename")
+    model_type = payload.get("model_type")
+    if not filename and not model_type:
+        raise HTTPException(status_code=400, detail="必须指定 filename 或 model_type")
+    if model_type and not asr_service.has_model(model_type):
+        raise HTTPException(status_code=400, detail=f"未知的 model_type: {model_type}")
+
+    content_hash = None
+    if filename:
+        if ".." in filename or "/" in filename:
+            raise HTTPException(status_code=400, detail="Invalid filename")
+        audio_path = os.path.join(VOICE_DATA_DIR, filename)
+        if not os.path.exists(audio_path):
+            raise HTTPException(status_code=404, detail="指定文件在 voice_data 中不存在")
+        content_hash = await asyncio.to_thread(result_cache.hasher.hash_file, audio_path)
+        result_cache.hasher.forget(audio_path)
+
+    model_key = ResultCache.model_key(asr_service.model_identity(model_type)) if model_type else None
+    removed = result_cache.invalidate(content_hash=content_hash, model_key=model_key)
+    return {"ok": True, "removed": removed, "content_hash": content_hash}
+
+
+def _collect_queue_depths():
+    for model_type, depth in asr_service.executor_queue_depths().items():
+        EXECUTOR_QUEUE_DEPTH.set(depth, model=model_type)
+    for model_type, depth in batch_scheduler.queue_depths().items():
+        BATCH_QUEUE_DEPTH.set(depth, model=model_type)
+    asr_service.registry.stats()
+
+
+REGISTRY.add_collector(_collect_queue_depths)
+
+
+@app.get("/api/admin/profiling")
+async def profiling_stats():
+    """性能剖析配置与统计"""
+    return profiler.stats()
+
+
+@app.post("/api/admin/profiling")
+async def configure_profiling(payload: dict = Body({})):
+    """调整在线流量采样：rate（0-1，0 关闭）、mode（cprofile / sample / torch）、max_files（保留的结果数）"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=409, detail="性能剖析未开启（设置 ASR_PROFILING_ENABLED=1 后重启服务）")
+    try:
+        profiler.configure(
+            rate=float(payload["rate"]) if payload.get("rate") is not None else None,
+            mode=payload.get("mode"),
+            max_files=int(payload["max_files"]) if payload.get("max_files") is not None else None,
+        )
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.stats()
+
+
+@app.get("/api/admin/profiles")
+async def list_profiles(trigger: Optional[str] = Query(None, regex="^(request|live)$"),
+                        limit: int = Query(100, ge=1, le=1000)):
+    """最近的剖析结果（按时间倒序）"""
+    return {"profiles": await asyncio.to_thread(profiler.list, trigger, limit)}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """下载一次剖析的全部文件（zip：meta.json 与 profile.pstats / stacks.folded / torch-trace-*.json）"""
+    data = await asyncio.to_thread(profiler.archive, profile_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"剖析结果不存在: {profile_id}")
+    return Response(data, media_type="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.zip"'})
+
+
+@app.get("/api/models")
+async def list_models():
+    """已注册的模型（重新扫描模型目录）、别名、各模型的推理后端及常驻/淘汰统计"""
+    registry = asr_service.registry
+    await asyncio.to_thread(registry.discover)
+    return {
+        "models": list(registry.status().values()),
+        "aliases": dict(registry.aliases),
+        "backends": {model_id: asr_service.backend_name(model_id) for model_id in registry.ids()},
+        "stats": registry.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 格式的指标"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/api/health")
 async def health_check():
     """健康检查接口"""
-    return {"status": "healthy", "models_loaded": True}
+    return {
+        "status": "healthy",
+        "models_loaded": asr_service.is_ready(),
+        "models": asr_service.load_status(),
+        "worker_pool": asr_service.worker_pool.status() if asr_service.worker_pool else None,
+    }
+
+
+@app.get("/api/health/live")
+async def liveness():
+    """存活检查：进程能响应请求即返回 200"""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+async def readiness():
+    """
+    就绪检查：全部模型加载完成时返回 200，否则 503 并给出各模型加载状态；
+    lazy 模式下模型在首次请求时加载，尚未加载（pending）不影响就绪
+    """
+    ready = asr_service.is_ready(lazy=MODEL_LOADING == "lazy" and asr_service.worker_pool is None)
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "loading": MODEL_LOADING,
+         "models": asr_service.load_status()},
+        status_code=200 if ready else 503,
+    )
 
 
 @app.get("/")
-async def index():
-    """返回前端页面"""
-    html_path = os.path.join(os.path.dirname(__file__), "static", "index.html")
-    if os.path.exists(html_path):
-        return HTMLResponse(open(html_path, "r", encoding="utf-8").read())
+async def index(request: Request):
+    """返回前端页面（内存缓存，带 ETag）"""
+    response = static_assets.response(request, "index.html")
+    if response is not None:
+        return response
     return HTMLResponse("<html><body><h3>ASR Model Comparison System</h3><p>请访问 /static/index.html 或部署前端页面</p></body></html>")
 
 
 @app.get("/static/{path:path}")
-async def static_files(path: str):
-    """提供静态文件服务"""
-    file_path = os.path.join(os.path.dirname(__file__), "static", path)
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        return FileResponse(file_path)
-    return HTMLResponse(f"<html><body><h3>文件未找到: {path}</h3></body></html>")
\ No newline at end of file
+async def static_files(path: str, request: Request):
+    """
+    提供静态文件服务：文件索引和小文件内容在内存中；有 .br / .gz 预压缩版本时按 Accept-Encoding 提供，
+    带内容哈希的文件名使用长期 immutable 缓存，其他文件每次用 ETag 验证
+    """
+    response = static_assets.response(request, path)
+    if response is not None:
+        return response
+    return HTMLResponse(f"<html><body><h3>文件未找到: {path}</h3></body></html>", status_code=404)
+
+
+@app.post("/api/admin/static/reload")
+async def reload_static_assets():
+    """重新扫描静态目录（重新构建前端后调用）"""
+    await asyncio.to_thread(static_assets.scan)
+    return {"ok": True, "root": static_assets.root}
\ No newline at end of file
@@ -0,0 +1,299 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.metrics import Counter, Gauge, REGISTRY
+
+
+# 模型根目录：每个子目录（或其下的 SenseVoiceSmall/）包含 model.pt 即视为一个可用模型
+MODELS_DIR = os.environ.get("ASR_MODELS_DIR", "/root/demo_1_confidence")
+# 常驻模型的内存预算（MB），0 表示不限制
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("ASR_MODEL_MEMORY_BUDGET_MB", "0"))
+# 常驻内存估算 = 权重文件大小 * 该系数
+MODEL_MEMORY_FACTOR = float(os.environ.get("ASR_MODEL_MEMORY_FACTOR", "1.5"))
+
+MODEL_LOADS = REGISTRY.register(Counter(
+    "asr_model_loads_total", "Model loads by outcome", ("model", "outcome")))
+MODEL_EVICTIONS = REGISTRY.register(Counter(
+    "asr_model_evictions_total", "Models evicted to stay within the memory budget", ("model",)))
+MODEL_LOOKUPS = REGISTRY.register(Counter(
+    "asr_model_lookups_total", "Model acquisitions by whether the model was resident", ("model", "result")))
+MODEL_RESIDENT_MB = REGISTRY.register(Gauge(
+    "asr_model_resident_mb", "Estimated memory of resident models", ()))
+
+
+class ModelLoadError(RuntimeError):
+    """模型加载失败（请求时可重试）"""
+
+
+class UnknownModelError(KeyError):
+    """model_type 不是已注册的模型 id 或别名"""
+
+
+def find_checkpoint(path: str) -> Optional[str]:
+    """返回目录中包含 model.pt 的模型路径（目录本身或其 SenseVoiceSmall/ 子目录）"""
+    for candidate in (path, os.path.join(path, "SenseVoiceSmall")):
+        if os.path.isfile(os.path.join(candidate, "model.pt")):
+            return candidate
+    return None
+
+
+def model_name_for(path: str) -> str:
+    """由模型路径得到模型名：.../xu_zhuxi_model/SenseVoiceSmall -> xu_zhuxi_model"""
+    path = os.path.normpath(path)
+    if os.path.basename(path) == "SenseVoiceSmall":
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+
+class _ModelEntry:
+    def __init__(self, model_id: str, path: str):
+        self.id = model_id
+        self.path = path
+        self.model: Any = None
+        self.state = "pending"  # pending / loading / ready / failed / evicted
+        self.error: Optional[str] = None
+        self.load_time_s: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.in_use = 0
+        self.load_lock = threading.Lock()
+
+    def estimated_mb(self) -> float:
+        try:
+            size = os.path.getsize(os.path.join(self.path, "model.pt"))
+        except OSError:
+            return 0.0
+        return size / (1024 * 1024) * MODEL_MEMORY_FACTOR
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "state": self.state,
+            "resident": self.model is not None,
+            "estimated_mb": round(self.estimated_mb(), 1),
+            "load_time_s": self.load_time_s,
+            "error": self.error,
+            "last_used": self.last_used,
+            "in_use": self.in_use,
+        }
+
+
+class ModelRegistry:
+    """
+    模型注册表：从 models_dir 发现 SenseVoice 微调模型，任意已注册 id（或别名）
+    均可作为 model_type 使用。
+
+    模型按需加载；常驻模型的估算内存超出 memory_budget_mb 时，
+    按最近最少使用（LRU）淘汰当前未在推理中的模型。
+    """
+
+    def __init__(self, loader: Callable[[str], Any],
+                 models_dir: Optional[str] = MODELS_DIR,
+                 memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB):
+        self.loader = loader
+        self.models_dir = models_dir
+        self.memory_budget_mb = memory_budget_mb
+        self.aliases: Dict[str, str] = {}
+        self._entries: Dict[str, _ModelEntry] = {}
+        # 常驻模型，按最近使用排序（末尾为最新）
+        self._resident: "OrderedDict[str, _ModelEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+        self.discover()
+
+    # ---- 注册与发现 ----
+
+    def register(self, path: str, model_id: Optional[str] = None, aliases: List[str] = ()) -> str:
+        model_id = model_id or model_name_for(path)
+        with self._lock:
+            entry = self._entries.get(model_id)
+            if entry is None:
+                self._entries[model_id] = _ModelEntry(model_id, path)
+            for alias in aliases:
+                self.aliases[alias] = model_id
+        return model_id
+
+    def discover(self) -> List[str]:
+        """扫描 models_dir，注册新出现的模型，返回新增的 id"""
+        added = []
+        if not self.models_dir or not os.path.isdir(self.models_dir):
+            return added
+        for name in sorted(os.listdir(self.models_dir)):
+            if name.startswith("."):
+                continue
+            path = find_checkpoint(os.path.join(self.models_dir, name))
+            if path is None:
+                continue
+            with self._lock:
+                if name not in self._entries:
+                    self._entries[name] = _ModelEntry(name, path)
+                    added.append(name)
+        return added
+
+    def resolve(self, model_id: str) -> str:
+        """别名或 id -> 规范 id，未注册时抛出 UnknownModelError"""
+        model_id = self.aliases.get(model_id, model_id)
+        if model_id not in self._entries:
+            raise UnknownModelError(model_id)
+        return model_id
+
+    def has(self, model_id: str) -> bool:
+        try:
+            self.resolve(model_id)
+        except UnknownModelError:
+            return False
+        return True
+
+    def path_of(self, model_id: str) -> str:
+        return self._entries[self.resolve(model_id)].path
+
+    def ids(self) -> List[str]:
+        return sorted(self._entries)
+
+    # ---- 加载与淘汰 ----
+
+    def _resident_mb(self) -> float:
+        return sum(e.estimated_mb() for e in self._resident.values())
+
+    def _make_room(self, needed_mb: float):
+        """淘汰最久未使用且未在推理中的模型，直到能容纳 needed_mb"""
+        if self.memory_budget_mb <= 0:
+            return
+        with self._lock:
+            evictions_before = self.evictions
+            for model_id in list(self._resident):
+                if self._resident_mb() + needed_mb <= self.memory_budget_mb:
+                    break
+                entry = self._resident[model_id]
+                if entry.in_use:
+                    continue
+                del self._resident[model_id]
+                entry.model = None
+                entry.state = "evicted"
+                self.evictions += 1
+                MODEL_EVICTIONS.inc(model=model_id)
+                print(f"ModelRegistry: evicted {model_id} ({entry.estimated_mb():.0f} MB)")
+            evicted = self.evictions != evictions_before
+            if self._resident_mb() + needed_mb > self.memory_budget_mb:
+                print(f"ModelRegistry: memory budget {self.memory_budget_mb:.0f} MB exceeded, "
+                      f"all resident models are in use")
+        if evicted:
+            _release_device_memory()
+
+    def load(self, model_id: str) -> _ModelEntry:
+        """确保模型常驻（必要时先淘汰其他模型）；并发调用时只加载一次"""
+        entry = self._entries[self.resolve(model_id)]
+        with entry.load_lock:
+            if entry.model is not None:
+                return entry
+            self._make_room(entry.estimated_mb())
+            entry.state = "loading"
+            entry.error = None
+            load_start = time.time()
+            print(f"  Loading {entry.id} model from: {entry.path}")
+            try:
+                model = self.loader(entry.path)
+            except Exception as e:
+                entry.state = "failed"
+                entry.error = str(e)
+                entry.load_time_s = round(time.time() - load_start, 2)
+                MODEL_LOADS.inc(model=entry.id, outcome="failed")
+                print(f"  Failed to load {entry.id} model: {e}")
+                raise ModelLoadError(f"{entry.id} 模型加载失败: {e}") from e
+            entry.load_time_s = round(time.time() - load_start, 2)
+            with self._lock:
+                entry.model = model
+                entry.state = "ready"
+                self._resident[entry.id] = entry
+                self.loads += 1
+            MODEL_LOADS.inc(model=entry.id, outcome="ok")
+            print(f"  {entry.id} model loaded in {entry.load_time_s:.2f}s")
+        return entry
+
+    @contextmanager
+    def acquire(self, model_id: str) -> Iterator[Any]:
+        """取得模型实例用于推理；使用期间该模型不会被淘汰"""
+        model_id = self.resolve(model_id)
+        with self._lock:
+            entry = self._entries[model_id]
+            # 先占用再加载，避免刚加载完就被并发加载的其他模型淘汰
+            entry.in_use += 1
+            resident = entry.model is not None
+            if resident:
+                self.hits += 1
+            else:
+                self.misses += 1
+        MODEL_LOOKUPS.inc(model=model_id, result="hit" if resident else "miss")
+        try:
+            self.load(model_id)
+            with self._lock:
+                entry.last_used = time.time()
+                if model_id in self._resident:
+                    self._resident.move_to_end(model_id)
+                model = entry.model
+            yield model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+
+    def start_loading(self, model_ids: List[str]) -> List[threading.Thread]:
+        """在后台线程中并行加载指定模型，立即返回"""
+        threads = []
+        for model_id in model_ids:
+            entry = self._entries[self.resolve(model_id)]
+            if entry.model is not None or entry.state == "loading":
+                continue
+            thread = threading.Thread(target=self._load_quietly, args=(entry.id,),
+                                      name=f"asr-load-{entry.id}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _load_quietly(self, model_id: str):
+        try:
+            self.load(model_id)
+        except ModelLoadError:
+            # 失败已记录在加载状态中，下次请求时会重试
+            pass
+
+    # ---- 状态 ----
+
+    def status(self, model_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if model_ids is None:
+                return {mid: e.to_dict() for mid, e in sorted(self._entries.items())}
+            return {mid: self._entries[self.resolve(mid)].to_dict() for mid in model_ids}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            resident_mb = self._resident_mb()
+            MODEL_RESIDENT_MB.set(resident_mb)
+            return {
+                "memory_budget_mb": self.memory_budget_mb,
+                "resident_mb": round(resident_mb, 1),
+                "resident": list(self._resident),
+                "registered": len(self._entries),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+def _release_device_memory():
+    """淘汰模型后释放 CUDA 缓存（未安装 torch 或无 GPU 时忽略）"""
+    try:
+        import torch
+    except ImportError:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
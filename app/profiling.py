@@ -0,0 +1,378 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import functools
+import random
+import pstats
+import shutil
+import cProfile
+import zipfile
+import threading
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.metrics import Counter, REGISTRY
+
+try:
+    import torch
+    from torch.profiler import ProfilerActivity, profile as torch_profile
+except ImportError:  # 可选依赖：未安装 torch 时不提供 torch 模式
+    torch = None
+
+
+# 按需性能剖析配置，可通过环境变量调整。默认关闭（请求头 / 查询参数与在线采样均被忽略），
+# 设为 1 开启：开启后任何客户端都能触发剖析，只应在排查期间开启（见 DEPLOYMENT.md）
+PROFILING_ENABLED = os.environ.get("ASR_PROFILING_ENABLED", "0") != "0"
+PROFILE_DIR = os.environ.get("ASR_PROFILE_DIR", "/root/demo_1_confidence/.asr_profiles")
+# 保留的剖析结果个数（按需请求与在线采样分别计数），超出后删除最旧的
+PROFILE_MAX_FILES = int(os.environ.get("ASR_PROFILE_MAX_FILES", "50"))
+# 采样模式的采样间隔
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("ASR_PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# 在线流量采样：按该比例对请求做剖析（0 关闭，可通过管理接口调整）
+PROFILE_LIVE_RATE = float(os.environ.get("ASR_PROFILE_LIVE_RATE", "0"))
+PROFILE_LIVE_MODE = os.environ.get("ASR_PROFILE_LIVE_MODE", "sample")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_MODES = ("cprofile", "sample", "torch")
+
+PROFILES_CAPTURED = REGISTRY.register(Counter(
+    "asr_profiles_captured_total", "Profiles captured by mode and trigger (request / live)", ("mode", "trigger")))
+
+# 采样模式中视为空闲的栈顶函数（等待队列、锁或 IO 的线程不计入）
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("connection.py", "_recv"),
+    ("connection.py", "_poll"),
+}
+
+
+class Capture:
+    """一次剖析：覆盖一个请求从开始到响应的时间窗口"""
+
+    def __init__(self, mode: str, trigger: str, method: str, path: str):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.mode = mode
+        self.trigger = trigger
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.profiles: List[cProfile.Profile] = []
+        self.stacks: StackCounter = StackCounter()
+        self.samples = 0
+        self.torch_traces: List[Dict[str, Any]] = []
+
+    def add_profile(self, profiler: cProfile.Profile):
+        with self._lock:
+            self.profiles.append(profiler)
+
+    def add_stacks(self, stacks: List[str]):
+        with self._lock:
+            self.samples += 1
+            self.stacks.update(stacks)
+
+    def add_torch_trace(self, trace: Dict[str, Any]):
+        with self._lock:
+            self.torch_traces.append(trace)
+
+
+def _stack_of(frame) -> Optional[str]:
+    """把帧链转为折叠栈（root;...;leaf）；空闲线程返回 None"""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+        return None
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """
+    按需性能剖析，覆盖一个请求的时间窗口：
+    - cprofile: 推理线程（transcribe_batch / compare_models 所在线程）中启用 cProfile，结果合并为一份 pstats
+    - sample: 后台线程按 PROFILE_SAMPLE_INTERVAL_MS 采样进程内所有非空闲线程的调用栈，输出折叠栈（火焰图）
+    - torch: 推理线程中启用 torch.profiler，输出 Chrome trace（同一时间只跟踪一个推理）
+
+    剖析的是时间窗口而非请求本身：并发请求在同一窗口内的推理同样计入。
+    使用 worker 进程（ASR_WORKER_PROCESSES）时模型前向在子进程中执行，不在剖析范围内。
+    未启用任何剖析时 section() 只检查一个空列表，开销可以忽略。
+    """
+
+    def __init__(self, root: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES,
+                 live_rate: float = PROFILE_LIVE_RATE, live_mode: str = PROFILE_LIVE_MODE,
+                 sample_interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS, enabled: bool = PROFILING_ENABLED):
+        self.root = root
+        self.max_files = max_files
+        self.live_rate = live_rate
+        self.live_mode = live_mode
+        self.sample_interval_ms = sample_interval_ms
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._active: List[Capture] = []
+        self._local = threading.local()
+        self._sampler: Optional[threading.Thread] = None
+        self._torch_lock = threading.Lock()
+        self.captured = 0
+
+    # ---- 触发 ----
+
+    def requested_mode(self, headers, query) -> Optional[str]:
+        """请求头 X-Profile 或查询参数 profile 指定的模式；无效时抛出 ValueError"""
+        if not self.enabled:
+            return None
+        mode = headers.get(PROFILE_HEADER) or query.get("profile")
+        if not mode:
+            return None
+        mode = mode.strip().lower()
+        if mode in ("1", "true", "yes"):
+            mode = "cprofile"
+        self.check_mode(mode)
+        return mode
+
+    def check_mode(self, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"profile 必须是 {' / '.join(PROFILE_MODES)} 之一")
+        if mode == "torch" and torch is None:
+            raise ValueError("未安装 torch，无法使用 torch 模式")
+
+    def live_sample(self) -> Optional[str]:
+        if not self.enabled or self.live_rate <= 0 or random.random() >= self.live_rate:
+            return None
+        return self.live_mode
+
+    def configure(self, rate: Optional[float] = None, mode: Optional[str] = None,
+                  max_files: Optional[int] = None):
+        """调整在线流量采样；参数无效时抛出 ValueError"""
+        if rate is not None and not 0 <= rate <= 1:
+            raise ValueError("rate 必须在 [0, 1] 内")
+        if mode is not None:
+            self.check_mode(mode)
+        if max_files is not None and max_files < 1:
+            raise ValueError("max_files 必须大于 0")
+        with self._lock:
+            if rate is not None:
+                self.live_rate = rate
+            if mode is not None:
+                self.live_mode = mode
+            if max_files is not None:
+                self.max_files = max_files
+
+    # ---- 采集 ----
+
+    def begin(self, mode: str, trigger: str, method: str, path: str) -> Capture:
+        capture = Capture(mode, trigger, method, path)
+        with self._lock:
+            self._active = self._active + [capture]
+            if mode == "sample" and (self._sampler is None or not self._sampler.is_alive()):
+                self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+                self._sampler.start()
+        return capture
+
+    def end(self, capture: Capture, status: int, timings: Optional[Dict[str, float]] = None) -> str:
+        """结束采集并写出结果文件，返回结果目录"""
+        with self._lock:
+            self._active = [c for c in self._active if c is not capture]
+        elapsed_ms = (time.time() - capture.started) * 1000
+        directory = self._write(capture, status, elapsed_ms, timings or {})
+        PROFILES_CAPTURED.inc(mode=capture.mode, trigger=capture.trigger)
+        with self._lock:
+            self.captured += 1
+        self._rotate(os.path.dirname(directory))
+        return directory
+
+    @contextmanager
+    def section(self) -> Iterator[None]:
+        """
+        推理路径上的剖析点（在执行推理的线程中调用）：有 cprofile / torch 剖析进行时
+        在当前线程中启用对应的剖析器；同一线程内嵌套的 section 只由最外层负责
+        """
+        active = self._active
+        if not active or getattr(self._local, "depth", 0):
+            yield
+            return
+        cprofiled = [c for c in active if c.mode == "cprofile"]
+        traced = [c for c in active if c.mode == "torch"]
+        if not cprofiled and not traced:
+            yield
+            return
+        self._local.depth = 1
+        profiler = cProfile.Profile() if cprofiled else None
+        tracer = None
+        if traced and self._torch_lock.acquire(blocking=False):
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            tracer = torch_profile(activities=activities, record_shapes=True)
+            tracer.__enter__()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                for capture in cprofiled:
+                    capture.add_profile(profiler)
+            if tracer is not None:
+                try:
+                    tracer.__exit__(None, None, None)
+                    path = os.path.join(self.root, f".trace-{uuid.uuid4().hex}.json")
+                    os.makedirs(self.root, exist_ok=True)
+                    tracer.export_chrome_trace(path)
+                    with open(path, "r", encoding="utf-8") as fh:
+                        trace = json.load(fh)
+                    os.remove(path)
+                    for capture in traced:
+                        capture.add_torch_trace(trace)
+                finally:
+                    self._torch_lock.release()
+            self._local.depth = 0
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            active = [c for c in self._active if c.mode == "sample"]
+            if not active:
+                with self._lock:
+                    if not any(c.mode == "sample" for c in self._active):
+                        self._sampler = None
+                        return
+                continue
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _stack_of(frame)
+                if stack is not None:
+                    stacks.append(stack)
+            for capture in active:
+                capture.add_stacks(stacks)
+            time.sleep(self.sample_interval_ms / 1000)
+
+    # ---- 输出 ----
+
+    def _write(self, capture: Capture, status: int, elapsed_ms: float, timings: Dict[str, float]) -> str:
+        directory = os.path.join(self.root, capture.trigger, capture.id)
+        os.makedirs(directory, exist_ok=True)
+        meta: Dict[str, Any] = {
+            "id": capture.id,
+            "mode": capture.mode,
+            "trigger": capture.trigger,
+            "method": capture.method,
+            "path": capture.path,
+            "status": status,
+            "started_at": capture.started,
+            "duration_ms": round(elapsed_ms, 2),
+            "timings_ms": timings,
+        }
+        if capture.mode == "cprofile":
+            meta["profiled_sections"] = len(capture.profiles)
+            if capture.profiles:
+                stats = pstats.Stats(capture.profiles[0])
+                for profiler in capture.profiles[1:]:
+                    stats.add(profiler)
+                stats.dump_stats(os.path.join(directory, "profile.pstats"))
+                text = io.StringIO()
+                stats.stream = text
+                stats.sort_stats("cumulative").print_stats(60)
+                with open(os.path.join(directory, "profile.txt"), "w", encoding="utf-8") as fh:
+                    fh.write(text.getvalue())
+        elif capture.mode == "sample":
+            meta["samples"] = capture.samples
+            meta["interval_ms"] = self.sample_interval_ms
+            with open(os.path.join(directory, "stacks.folded"), "w", encoding="utf-8") as fh:
+                for stack, count in capture.stacks.most_common():
+                    fh.write(f"{stack} {count}\n")
+        elif capture.mode == "torch":
+            meta["traces"] = len(capture.torch_traces)
+            for i, trace in enumerate(capture.torch_traces):
+                with open(os.path.join(directory, f"torch-trace-{i}.json"), "w", encoding="utf-8") as fh:
+                    json.dump(trace, fh)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, ensure_ascii=False, indent=2)
+        return directory
+
+    def _rotate(self, directory: str):
+        with self._lock:
+            max_files = self.max_files
+        try:
+            entries = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return
+        # id 以时间开头，字典序即时间顺序
+        for name in entries[:max(0, len(entries) - max_files)]:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    def _find(self, profile_id: str) -> Optional[str]:
+        if not profile_id or os.sep in profile_id or profile_id.startswith("."):
+            return None
+        for trigger in ("request", "live"):
+            directory = os.path.join(self.root, trigger, profile_id)
+            if os.path.isdir(directory):
+                return directory
+        return None
+
+    def list(self, trigger: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        items = []
+        for t in ((trigger,) if trigger else ("request", "live")):
+            base = os.path.join(self.root, t)
+            if not os.path.isdir(base):
+                continue
+            for name in os.listdir(base):
+                try:
+                    with open(os.path.join(base, name, "meta.json"), "r", encoding="utf-8") as fh:
+                        items.append(json.load(fh))
+                except (OSError, ValueError):
+                    continue
+        items.sort(key=lambda m: m.get("started_at", 0), reverse=True)
+        return items[:limit]
+
+    def archive(self, profile_id: str) -> Optional[bytes]:
+        """把一次剖析的全部文件打包为 zip；不存在时返回 None"""
+        directory = self._find(profile_id)
+        if directory is None:
+            return None
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name in sorted(os.listdir(directory)):
+                zf.write(os.path.join(directory, name), arcname=f"{profile_id}/{name}")
+        return buffer.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "dir": self.root,
+                "modes": [m for m in PROFILE_MODES if m != "torch" or torch is not None],
+                "live_rate": self.live_rate,
+                "live_mode": self.live_mode,
+                "max_files": self.max_files,
+                "sample_interval_ms": self.sample_interval_ms,
+                "active": len(self._active),
+                "captured": self.captured,
+            }
+
+
+profiler = Profiler()
+
+
+def profiled(fn):
+    """把函数标记为推理路径上的剖析点（见 Profiler.section）"""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with profiler.section():
+            return fn(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,207 @@
+import os
+import copy
+import glob
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+# 结果缓存配置，可通过环境变量调整
+CACHE_ENABLED = os.environ.get("ASR_CACHE_ENABLED", "1") != "0"
+CACHE_DIR = os.environ.get("ASR_CACHE_DIR", "/root/demo_1_confidence/.asr_cache")
+CACHE_MEMORY_ENTRIES = int(os.environ.get("ASR_CACHE_MEMORY_ENTRIES", "256"))
+
+_HASH_CHUNK = 1024 * 1024
+
+
+class FileHasher:
+    """
+    计算文件内容的 sha256，并按 (路径, mtime, size) 记忆结果，
+    voice_data 中未变化的文件不会被重复哈希。
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hash_file(self, path: str) -> str:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            memo = self._memo.get(path)
+            if memo and memo[0] == st.st_mtime_ns and memo[1] == st.st_size:
+                self._memo.move_to_end(path)
+                return memo[2]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        with self._lock:
+            self._memo[path] = (st.st_mtime_ns, st.st_size, digest)
+            self._memo.move_to_end(path)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return digest
+
+    def forget(self, path: str):
+        with self._lock:
+            self._memo.pop(os.path.abspath(path), None)
+
+
+def hash_array(audio: np.ndarray) -> str:
+    """已解码缓冲区的内容哈希（与文件哈希区分命名空间）"""
+    h = hashlib.sha256(b"pcm:")
+    h.update(np.ascontiguousarray(audio).tobytes())
+    return h.hexdigest()
+
+
+def _short_hash(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    识别结果的内容寻址缓存，两级存储：
+    - 内存：有界 LRU
+    - 磁盘：<cache_dir>/<model_key>/<content_hash>_<params_hash>.json，重启后仍有效
+
+    键由音频内容哈希、模型标识和 generate 参数共同决定。
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_memory_entries: int = CACHE_MEMORY_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max(0, max_memory_entries)
+        self.hasher = FileHasher()
+        self._memory: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def model_key(model_id: str) -> str:
+        return _short_hash(model_id)
+
+    @staticmethod
+    def entry_key(content_hash: str, params: Dict[str, Any]) -> str:
+        return f"{content_hash}_{_short_hash(params)}"
+
+    def contains(self, model_key: str, key: str) -> bool:
+        """不计入统计的存在性检查"""
+        with self._lock:
+            if (model_key, key) in self._memory:
+                return True
+        return os.path.exists(self._entry_path(model_key, key))
+
+    def _entry_path(self, model_key: str, key: str) -> str:
+        return os.path.join(self.cache_dir, model_key, f"{key}.json")
+
+    def get(self, model_key: str, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """返回 (结果副本, 命中层级 "memory"/"disk")；未命中返回 (None, None)"""
+        with self._lock:
+            result = self._memory.get((model_key, key))
+            if result is not None:
+                self._memory.move_to_end((model_key, key))
+                self.memory_hits += 1
+                return copy.deepcopy(result), "memory"
+
+        path = self._entry_path(model_key, key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                result = json.load(fh)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(model_key, key, result)
+        return copy.deepcopy(result), "disk"
+
+    def put(self, model_key: str, key: str, result: Dict[str, Any], model_id: str = ""):
+        result = copy.deepcopy(result)
+        with self._lock:
+            self.stores += 1
+            self._remember(model_key, key, result)
+
+        model_dir = os.path.join(self.cache_dir, model_key)
+        try:
+            os.makedirs(model_dir, exist_ok=True)
+            meta_path = os.path.join(model_dir, "model.json")
+            if model_id and not os.path.exists(meta_path):
+                with open(meta_path, "w", encoding="utf-8") as fh:
+                    json.dump({"model_id": model_id}, fh, ensure_ascii=False)
+            # 先写临时文件再原子替换，避免并发读到半截 JSON
+            path = self._entry_path(model_key, key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(result, fh, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"ResultCache: failed to persist cache entry {key}: {e}")
+
+    def _remember(self, model_key: str, key: str, result: Dict[str, Any]):
+        if self.max_memory_entries == 0:
+            return
+        self._memory[(model_key, key)] = result
+        self._memory.move_to_end((model_key, key))
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, content_hash: Optional[str] = None, model_key: Optional[str] = None) -> int:
+        """按音频内容哈希和/或模型失效缓存，返回删除的磁盘条目数"""
+        with self._lock:
+            for mem_key in list(self._memory):
+                mk, key = mem_key
+                if model_key and mk != model_key:
+                    continue
+                if content_hash and not key.startswith(f"{content_hash}_"):
+                    continue
+                del self._memory[mem_key]
+
+        if model_key and not content_hash:
+            model_dir = os.path.join(self.cache_dir, model_key)
+            removed = len(glob.glob(os.path.join(model_dir, "*_*.json")))
+            shutil.rmtree(model_dir, ignore_errors=True)
+            return removed
+
+        pattern = os.path.join(
+            self.cache_dir,
+            model_key or "*",
+            f"{content_hash}_*.json" if content_hash else "*_*.json",
+        )
+        removed = 0
+        for path in glob.glob(pattern):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self.max_memory_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "cache_dir": self.cache_dir,
+            }
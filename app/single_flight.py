@@ -0,0 +1,144 @@
+import os
+import copy
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from app.metrics import Counter, Gauge, REGISTRY
+
+
+# 设为 0 关闭相同推理请求的合并
+SINGLE_FLIGHT_ENABLED = os.environ.get("ASR_SINGLE_FLIGHT_ENABLED", "1") != "0"
+
+COALESCED = REGISTRY.register(Counter(
+    "asr_inferences_coalesced_total", "Requests served by an identical in-flight inference", ("model",)))
+FLIGHTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "asr_single_flight_in_progress", "Distinct inferences currently shared by single-flight", ()))
+
+
+class Flight:
+    """一次正在进行的推理：由首个调用方（leader）执行，其余调用方等待同一结果"""
+
+    def __init__(self, key: str, model: str):
+        self.key = key
+        self.model = model
+        self.future: Future = Future()
+        # 仍在等待结果的调用方数（含 leader）；为 0 时尚未开始的推理可以放弃
+        self.waiters = 1
+        self.followers = 0
+        # leader 已开始推理（而不只是排队）
+        self.started = False
+
+
+class SingleFlight:
+    """
+    按 (音频内容, 模型, 推理参数) 合并进行中的相同推理请求。
+
+    join() 返回 (flight, leader)：leader 负责执行推理并调用 finish()，
+    其他调用方通过 wait() / wait_sync() 等待同一结果（各自得到一份副本）。
+    每个调用方的超时和取消只影响自己：已开始的推理继续为其他调用方完成。
+    """
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str, model: str = "", wait_queued: bool = True) -> Tuple[Optional[Flight], bool]:
+        """
+        wait_queued 为 False 时只加入已开始推理的 flight：在模型专用 worker 线程中同步等待
+        排在同一 worker 之后的 leader 会死锁，此时返回 (None, False)，调用方自行推理
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.future.done():
+                if not (flight.started or wait_queued):
+                    return None, False
+                flight.waiters += 1
+                flight.followers += 1
+                self.coalesced += 1
+                COALESCED.inc(model=model)
+                return flight, False
+            flight = Flight(key, model)
+            self._flights[key] = flight
+            self.leaders += 1
+            FLIGHTS_IN_PROGRESS.set(len(self._flights))
+            return flight, True
+
+    def start(self, flight: Flight):
+        with self._lock:
+            flight.started = True
+
+    def leave(self, flight: Flight):
+        """调用方不再等待（完成、超时或取消）"""
+        with self._lock:
+            flight.waiters -= 1
+
+    def abandon_if_unwaited(self, flight: Flight) -> bool:
+        """
+        没有调用方等待时放弃尚未开始的推理并返回 True。检查与移除在同一把锁内完成，
+        避免新调用方在两者之间加入而拿到已取消的结果
+        """
+        with self._lock:
+            if flight.waiters > 0 or flight.future.done():
+                return False
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            FLIGHTS_IN_PROGRESS.set(len(self._flights))
+            flight.future.cancel()
+            return True
+
+    def finish(self, flight: Flight, result: Any = None, error: Optional[BaseException] = None):
+        """leader 完成（成功或失败）后唤醒所有等待者；error 为 None 且 result 为 None 表示放弃"""
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            FLIGHTS_IN_PROGRESS.set(len(self._flights))
+        if flight.future.done():
+            return
+        if error is not None:
+            flight.future.set_exception(error)
+        elif result is None:
+            flight.future.cancel()
+        else:
+            flight.future.set_result(result)
+
+    @staticmethod
+    def _copy(flight: Flight, result: Dict[str, Any], leader: bool) -> Dict[str, Any]:
+        # 结果完成后 followers 不再变化；有共享者时每个调用方各得一份副本，避免修改互相影响
+        if leader and flight.followers == 0:
+            return result
+        result = copy.deepcopy(result)
+        if not leader:
+            result["coalesced"] = True
+        return result
+
+    async def wait(self, flight: Flight, leader: bool, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """异步等待结果；取消或超时只让当前调用方退出"""
+        try:
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(flight.future)), timeout)
+        finally:
+            self.leave(flight)
+        return self._copy(flight, result, leader)
+
+    def wait_sync(self, flight: Flight, leader: bool, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """在线程中等待结果"""
+        try:
+            result = flight.future.result(timeout)
+        finally:
+            self.leave(flight)
+        return self._copy(flight, result, leader)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._flights),
+                "inferences": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            }
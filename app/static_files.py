@@ -0,0 +1,235 @@
+import os
+import re
+import time
+import mimetypes
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.encoding import negotiate_encoding
+
+
+# 静态文件目录（前端构建产物），可通过环境变量调整
+STATIC_DIR = os.environ.get("ASR_STATIC_DIR", os.path.join(os.path.dirname(__file__), "static"))
+# 未命中的路径最多每隔多少秒重新扫描一次静态目录
+STATIC_RESCAN_S = float(os.environ.get("ASR_STATIC_RESCAN_S", "2"))
+# 内存缓存的单个静态文件大小上限
+STATIC_MEMORY_MAX_BYTES = int(os.environ.get("ASR_STATIC_MEMORY_MAX_KB", "512")) * 1024
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# 构建工具输出的带内容哈希的文件名，如 index-4f3a2b1c.js、app.5d2a1b3c9e.css
+_HASHED_NAME_RE = re.compile(r"[.-](?=[A-Za-z0-9_]*\d)[A-Za-z0-9_]{8,}\.[A-Za-z0-9]+$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def file_etag(st: os.stat_result) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """If-None-Match 优先；没有时按 If-Modified-Since 判断"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节区间，返回闭区间 (start, end)；无 Range 或格式不支持时返回 None（返回整个文件）。
+    区间无法满足时抛出 ValueError（416）。多区间请求按整个文件返回。
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # 后缀区间：最后 N 个字节
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+async def _read_file(path: str, start: int, length: int):
+    async with aiofiles.open(path, "rb") as fh:
+        await fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await fh.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, path: str, st: Optional[os.stat_result] = None,
+                  media_type: Optional[str] = None, cache_control: str = REVALIDATE_CACHE,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    支持条件请求和字节区间的文件响应：
+    - ETag / Last-Modified，If-None-Match / If-Modified-Since 命中时返回 304
+    - Range: bytes=start-end 返回 206；If-Range 与当前 ETag 不符时返回整个文件；无法满足时 416
+    """
+    st = st or os.stat(path)
+    etag = file_etag(st)
+    base_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        **(headers or {}),
+    }
+    if not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=base_headers)
+
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    size = st.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        base_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = max(0, end - start + 1)
+    base_headers["Content-Length"] = str(length)
+    if request.method == "HEAD" or length == 0:
+        return Response(status_code=status, headers=base_headers, media_type=media_type)
+    return StreamingResponse(_read_file(path, start, length), status_code=status,
+                             headers=base_headers, media_type=media_type)
+
+
+class _Asset:
+    def __init__(self, path: str, st: os.stat_result):
+        self.path = path
+        self.st = st
+        # 预压缩版本：编码 -> (路径, stat)
+        self.variants: Dict[str, Tuple[str, os.stat_result]] = {}
+        # 小文件内容缓存在内存中：编码（"" 为原文件）-> 内容
+        self.body: Dict[str, bytes] = {}
+
+
+class StaticAssets:
+    """
+    前端构建产物的内存索引：启动时扫描目录，记录每个文件的 stat、ETag
+    以及同名的 .br / .gz 预压缩版本，小文件（含 index.html）内容常驻内存。
+    请求时不再访问文件系统；未命中的路径最多每 STATIC_RESCAN_S 秒重新扫描一次，
+    以便重新构建前端后无需重启服务。
+    """
+
+    def __init__(self, root: str = STATIC_DIR, memory_max_bytes: int = STATIC_MEMORY_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.memory_max_bytes = memory_max_bytes
+        self._assets: Dict[str, _Asset] = {}
+        self._lock = threading.Lock()
+        self._scanned_at = 0.0
+
+    def scan(self):
+        assets: Dict[str, _Asset] = {}
+        compressed: Dict[str, Tuple[str, str, os.stat_result]] = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                for encoding, suffix in _PRECOMPRESSED:
+                    if rel.endswith(suffix):
+                        compressed[rel] = (rel[:-len(suffix)], encoding, st)
+                        break
+                else:
+                    assets[rel] = _Asset(path, st)
+        for rel, (original, encoding, st) in compressed.items():
+            asset = assets.get(original)
+            if asset is not None:
+                asset.variants[encoding] = (os.path.join(self.root, rel), st)
+            else:
+                # 只有压缩版本的文件（如 .gz 下载包）按普通文件提供
+                assets[rel] = _Asset(os.path.join(self.root, rel), st)
+        for asset in assets.values():
+            for encoding, (path, st) in [("", (asset.path, asset.st))] + list(asset.variants.items()):
+                if st.st_size <= self.memory_max_bytes:
+                    try:
+                        with open(path, "rb") as fh:
+                            asset.body[encoding] = fh.read()
+                    except OSError:
+                        pass
+        with self._lock:
+            self._assets = assets
+            self._scanned_at = time.monotonic()
+
+    def get(self, rel: str) -> Optional[_Asset]:
+        with self._lock:
+            asset = self._assets.get(rel)
+            stale = time.monotonic() - self._scanned_at > STATIC_RESCAN_S
+        if asset is None and stale:
+            self.scan()
+            with self._lock:
+                asset = self._assets.get(rel)
+        return asset
+
+    def response(self, request: Request, rel: str) -> Optional[Response]:
+        """返回静态文件响应；文件不存在时返回 None"""
+        asset = self.get(rel)
+        if asset is None:
+            return None
+        cache_control = IMMUTABLE_CACHE if _HASHED_NAME_RE.search(rel) else REVALIDATE_CACHE
+        media_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        if media_type in ("application/javascript", "application/json"):
+            # text/* 由 Response 自动追加 charset
+            media_type += "; charset=utf-8"
+        headers = {"Vary": "Accept-Encoding"} if asset.variants else {}
+
+        encoding = None
+        if asset.variants and not request.headers.get("range"):
+            encoding = negotiate_encoding(request.headers.get("accept-encoding", ""),
+                                          available=list(asset.variants))
+        path, st = asset.variants[encoding] if encoding else (asset.path, asset.st)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        body = asset.body.get(encoding or "")
+        if body is None:
+            return file_response(request, path, st, media_type, cache_control, headers)
+        # 内存中的小文件：条件请求直接应答，不支持区间（浏览器不会对这类资源发 Range）
+        etag = file_etag(st)
+        headers.update({"ETag": etag, "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+                        "Cache-Control": cache_control})
+        if not_modified(request, etag, st.st_mtime):
+            return Response(status_code=304, headers=headers)
+        return Response(body, headers=headers, media_type=media_type)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import asyncio
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+
+from app.asr_service import ASRService
+from app.audio import SAMPLE_RATE
+from app.vad import SpeechSegmenter
+
+
+# 当前片段每新增多少毫秒语音输出一次中间结果
+STREAM_PARTIAL_INTERVAL_MS = int(os.environ.get("ASR_STREAM_PARTIAL_INTERVAL_MS", "600"))
+# 等待识别的已结束片段上限，超过时暂停接收（反压）
+STREAM_MAX_PENDING_SEGMENTS = int(os.environ.get("ASR_STREAM_MAX_PENDING_SEGMENTS", "4"))
+
+
+def _pcm16_to_float(data: bytes) -> np.ndarray:
+    return np.frombuffer(data[: len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _resample(samples: np.ndarray, source_rate: int) -> np.ndarray:
+    if source_rate == SAMPLE_RATE or len(samples) == 0:
+        return samples
+    n_out = int(round(len(samples) * SAMPLE_RATE / source_rate))
+    positions = np.arange(n_out) * (source_rate / SAMPLE_RATE)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _summarize(result: Dict[str, Any], with_sentences: bool) -> Dict[str, Any]:
+    sentences = result.get("sentences", [])
+    summary = {
+        "text": result.get("text", ""),
+        "confidence": round(sum(s.get("confidence", 0) for s in sentences) / len(sentences), 4) if sentences else 0.0,
+        "processing_time_ms": result.get("processing_time_ms"),
+    }
+    if with_sentences:
+        summary["sentences"] = sentences
+    return summary
+
+
+class StreamingSession:
+    """
+    一个 WebSocket 流式识别会话。
+
+    客户端持续发送 16-bit 小端单声道 PCM 二进制帧（采样率由 sample_rate 指定），
+    发送文本消息 {"type": "end"} 表示结束。服务端用 VAD 切分语音：
+    - 当前片段每增长 STREAM_PARTIAL_INTERVAL_MS 推送一次 {"type": "partial", ...}
+    - 片段结束时推送 {"type": "final", ...}（含句级置信度）
+    - 全部完成后推送 {"type": "end"}
+    会话内存上限约为一个最长片段加 STREAM_MAX_PENDING_SEGMENTS 个待识别片段。
+    """
+
+    def __init__(self, service: ASRService, model_types: List[str], sample_rate: int = SAMPLE_RATE):
+        self.service = service
+        self.model_types = model_types
+        self.sample_rate = sample_rate
+        self.segmenter = SpeechSegmenter()
+        self._events: "asyncio.Queue" = asyncio.Queue(maxsize=STREAM_MAX_PENDING_SEGMENTS + 1)
+        self._partial_pending = False
+        self._last_partial_end_ms = 0
+        self._segments_enqueued = 0
+        self._started_at = time.time()
+        self._first_text_ms: Optional[float] = None
+
+    def _elapsed_ms(self) -> float:
+        return round((time.time() - self._started_at) * 1000, 2)
+
+    async def _decode(self, audio: np.ndarray) -> Dict[str, Dict[str, Any]]:
+        """多个模型在各自的专用 worker 上并行识别同一片段"""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(
+                self.service.executor_for(mt),
+                partial(self.service.transcribe, audio, mt, use_cache=False),
+            )
+            for mt in self.model_types
+        ])
+        return dict(zip(self.model_types, results))
+
+    async def _send(self, websocket: WebSocket, message: Dict[str, Any]):
+        if self._first_text_ms is None and message.get("type") in ("partial", "final"):
+            self._first_text_ms = message["t_ms"]
+        await websocket.send_text(json.dumps(message, ensure_ascii=False))
+
+    async def _decoder(self, websocket: WebSocket):
+        try:
+            await self._decode_loop(websocket)
+        except WebSocketDisconnect:
+            return
+        except Exception as e:
+            try:
+                await self._send(websocket, {"type": "error", "detail": str(e), "t_ms": self._elapsed_ms()})
+                await websocket.close(code=1011)
+            except Exception:
+                # 客户端已断开
+                pass
+
+    async def _decode_loop(self, websocket: WebSocket):
+        final_index = 0
+        while True:
+            kind, payload = await self._events.get()
+            if kind == "end":
+                await self._send(websocket, {
+                    "type": "end",
+                    "segments": final_index,
+                    "t_ms": self._elapsed_ms(),
+                    "time_to_first_text_ms": self._first_text_ms,
+                })
+                return
+
+            if kind == "partial":
+                self._partial_pending = False
+                # 解码时再取快照，拿到当前片段的最新音频
+                current = self.segmenter.current()
+                if current is None:
+                    continue
+                index = self._segments_enqueued
+                results = await self._decode(current["audio"])
+                await self._send(websocket, {
+                    "type": "partial",
+                    "segment": index,
+                    "start_ms": current["start_ms"],
+                    "end_ms": current["end_ms"],
+                    "t_ms": self._elapsed_ms(),
+                    "models": {mt: _summarize(r, False) for mt, r in results.items()},
+                })
+                continue
+
+            results = await self._decode(payload["audio"])
+            await self._send(websocket, {
+                "type": "final",
+                "segment": final_index,
+                "start_ms": payload["start_ms"],
+                "end_ms": payload["end_ms"],
+                "t_ms": self._elapsed_ms(),
+                "models": {mt: _summarize(r, True) for mt, r in results.items()},
+            })
+            final_index += 1
+
+    async def _enqueue_segments(self, segments: List[Dict[str, Any]]):
+        for segment in segments:
+            self._segments_enqueued += 1
+            self._last_partial_end_ms = segment["end_ms"]
+            # 队列满时在这里等待，从而暂停读取客户端数据
+            await self._events.put(("final", segment))
+
+    async def run(self, websocket: WebSocket):
+        await websocket.accept()
+        decoder = asyncio.create_task(self._decoder(websocket))
+        ended = False
+        try:
+            while not decoder.done():
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    samples = _resample(_pcm16_to_float(message["bytes"]), self.sample_rate)
+                    await self._enqueue_segments(self.segmenter.feed(samples))
+                    span = self.segmenter.current_span()
+                    if (span is not None and not self._partial_pending
+                            and span[1] - max(self._last_partial_end_ms, span[0]) >= STREAM_PARTIAL_INTERVAL_MS):
+                        self._partial_pending = True
+                        self._last_partial_end_ms = span[1]
+                        await self._events.put(("partial", None))
+                elif message.get("text"):
+                    try:
+                        control = json.loads(message["text"])
+                    except ValueError:
+                        control = {}
+                    if control.get("type") == "end":
+                        await self._enqueue_segments(self.segmenter.flush())
+                        await self._events.put(("end", None))
+                        ended = True
+                        break
+
+            if ended:
+                await decoder
+                if websocket.client_state == WebSocketState.CONNECTED:
+                    await websocket.close()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if not decoder.done():
+                decoder.cancel()
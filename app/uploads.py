@@ -0,0 +1,191 @@
+import os
+import re
+import hashlib
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.audio import probe_duration
+from app.metrics import stage
+
+
+# 上传限制，可通过环境变量调整
+UPLOAD_MAX_BYTES = int(float(os.environ.get("ASR_UPLOAD_MAX_MB", "100")) * 1024 * 1024)
+UPLOAD_MAX_DURATION_S = float(os.environ.get("ASR_UPLOAD_MAX_DURATION_S", "600"))
+# 无法读取上传音频的时长（未安装 soundfile 且无 ffprobe，或文件无法解析）时是否拒绝
+UPLOAD_REQUIRE_DURATION = os.environ.get("ASR_UPLOAD_REQUIRE_DURATION", "0") != "0"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# multipart 请求体中表单字段与分隔符的余量
+_MULTIPART_OVERHEAD = 1024 * 1024
+
+_duration_warning_printed = False
+
+
+class UploadLimitMiddleware:
+    """
+    在读取表单之前限制 multipart 请求体大小（ASGI 中间件）：
+    Starlette 会在调用处理函数前把整个请求体写入临时文件，save_upload 中的检查只能事后生效。
+    Content-Length 超限时直接返回 413；没有 Content-Length（分块传输）时按已接收字节数中止。
+    route_limits 为 (路径正则, 字节上限) 列表，按顺序匹配请求路径，未匹配的路径使用 max_bytes。
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_BYTES,
+                 route_limits: Optional[List[Tuple[str, int]]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.route_limits = [(re.compile(pattern), limit) for pattern, limit in route_limits or []]
+
+    def limit_for(self, path: str) -> int:
+        for pattern, limit in self.route_limits:
+            if pattern.match(path):
+                return limit
+        return self.max_bytes
+
+    @staticmethod
+    def _too_large(max_bytes: int) -> HTTPException:
+        return HTTPException(status_code=413, detail=f"上传文件超过大小限制 {max_bytes // (1024 * 1024)} MB")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+        try:
+            content_length = int(headers.get(b"content-length", b"-1"))
+        except ValueError:
+            content_length = -1
+        max_bytes = self.limit_for(scope.get("path", ""))
+        max_request_bytes = max_bytes + _MULTIPART_OVERHEAD
+        if content_length > max_request_bytes:
+            response = JSONResponse({"detail": self._too_large(max_bytes).detail}, status_code=413,
+                                    headers={"Connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_request_bytes:
+                    # 表单解析中抛出的 HTTPException 由 FastAPI 原样返回
+                    raise self._too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class AudioSource:
+    """一次请求使用的音频：上传后的临时文件或 voice_data 中已有的文件"""
+
+    def __init__(self, path: str, filename: str, content_hash: Optional[str] = None,
+                 size: int = 0, duration: Optional[float] = None, is_temp: bool = False):
+        self.path = path
+        self.filename = filename
+        # 仅上传文件在流式写入时计算；库文件由 ASRService 按 mtime/size 记忆哈希
+        self.content_hash = content_hash
+        self.size = size
+        self.duration = duration
+        self.is_temp = is_temp
+
+
+async def save_upload(file: UploadFile,
+                      max_bytes: int = UPLOAD_MAX_BYTES,
+                      max_duration_s: float = UPLOAD_MAX_DURATION_S) -> AudioSource:
+    """
+    分块流式写入临时文件，边写边计算 sha256，不把整个上传读入内存。
+    超过大小或时长限制时删除临时文件并返回 413。
+    """
+    suffix = os.path.splitext(file.filename or "")[1] or ".wav"
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with stage("upload"):
+            async with aiofiles.open(temp_path, "wb") as out:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"上传文件超过大小限制 {max_bytes // (1024 * 1024)} MB",
+                        )
+                    h.update(chunk)
+                    await out.write(chunk)
+
+        with stage("probe"):
+            duration = await asyncio.to_thread(probe_duration, temp_path)
+        if duration is None:
+            _duration_unavailable(file.filename)
+        elif duration > max_duration_s:
+            raise HTTPException(
+                status_code=413,
+                detail=f"音频时长 {duration:.1f}s 超过限制 {max_duration_s:.0f}s",
+            )
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+
+    return AudioSource(temp_path, file.filename, h.hexdigest(), size, duration, is_temp=True)
+
+
+def _duration_unavailable(filename: Optional[str]):
+    """时长无法读取：按配置拒绝，否则告警（时长限制此时不生效）"""
+    global _duration_warning_printed
+    if UPLOAD_REQUIRE_DURATION:
+        raise HTTPException(status_code=422, detail=f"无法读取上传音频的时长: {filename}")
+    if not _duration_warning_printed:
+        _duration_warning_printed = True
+        print("Uploads: cannot read audio duration (install soundfile or ffprobe); "
+              f"the {UPLOAD_MAX_DURATION_S:.0f}s duration limit is not enforced")
+    else:
+        print(f"Uploads: duration unavailable for {filename}, duration limit skipped")
+
+
+def resolve_library_file(voice_dir: str, filename: str) -> AudioSource:
+    """定位 voice_data 中已有的文件"""
+    if ".." in filename or "/" in filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    audio_path = os.path.join(voice_dir, filename)
+    if not os.path.exists(audio_path):
+        raise HTTPException(status_code=404, detail="指定文件在 voice_data 中不存在")
+    return AudioSource(audio_path, filename, size=os.path.getsize(audio_path))
+
+
+@asynccontextmanager
+async def audio_source(file: Optional[UploadFile], filename: Optional[str],
+                       voice_dir: str, max_bytes: int = UPLOAD_MAX_BYTES,
+                       max_duration_s: float = UPLOAD_MAX_DURATION_S) -> AsyncIterator[AudioSource]:
+    """
+    transcribe / compare / analyze 共用的音频接入层：
+    优先使用上传文件，否则使用 voice_data 中的 filename；退出时清理临时文件。
+    """
+    if file is None and not filename:
+        raise HTTPException(status_code=400, detail="请提供上传文件或已存在的 filename")
+
+    source = (await save_upload(file, max_bytes, max_duration_s) if file
+              else resolve_library_file(voice_dir, filename))
+    try:
+        yield source
+    finally:
+        if source.is_temp:
+            _remove_quietly(source.path)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,142 @@
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.audio import SAMPLE_RATE
+
+
+# 能量 VAD 参数，可通过环境变量调整
+VAD_FRAME_MS = int(os.environ.get("ASR_VAD_FRAME_MS", "30"))
+VAD_THRESHOLD_DB = float(os.environ.get("ASR_VAD_THRESHOLD_DB", "-45"))
+VAD_MIN_SPEECH_MS = int(os.environ.get("ASR_VAD_MIN_SPEECH_MS", "150"))
+VAD_MIN_SILENCE_MS = int(os.environ.get("ASR_VAD_MIN_SILENCE_MS", "500"))
+VAD_PAD_MS = int(os.environ.get("ASR_VAD_PAD_MS", "200"))
+# 与 AutoModel 的 vad_kwargs["max_single_segment_time"] 保持一致
+VAD_MAX_SEGMENT_MS = int(os.environ.get("ASR_VAD_MAX_SEGMENT_MS", "30000"))
+
+
+class SpeechSegmenter:
+    """
+    流式能量 VAD：逐块输入 16kHz float32 采样，输出语音片段。
+
+    每帧计算能量（dBFS），高于 max(固定阈值, 噪声底 + 10dB) 视为语音。
+    连续语音达到 min_speech_ms 时开始一个片段（含 pad_ms 的前导音频），
+    连续静音达到 min_silence_ms 时结束片段；片段达到 max_segment_ms 时强制切分。
+    内存占用上限为一个最长片段加一小段前导缓冲，与输入总时长无关。
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE,
+                 frame_ms: int = VAD_FRAME_MS,
+                 threshold_db: float = VAD_THRESHOLD_DB,
+                 min_speech_ms: int = VAD_MIN_SPEECH_MS,
+                 min_silence_ms: int = VAD_MIN_SILENCE_MS,
+                 pad_ms: int = VAD_PAD_MS,
+                 max_segment_ms: int = VAD_MAX_SEGMENT_MS):
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.pad_frames = pad_ms // frame_ms
+        self.max_segment_frames = max(1, max_segment_ms // frame_ms)
+
+        self.noise_floor_db = -60.0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frame_index = 0
+        self._preroll: Deque[np.ndarray] = deque(maxlen=self.pad_frames + self.min_speech_frames)
+        self._speech_run = 0
+        self._silence_run = 0
+        self._segment: List[np.ndarray] = []
+        self._segment_start = 0
+        self.in_speech = False
+
+    def _is_speech(self, energy_db: float) -> bool:
+        speech = energy_db > max(self.threshold_db, self.noise_floor_db + 10.0)
+        if not speech:
+            # 噪声底跟随非语音帧缓慢变化
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * energy_db
+        return speech
+
+    def _emit(self, n_frames: int) -> Dict[str, Any]:
+        frames = self._segment[:n_frames]
+        start = self._segment_start
+        end = start + len(frames)
+        self._segment = self._segment[n_frames:]
+        self._segment_start = end
+        return {
+            "start_ms": start * self.frame_ms,
+            "end_ms": end * self.frame_ms,
+            "audio": np.concatenate(frames) if frames else np.zeros(0, dtype=np.float32),
+        }
+
+    def feed(self, samples: np.ndarray) -> List[Dict[str, Any]]:
+        """输入一块采样，返回这块数据中结束的片段列表"""
+        segments = []
+        data = np.concatenate((self._pending, samples.astype(np.float32, copy=False)))
+        n_frames = len(data) // self.frame_len
+        self._pending = data[n_frames * self.frame_len:].copy()
+        frames = data[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        # 整块一次性计算各帧能量
+        energies = (10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)).tolist()
+
+        for k in range(n_frames):
+            frame = frames[k]
+            speech = self._is_speech(energies[k])
+            index = self._frame_index
+            self._frame_index += 1
+
+            if not self.in_speech:
+                self._preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if speech else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    self._silence_run = 0
+                    self._segment = list(self._preroll)
+                    self._segment_start = index + 1 - len(self._segment)
+                    self._preroll.clear()
+                continue
+
+            self._segment.append(frame)
+            self._silence_run = 0 if speech else self._silence_run + 1
+            if self._silence_run >= self.min_silence_frames:
+                # 保留 pad_frames 的尾部静音
+                keep = len(self._segment) - self._silence_run + self.pad_frames
+                segments.append(self._emit(min(keep, len(self._segment))))
+                self._segment = []
+                self.in_speech = False
+                self._speech_run = 0
+            elif len(self._segment) >= self.max_segment_frames:
+                segments.append(self._emit(len(self._segment)))
+        return segments
+
+    def current_span(self) -> Optional[Tuple[int, int]]:
+        """当前未结束片段的 (start_ms, end_ms)，不拼接音频"""
+        if not self.in_speech or not self._segment:
+            return None
+        return self._segment_start * self.frame_ms, (self._segment_start + len(self._segment)) * self.frame_ms
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        """当前尚未结束的片段（用于输出中间结果），不在语音中时返回 None"""
+        if not self.in_speech or not self._segment:
+            return None
+        return {
+            "start_ms": self._segment_start * self.frame_ms,
+            "end_ms": (self._segment_start + len(self._segment)) * self.frame_ms,
+            "audio": np.concatenate(self._segment),
+        }
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """输入结束：输出未结束的片段"""
+        segments = []
+        if self.in_speech and self._segment:
+            trailing = self._silence_run
+            keep = len(self._segment) - max(0, trailing - self.pad_frames)
+            segments.append(self._emit(keep))
+        self._segment = []
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        return segments
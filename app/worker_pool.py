@@ -0,0 +1,280 @@
+import os
+import time
+import itertools
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+# 推理 worker 进程数，0 表示在本进程内用线程推理（默认）
+WORKER_PROCESSES = int(os.environ.get("ASR_WORKER_PROCESSES", "0"))
+# 每个 worker 进程的 torch / OpenMP 线程数
+WORKER_THREADS = int(os.environ.get("ASR_WORKER_THREADS", "1"))
+# worker 进程使用的设备（多进程模式主要面向纯 CPU 节点）
+WORKER_DEVICE = os.environ.get("ASR_WORKER_DEVICE", "cpu")
+
+_MONITOR_INTERVAL_S = 0.5
+
+
+class WorkerCrashedError(RuntimeError):
+    """执行任务的 worker 进程意外退出"""
+
+
+# 通过共享内存传递的缓冲区描述：("shm", 名称, 采样数, dtype)
+_SharedRef = Tuple[str, str, int, str]
+
+
+def _to_shared(audio: np.ndarray) -> Tuple[shared_memory.SharedMemory, _SharedRef]:
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+    np.ndarray(audio.shape, dtype=audio.dtype, buffer=shm.buf)[:] = audio
+    return shm, ("shm", shm.name, len(audio), str(audio.dtype))
+
+
+def _from_shared(ref: _SharedRef) -> np.ndarray:
+    _, name, length, dtype = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # 复制一份到本进程，推理期间不持有共享内存的引用
+        return np.ndarray((length,), dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def _worker_main(worker_id: int, tasks: "mp.Queue", results: "mp.Queue", config: Dict[str, Any]):
+    """worker 进程入口：持有独立的模型实例，逐个执行推理任务"""
+    threads = str(config["threads"])
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = threads
+    try:
+        import torch
+        torch.set_num_threads(config["threads"])
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+    from app.asr_service import ASRService
+
+    service = ASRService(
+        base_model_path=config["base_model_path"],
+        personal_model_path=config["personal_model_path"],
+        device=config["device"],
+        preload=False,
+        models_dir=config["models_dir"],
+        memory_budget_mb=config["memory_budget_mb"],
+    )
+    for thread in service.start_loading():
+        thread.join()
+    results.put(("status", worker_id, service.load_status()))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, model_type, inputs = task
+        try:
+            audio = [_from_shared(x) if isinstance(x, tuple) else x for x in inputs]
+            output = service.transcribe_batch(audio, model_type, use_cache=False)
+        except Exception as e:
+            results.put(("error", task_id, f"{type(e).__name__}: {e}"))
+        else:
+            results.put(("ok", task_id, output))
+        results.put(("status", worker_id, service.load_status()))
+
+
+class _Worker:
+    def __init__(self, worker_id: int):
+        self.id = worker_id
+        self.process: Optional[mp.Process] = None
+        self.tasks: Optional["mp.Queue"] = None
+        self.in_flight: Dict[int, Future] = {}
+        self.restarts = 0
+        self.model_status: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+
+
+class WorkerPool:
+    """
+    多进程推理池：N 个 worker 进程各自持有模型实例并固定线程数，
+    避免同一进程内的线程争用 GIL 与 torch intra-op 线程。
+
+    已解码的音频缓冲区经共享内存传给 worker（任务消息只含共享内存名），
+    文件路径直接传递由 worker 自行解码；worker 崩溃时其未完成任务以
+    WorkerCrashedError 失败，进程自动重启。
+    """
+
+    def __init__(self, config: Dict[str, Any], processes: int = WORKER_PROCESSES,
+                 threads_per_worker: int = WORKER_THREADS):
+        self.size = max(1, processes)
+        self.config = {**config, "threads": max(1, threads_per_worker)}
+        self._ctx = mp.get_context("spawn")
+        self._results: "mp.Queue" = self._ctx.Queue()
+        self._workers = [_Worker(i) for i in range(self.size)]
+        self._task_ids = itertools.count()
+        # task_id -> (worker, 需释放的共享内存)
+        self._pending: Dict[int, Tuple[_Worker, List[shared_memory.SharedMemory]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        for worker in self._workers:
+            self._spawn(worker)
+        for target, name in ((self._collect, "pool-results"), (self._monitor, "pool-monitor")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"WorkerPool: started {self.size} worker processes "
+              f"({self.config['threads']} threads each, device={self.config['device']})")
+
+    def _spawn(self, worker: _Worker):
+        worker.tasks = self._ctx.Queue()
+        worker.model_status = {}
+        worker.process = self._ctx.Process(
+            target=_worker_main, args=(worker.id, worker.tasks, self._results, self.config),
+            name=f"asr-worker-{worker.id}", daemon=True,
+        )
+        worker.process.start()
+        worker.started_at = time.time()
+
+    def stop(self):
+        self._stop.set()
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        self._results.put(None)
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    # ---- 任务分发 ----
+
+    def submit(self, inputs: List[Union[str, np.ndarray]], model_type: str) -> Future:
+        """提交一批输入，返回 transcribe_batch 结果列表的 Future"""
+        segments: List[shared_memory.SharedMemory] = []
+        payload = []
+        for item in inputs:
+            if isinstance(item, np.ndarray):
+                shm, ref = _to_shared(item)
+                segments.append(shm)
+                payload.append(ref)
+            else:
+                payload.append(item)
+
+        future: Future = Future()
+        task_id = next(self._task_ids)
+        with self._lock:
+            # 分给未完成任务最少的 worker
+            worker = min(self._workers, key=lambda w: len(w.in_flight))
+            worker.in_flight[task_id] = future
+            self._pending[task_id] = (worker, segments)
+            worker.tasks.put((task_id, model_type, payload))
+        return future
+
+    def generate(self, inputs: List[Union[str, np.ndarray]], model_type: str) -> List[Dict[str, Any]]:
+        return self.submit(inputs, model_type).result()
+
+    def _finish(self, task_id: int) -> Optional[Future]:
+        with self._lock:
+            pending = self._pending.pop(task_id, None)
+            if pending is None:
+                return None
+            worker, segments = pending
+            future = worker.in_flight.pop(task_id, None)
+        for shm in segments:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        return future
+
+    # ---- 后台线程 ----
+
+    def _collect(self):
+        while not self._stop.is_set():
+            message = self._results.get()
+            if message is None:
+                return
+            kind, key, body = message
+            if kind == "status":
+                self._workers[key].model_status = body
+                continue
+            future = self._finish(key)
+            if future is None or future.done():
+                continue
+            if kind == "ok":
+                future.set_result(body)
+            else:
+                future.set_exception(RuntimeError(body))
+
+    def _monitor(self):
+        while not self._stop.wait(_MONITOR_INTERVAL_S):
+            for worker in self._workers:
+                if worker.process is None or worker.process.is_alive():
+                    continue
+                exitcode = worker.process.exitcode
+                with self._lock:
+                    task_ids = list(worker.in_flight)
+                for task_id in task_ids:
+                    future = self._finish(task_id)
+                    if future is not None and not future.done():
+                        future.set_exception(WorkerCrashedError(
+                            f"worker {worker.id} 意外退出 (exitcode={exitcode})"
+                        ))
+                worker.restarts += 1
+                print(f"WorkerPool: worker {worker.id} exited with code {exitcode}, restarting")
+                self._spawn(worker)
+
+    # ---- 状态 ----
+
+    def load_status(self, model_types: List[str]) -> Dict[str, Dict[str, Any]]:
+        """按模型汇总各 worker 的加载状态：全部 worker 就绪时为 ready"""
+        summary = {}
+        for mt in model_types:
+            states = [w.model_status.get(mt, {}).get("state", "pending") for w in self._workers]
+            times = [w.model_status.get(mt, {}).get("load_time_s") for w in self._workers]
+            errors = [w.model_status.get(mt, {}).get("error") for w in self._workers]
+            if all(s in ("ready", "evicted") for s in states):
+                state = "ready"
+            elif any(s == "failed" for s in states):
+                state = "failed"
+            else:
+                state = "loading"
+            known_times = [t for t in times if t is not None]
+            summary[mt] = {
+                "state": state,
+                "load_time_s": max(known_times) if known_times else None,
+                "error": next((e for e in errors if e), None),
+                "workers_ready": states.count("ready") + states.count("evicted"),
+            }
+        return summary
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "processes": self.size,
+                "threads_per_worker": self.config["threads"],
+                "device": self.config["device"],
+                "workers": [
+                    {
+                        "id": w.id,
+                        "pid": w.process.pid if w.process else None,
+                        "alive": bool(w.process and w.process.is_alive()),
+                        "in_flight": len(w.in_flight),
+                        "restarts": w.restarts,
+                        "uptime_s": round(time.time() - w.started_at, 1) if w.started_at else None,
+                    }
+                    for w in self._workers
+                ],
+            }
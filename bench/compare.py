@@ -0,0 +1,93 @@
+"""
+将 bench.run 的结果与基线比较，任一场景的 RPS 下降或尾延迟上升超过阈值时以退出码 1 结束。
+
+    python -m bench.compare bench-results.json bench/baseline.json --threshold 10
+"""
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+# (指标路径, 越大越好)
+METRICS: List[Tuple[Tuple[str, ...], bool]] = [
+    (("rps",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+]
+
+
+def _get(data: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold_pct: float,
+            rss_threshold_pct: float) -> Tuple[List[Dict[str, Any]], bool]:
+    rows = []
+    regressed = False
+    for scenario, base in baseline.get("scenarios", {}).items():
+        cur = current.get("scenarios", {}).get(scenario)
+        if cur is None:
+            rows.append({"scenario": scenario, "metric": "-", "status": "missing"})
+            regressed = True
+            continue
+        for path, higher_is_better in METRICS:
+            b, c = _get(base, path), _get(cur, path)
+            if not b or c is None:
+                continue
+            change = (c - b) / b * 100
+            worse = -change if higher_is_better else change
+            status = "regressed" if worse > threshold_pct else "ok"
+            regressed |= status == "regressed"
+            rows.append({"scenario": scenario, "metric": ".".join(path), "baseline": b,
+                         "current": c, "change_pct": round(change, 1), "status": status})
+        if sum(cur.get("errors", {}).values()) > sum(base.get("errors", {}).values()):
+            rows.append({"scenario": scenario, "metric": "errors", "baseline": base.get("errors"),
+                         "current": cur.get("errors"), "status": "regressed"})
+            regressed = True
+
+    b_rss = _get(baseline, ("server", "peak_rss_mb"))
+    c_rss = _get(current, ("server", "peak_rss_mb"))
+    if b_rss and c_rss is not None:
+        change = (c_rss - b_rss) / b_rss * 100
+        status = "regressed" if change > rss_threshold_pct else "ok"
+        regressed |= status == "regressed"
+        rows.append({"scenario": "server", "metric": "peak_rss_mb", "baseline": b_rss, "current": c_rss,
+                     "change_pct": round(change, 1), "status": status})
+    return rows, regressed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline")
+    parser.add_argument("current")
+    parser.add_argument("baseline")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="allowed throughput drop / latency increase in percent")
+    parser.add_argument("--rss-threshold", type=float, default=20.0,
+                        help="allowed peak RSS increase in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.current, "r", encoding="utf-8") as fh:
+        current = json.load(fh)
+    with open(args.baseline, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    if current.get("config") != baseline.get("config"):
+        print("warning: benchmark configs differ; comparison may not be meaningful", file=sys.stderr)
+
+    rows, regressed = compare(current, baseline, args.threshold, args.rss_threshold)
+    for row in rows:
+        if "change_pct" in row:
+            print(f"{row['status']:>9}  {row['scenario']:>11}  {row['metric']:<15} "
+                  f"{row['baseline']:>10} -> {row['current']:>10}  ({row['change_pct']:+.1f}%)")
+        else:
+            print(f"{row['status']:>9}  {row['scenario']:>11}  {row['metric']:<15} "
+                  f"{row.get('baseline')} -> {row.get('current')}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+推理后端一致性与速度对比：同一批音频分别用参考后端（默认 torch）和候选后端（默认 onnx）识别，
+比较识别文本、平均置信度与推理延迟，并在有标注时给出两者各自的 CER（JSON）。
+
+在仓库根目录运行（候选后端的模型需先用 python -m app.export_onnx 导出）：
+    python -m bench.parity --voice-dir /root/demo_1_confidence/voice_data --limit 50 --out parity.json
+    python -m bench.parity --models personal --candidate onnx --max-text-cer 2.0
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+from app.alignment import error_rates
+from app.evaluate import list_audio_files, read_ground_truth
+from bench.run import percentile
+
+
+def _avg_confidence(result: Dict[str, Any]) -> float:
+    sentences = result.get("sentences", [])
+    return sum(s.get("confidence", 0) for s in sentences) / len(sentences) if sentences else 0.0
+
+
+def _cer(pairs: List[tuple]) -> Optional[float]:
+    """按总错误字数 / 总参考字数汇总 CER（%）"""
+    errors = refs = 0
+    for reference, hypothesis in pairs:
+        rates = error_rates(reference, hypothesis)
+        errors += rates["char_errors"]
+        refs += rates["ref_chars"]
+    return round(errors / refs * 100, 2) if refs else None
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+    }
+
+
+def compare_model(reference, candidate, model_type: str, voice_dir: str, files: List[str],
+                  warmup: int = 1) -> Dict[str, Any]:
+    """逐个文件在两个后端上识别（不使用缓存），汇总文本差异、置信度差异和延迟"""
+    for filename in files[:warmup]:
+        path = os.path.join(voice_dir, filename)
+        reference.transcribe_batch([path], model_type, use_cache=False)
+        candidate.transcribe_batch([path], model_type, use_cache=False)
+
+    text_pairs, ref_gt, cand_gt = [], [], []
+    latency = {"reference": [], "candidate": []}
+    confidence_diffs: List[float] = []
+    mismatches: List[Dict[str, Any]] = []
+    for filename in files:
+        path = os.path.join(voice_dir, filename)
+        outputs = {}
+        for name, service in (("reference", reference), ("candidate", candidate)):
+            start = time.perf_counter()
+            outputs[name] = service.transcribe_batch([path], model_type, use_cache=False)[0]
+            latency[name].append((time.perf_counter() - start) * 1000)
+        ref_text, cand_text = outputs["reference"]["text"], outputs["candidate"]["text"]
+        text_pairs.append((ref_text, cand_text))
+        confidence_diffs.append(_avg_confidence(outputs["candidate"]) - _avg_confidence(outputs["reference"]))
+        if ref_text != cand_text:
+            mismatches.append({"filename": filename, "reference": ref_text, "candidate": cand_text})
+        ground_truth = read_ground_truth(voice_dir, filename)
+        if ground_truth is not None:
+            ref_gt.append((ground_truth, ref_text))
+            cand_gt.append((ground_truth, cand_text))
+
+    n = len(files)
+    ref_p50, cand_p50 = percentile(latency["reference"], 0.5), percentile(latency["candidate"], 0.5)
+    return {
+        "model": reference.registry.resolve(model_type),
+        "files": n,
+        "text_match_rate": round(1 - len(mismatches) / n, 4) if n else None,
+        # 以参考后端的输出为参考文本的 CER
+        "text_cer": _cer(text_pairs),
+        "confidence_diff": {
+            "mean": round(sum(confidence_diffs) / n, 4) if n else None,
+            "mean_abs": round(sum(abs(d) for d in confidence_diffs) / n, 4) if n else None,
+            "max_abs": round(max((abs(d) for d in confidence_diffs), default=0.0), 4),
+        },
+        "latency_ms": {"reference": _latency(latency["reference"]), "candidate": _latency(latency["candidate"])},
+        "speedup_p50": round(ref_p50 / cand_p50, 2) if cand_p50 else None,
+        "ground_truth_cer": {"files": len(ref_gt), "reference": _cer(ref_gt), "candidate": _cer(cand_gt)},
+        "mismatches": mismatches[:20],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare text, confidence and latency between inference backends")
+    parser.add_argument("--voice-dir", default="/root/demo_1_confidence/voice_data")
+    parser.add_argument("--models", nargs="+", default=["base", "personal"],
+                        help="model ids: base, personal or any checkpoint under ASR_MODELS_DIR")
+    parser.add_argument("--reference", default="torch", help="reference backend")
+    parser.add_argument("--candidate", default="onnx", help="candidate backend")
+    parser.add_argument("--device", default="cuda:0", help="device of the torch backend")
+    parser.add_argument("--limit", type=int, default=0, help="only use the first N files (0 = all)")
+    parser.add_argument("--warmup", type=int, default=1, help="files run once on each backend before timing")
+    parser.add_argument("--max-text-cer", type=float, default=None,
+                        help="exit with status 1 if any model's text CER (%%) against the reference exceeds this")
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    from app.asr_service import ASRService
+
+    services = {
+        name: ASRService(device=args.device, preload=False, backend=backend, model_backends={})
+        for name, backend in (("reference", args.reference), ("candidate", args.candidate))
+    }
+    unknown = [mt for mt in args.models if not services["reference"].has_model(mt)]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)} "
+                     f"(available: {', '.join(services['reference'].registry.ids())})")
+    files = list_audio_files(args.voice_dir)
+    if args.limit > 0:
+        files = files[:args.limit]
+    if not files:
+        parser.error(f"no audio files in {args.voice_dir}")
+
+    report: Dict[str, Any] = {
+        "voice_dir": args.voice_dir,
+        "backends": {name: {"name": service.backend, **service.backend_for(args.models[0]).describe()}
+                     for name, service in services.items()},
+        "models": [],
+    }
+    for model_type in args.models:
+        report["models"].append(compare_model(services["reference"], services["candidate"], model_type,
+                                              args.voice_dir, files, args.warmup))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    sys.stdout.write(text + "\n")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    if args.max_text_cer is not None and any(
+            (m["text_cer"] or 0.0) > args.max_text_cer for m in report["models"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+HTTP 压测：用 bench/stub 中的 funasr 替身启动真实的 app.main（uvicorn 子进程），
+按配置的并发驱动 /api/transcribe、/api/compare、/api/analyze、/api/audio-list，
+输出每个场景的 RPS、p50/p95/p99 延迟以及服务进程的峰值 RSS（JSON）。
+
+在仓库根目录运行（需要 httpx）：
+    python -m bench.run --concurrency 8 --requests 200 --out bench-results.json
+    python -m bench.compare bench-results.json bench/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import wave
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STUB_DIR = os.path.join(BENCH_DIR, "stub")
+
+SCENARIOS = ("transcribe", "compare", "analyze", "audio-list")
+
+
+def write_corpus(voice_dir: str, files: int, seconds: float, sample_rate: int = 16000) -> List[str]:
+    """生成确定性的 16-bit PCM WAV 测试音频（语音段 + 静音段）"""
+    rng = np.random.default_rng(0)
+    names = []
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    for i in range(files):
+        freq = 150 + 20 * i
+        envelope = (np.sin(2 * np.pi * 0.5 * t) > -0.3).astype(np.float32)
+        samples = 0.3 * np.sin(2 * np.pi * freq * t) * envelope + rng.normal(0, 0.003, n)
+        name = f"bench_{i:03d}.wav"
+        with wave.open(os.path.join(voice_dir, name), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sample_rate)
+            w.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+        names.append(name)
+    return names
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """进程峰值常驻内存（Linux /proc 的 VmHWM）"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def start_server(port: int, workdir: str, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join([STUB_DIR, REPO_DIR, env.get("PYTHONPATH", "")]),
+        "ASR_VOICE_DATA_DIR": os.path.join(workdir, "voice_data"),
+        "ASR_MODELS_DIR": os.path.join(workdir, "models"),
+        "ASR_CACHE_DIR": os.path.join(workdir, "cache"),
+        "ASR_CACHE_ENABLED": "1" if args.cache else "0",
+        "ASR_FEATURE_STORE_DIR": os.path.join(workdir, "feature_store"),
+        "ASR_FEATURE_STORE_ENABLED": "1" if args.feature_store else "0",
+        "BENCH_STUB_LATENCY_MS": str(args.stub_latency_ms),
+        "BENCH_STUB_PER_ITEM_MS": str(args.stub_per_item_ms),
+        "BENCH_STUB_PER_SECOND_MS": str(args.stub_per_second_ms),
+        "BENCH_STUB_TEXT_CHARS": str(args.stub_text_chars),
+    })
+    log = open(os.path.join(workdir, "server.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_ready(client, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            r = await client.get("/api/health/ready")
+            if r.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 2)
+
+
+async def run_scenario(client, name: str, files: List[str], concurrency: int, requests: int,
+                       upload: bool) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def one(i: int):
+        filename = files[i % len(files)]
+        if name == "audio-list":
+            return await client.get("/api/audio-list", params={"page": 1 + i % 3, "page_size": 20})
+        path = {"transcribe": "/api/transcribe/base", "compare": "/api/compare", "analyze": "/api/analyze"}[name]
+        if upload:
+            with open(os.path.join(client.voice_dir, filename), "rb") as fh:
+                return await client.post(path, files={"file": (filename, fh.read(), "audio/wav")})
+        return await client.post(path, data={"filename": filename})
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                r = await one(i)
+                status = str(r.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != "200":
+                errors[status] = errors.get(status, 0) + 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - wall_start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "rps": round(requests / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        import httpx
+    except ImportError:
+        sys.exit("bench.run requires httpx (pip install -r bench/requirements.txt)")
+
+    workdir = tempfile.mkdtemp(prefix="asr-bench-")
+    voice_dir = os.path.join(workdir, "voice_data")
+    os.makedirs(voice_dir)
+    os.makedirs(os.path.join(workdir, "models"))
+    files = write_corpus(voice_dir, args.files, args.audio_seconds)
+
+    port = free_port()
+    server = start_server(port, workdir, args)
+    results: Dict[str, Any] = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout,
+                                     limits=limits) as client:
+            client.voice_dir = voice_dir
+            await wait_ready(client)
+            for name in args.scenarios:
+                if args.warmup:
+                    await run_scenario(client, name, files, args.concurrency, args.warmup, args.upload)
+                results[name] = await run_scenario(client, name, files, args.concurrency,
+                                                   args.requests, args.upload)
+                print(f"{name:>11}: {results[name]['rps']:8.2f} rps  "
+                      f"p50 {results[name]['latency_ms']['p50']:8.2f} ms  "
+                      f"p99 {results[name]['latency_ms']['p99']:8.2f} ms  "
+                      f"errors {sum(results[name]['errors'].values())}", file=sys.stderr)
+        rss = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    return {
+        "config": {
+            "scenarios": list(args.scenarios),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "files": args.files,
+            "audio_seconds": args.audio_seconds,
+            "upload": args.upload,
+            "cache": args.cache,
+            "feature_store": args.feature_store,
+            "stub": {
+                "latency_ms": args.stub_latency_ms,
+                "per_item_ms": args.stub_per_item_ms,
+                "per_second_ms": args.stub_per_second_ms,
+                "text_chars": args.stub_text_chars,
+            },
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": {"peak_rss_mb": rss},
+        "scenarios": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the ASR API against a stub model backend")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--files", type=int, default=20, help="number of generated audio files")
+    parser.add_argument("--audio-seconds", type=float, default=5.0)
+    parser.add_argument("--upload", action="store_true", help="upload audio instead of passing filename")
+    parser.add_argument("--cache", action="store_true", help="enable the result cache (off by default)")
+    parser.add_argument("--feature-store", action="store_true", help="enable the pre-decoded audio store")
+    parser.add_argument("--stub-latency-ms", type=float, default=50)
+    parser.add_argument("--stub-per-item-ms", type=float, default=5)
+    parser.add_argument("--stub-per-second-ms", type=float, default=2)
+    parser.add_argument("--stub-text-chars", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+压测用的 funasr 替身：AutoModel.generate 按配置的延迟 sleep，返回确定性的文本与概率，
+无需 GPU 和模型权重。通过环境变量配置：
+
+    BENCH_STUB_LOAD_MS       每个模型的加载耗时（默认 0）
+    BENCH_STUB_LATENCY_MS    每次 generate 的固定耗时（默认 50）
+    BENCH_STUB_PER_ITEM_MS   批内每条输入追加的耗时（默认 5）
+    BENCH_STUB_PER_SECOND_MS 每秒音频追加的耗时（默认 2）
+    BENCH_STUB_TEXT_CHARS    每条结果的字数（默认 64）
+"""
+import os
+import time
+import zlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+from funasr.utils.load_utils import load_audio_text_image_video
+
+_PHRASES = ["今天天气很好", "我们开始开会吧", "请把文件发给我", "这个模型的效果不错", "hello world", "谢谢大家"]
+_PUNCT = ["。", "，", "！", "？"]
+
+
+def _env_ms(name: str, default: str) -> float:
+    return float(os.environ.get(name, default)) / 1000.0
+
+
+def _text_for(seed: int, chars: int) -> str:
+    rng = np.random.default_rng(seed)
+    out = ""
+    while len(out) < chars:
+        out += _PHRASES[rng.integers(len(_PHRASES))] + _PUNCT[rng.integers(len(_PUNCT))]
+    return "<|zh|><|NEUTRAL|><|Speech|><|withitn|>" + out[:chars]
+
+
+class AutoModel:
+    def __init__(self, model: str = "", device: str = "cpu", **kwargs):
+        self.model_path = model
+        self.device = device
+        time.sleep(_env_ms("BENCH_STUB_LOAD_MS", "0"))
+
+    def generate(self, input: Any, cache: Dict = None, batch_size: int = 1, **kwargs) -> List[Dict[str, Any]]:
+        inputs = input if isinstance(input, list) else [input]
+        audio = [load_audio_text_image_video(x) if isinstance(x, str) else np.asarray(x) for x in inputs]
+        seconds = sum(len(a) for a in audio) / 16000.0
+        time.sleep(
+            _env_ms("BENCH_STUB_LATENCY_MS", "50")
+            + _env_ms("BENCH_STUB_PER_ITEM_MS", "5") * len(inputs)
+            + _env_ms("BENCH_STUB_PER_SECOND_MS", "2") * seconds
+        )
+        chars = int(os.environ.get("BENCH_STUB_TEXT_CHARS", "64"))
+        results = []
+        for i, a in enumerate(audio):
+            # 同一音频 + 模型得到相同结果
+            seed = zlib.crc32(np.ascontiguousarray(a[:16000]).tobytes()) ^ zlib.crc32(self.model_path.encode())
+            text = _text_for(seed, chars)
+            prob = np.random.default_rng(seed).uniform(0.6, 1.0, len(text)).round(4).tolist()
+            results.append({"key": f"item{i}", "text": text, "prob": prob})
+        return results
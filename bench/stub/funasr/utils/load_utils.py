@@ -0,0 +1,16 @@
+import wave
+
+import numpy as np
+
+
+def load_audio_text_image_video(data, fs: int = 16000, audio_fs: int = 16000, data_type: str = "sound", **kwargs):
+    """读取 16-bit PCM WAV（压测生成的音频均为此格式）；数组原样返回"""
+    if not isinstance(data, str):
+        return np.asarray(data, dtype=np.float32)
+    with wave.open(data, "rb") as w:
+        frames = w.readframes(w.getnframes())
+        channels = w.getnchannels()
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
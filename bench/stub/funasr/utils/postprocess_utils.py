@@ -0,0 +1,6 @@
+import re
+
+
+def rich_transcription_postprocess(text: str) -> str:
+    """去掉 SenseVoice 风格的 <|...|> 标签"""
+    return re.sub(r"<\|[^|]*\|>", "", text)
@@ -30,6 +30,14 @@ api.interceptors.response.use(
   }
 )
 
+// 识别/对比请求的公共选项：页面不使用原始概率数组，省去大部分响应体积
+const uploadOptions = {
+  params: { exclude: 'raw_prob' },
+  headers: {
+    'Content-Type': 'multipart/form-data'
+  }
+}
+
 export const audioAPI = {
   // 获取音频文件列表
   getAudioList() {
@@ -50,11 +58,7 @@ export const audioAPI = {
     if (filename) {
       formData.append('filename', filename)
     }
-    return api.post(`/transcribe/${modelType}`, formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data'
-      }
-    })
+    return api.post(`/transcribe/${modelType}`, formData, uploadOptions)
   },
   
   // 同时调用两个模型进行对比
@@ -66,11 +70,7 @@ export const audioAPI = {
     if (filename) {
       formData.append('filename', filename)
     }
-    return api.post('/compare', formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data'
-      }
-    })
+    return api.post('/compare', formData, uploadOptions)
   },
   
   // 健康检查
@@ -0,0 +1,17 @@
+"""
+在仓库根目录运行：python -m pytest tests
+
+未安装 funasr 时使用 bench/stub 中的替身（与 bench.run 压测相同），
+以便导入依赖 funasr 的模块（如 app.backends）。
+"""
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_DIR = os.path.join(REPO_DIR, "bench", "stub")
+
+sys.path.insert(0, REPO_DIR)
+try:
+    import funasr  # noqa: F401
+except ImportError:
+    sys.path.insert(0, STUB_DIR)
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+from app.alignment import align, error_rates, levenshtein, normalize_chars, tokenize_words
+
+
+def _naive_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, y in enumerate(b, 1):
+            row[j] = prev[j - 1] if x == y else 1 + min(prev[j - 1], prev[j], row[j - 1])
+        prev = row
+    return prev[-1]
+
+
+def _random_pairs(n, max_len, alphabet="abcde"):
+    rng = random.Random(0)
+    for _ in range(n):
+        a = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+        b = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+        yield a, b
+
+
+@pytest.mark.parametrize("a,b,expected", [
+    ("", "", 0),
+    ("abc", "", 3),
+    ("", "abc", 3),
+    ("kitten", "sitting", 3),
+    ("今天天气很好", "今天天气真好", 1),
+    (["hello", "world"], ["hello", "there", "world"], 1),
+])
+def test_levenshtein_known_values(a, b, expected):
+    assert levenshtein(a, b) == expected
+
+
+def test_levenshtein_matches_naive_dp():
+    for a, b in _random_pairs(300, 40):
+        assert levenshtein(a, b) == _naive_distance(a, b)
+
+
+def test_levenshtein_long_pattern_beyond_machine_word():
+    rng = random.Random(1)
+    a = "".join(rng.choice("ab") for _ in range(300))
+    b = "".join(rng.choice("ab") for _ in range(250))
+    assert levenshtein(a, b) == _naive_distance(a, b)
+
+
+def test_align_spans_reconstruct_both_sides():
+    for a, b in _random_pairs(200, 120):
+        result = align(a, b)
+        assert result["distance"] == _naive_distance(a, b)
+        assert result["truncated"] is False
+        counts = result["counts"]
+        assert counts["sub"] + counts["ins"] + counts["del"] == result["distance"]
+
+        ref_pos = hyp_pos = 0
+        for span in result["ops"]:
+            assert span["ref_start"] == ref_pos and span["hyp_start"] == hyp_pos
+            ref_part = a[span["ref_start"]:span["ref_end"]]
+            hyp_part = b[span["hyp_start"]:span["hyp_end"]]
+            if span["op"] == "equal":
+                assert ref_part == hyp_part
+            elif span["op"] == "sub":
+                assert len(ref_part) == len(hyp_part)
+            elif span["op"] == "ins":
+                assert ref_part == "" and hyp_part
+            else:
+                assert hyp_part == "" and ref_part
+            ref_pos, hyp_pos = span["ref_end"], span["hyp_end"]
+        assert (ref_pos, hyp_pos) == (len(a), len(b))
+
+
+def test_align_merges_adjacent_ops():
+    result = align("abcdef", "abXYef")
+    assert [s["op"] for s in result["ops"]] == ["equal", "sub", "equal"]
+    assert result["counts"] == {"equal": 4, "sub": 2, "ins": 0, "del": 0}
+
+
+def test_align_over_max_len_returns_distance_only():
+    a, b = "前缀" + "abcdefgh" + "后缀", "前缀" + "hgfedcba" + "后缀"
+    result = align(a, b, max_len=4)
+    assert result == {"distance": levenshtein(a, b), "counts": None, "ops": [], "truncated": True}
+    # 只有公共前后缀之外的部分计入长度限制
+    assert align("x" * 100 + "ab", "x" * 100 + "ba", max_len=4)["truncated"] is False
+
+
+def test_tokenize_words_splits_cjk_per_char_and_drops_punctuation():
+    assert tokenize_words("Hello, World! 你好。It's 2024") == ["hello", "world", "你", "好", "it's", "2024"]
+
+
+def test_normalize_chars_drops_spaces_and_punctuation():
+    assert normalize_chars("Hello, 世界！ A-1") == "hello世界a1"
+
+
+def test_error_rates_mixed_text():
+    rates = error_rates("Hello world 你好", "hello word 你们")
+    assert rates["char_errors"] == 2 and rates["ref_chars"] == 12
+    assert rates["word_errors"] == 2 and rates["ref_words"] == 4
+    assert rates["cer"] == pytest.approx(2 / 12)
+    assert rates["wer"] == pytest.approx(0.5)
+
+
+def test_error_rates_cjk_word_and_char_errors_agree():
+    rates = error_rates("今天天气很好，我们出去玩", "今天天汽很好我们去玩吧")
+    assert rates["word_errors"] == rates["char_errors"] == levenshtein("今天天气很好我们出去玩", "今天天汽很好我们去玩吧")
+
+
+def test_error_rates_empty_reference():
+    assert error_rates("", "")["cer"] == 0.0
+    assert error_rates("", "多余")["cer"] == 1.0
+
+
+def test_error_rates_reuses_raw_distance_only_when_normalization_is_a_no_op():
+    # 原文已是归一化形式：直接使用给定的距离（这里故意给一个可区分的值）
+    rates = error_rates("今天天气很好", "今天天汽很好", raw_distance=7)
+    assert rates["char_errors"] == rates["word_errors"] == 7
+    # 含标点时原文距离与归一化后的距离不同，必须重新计算
+    rates = error_rates("今天，天气很好。", "今天天汽很好", raw_distance=7)
+    assert rates["char_errors"] == 1
+
+
+def test_error_rates_with_align_distance_matches_plain_call():
+    for a, b in _random_pairs(100, 30):
+        assert error_rates(a, b, raw_distance=align(a, b)["distance"]) == error_rates(a, b)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from app.backends import (
+    OnnxBackend, TorchBackend, _token_char_probs, create_backend, ctc_greedy, parse_model_backends,
+)
+
+
+def _logits(frames, vocab=5, peak=5.0):
+    """每帧在指定 token 上取 peak，其余为 0"""
+    logits = np.zeros((len(frames), vocab), dtype=np.float32)
+    for i, (token, value) in enumerate(frames):
+        logits[i, token] = value if value is not None else peak
+    return logits
+
+
+def test_parse_model_backends():
+    assert parse_model_backends("") == {}
+    assert parse_model_backends("base=onnx, personal = torch ,") == {"base": "onnx", "personal": "torch"}
+
+
+@pytest.mark.parametrize("spec", ["base", "base=", "=onnx", "base=onnx,personal"])
+def test_parse_model_backends_rejects_malformed(spec):
+    with pytest.raises(ValueError):
+        parse_model_backends(spec)
+
+
+def test_create_backend():
+    torch_backend = create_backend("torch", device="cpu")
+    assert isinstance(torch_backend, TorchBackend) and torch_backend.device == "cpu"
+    assert isinstance(create_backend("onnx"), OnnxBackend)
+    with pytest.raises(ValueError):
+        create_backend("tensorrt")
+
+
+def test_onnx_backend_weights_file():
+    assert OnnxBackend(quantized=True).weights_file("/m").endswith("model_quant.onnx")
+    assert OnnxBackend(quantized=False).weights_file("/m").endswith("model.onnx")
+
+
+def test_ctc_greedy_collapses_repeats_and_drops_blanks():
+    # 帧序列：1 1 blank 1 2 2 blank -> tokens 1 1 2
+    tokens, probs = ctc_greedy(_logits([(1, None), (1, None), (0, None), (1, None), (2, None), (2, None), (0, None)]))
+    assert tokens == [1, 1, 2]
+    assert len(probs) == 3
+    assert all(0 < p <= 1 for p in probs)
+
+
+def test_ctc_greedy_token_prob_is_max_over_its_frames():
+    tokens, probs = ctc_greedy(_logits([(3, 1.0), (3, 4.0), (3, 2.0)]))
+    assert tokens == [3]
+    expected = np.exp(4.0) / (np.exp(4.0) + 4)
+    assert probs[0] == pytest.approx(expected, rel=1e-5)
+
+
+def test_ctc_greedy_empty_and_all_blank():
+    assert ctc_greedy(np.zeros((0, 5), dtype=np.float32)) == ([], [])
+    assert ctc_greedy(_logits([(0, None)] * 4)) == ([], [])
+
+
+def test_token_char_probs_expands_multi_char_pieces():
+    assert _token_char_probs(["你", " hi"], [0.9, 0.5], 4) == [0.9, 0.5, 0.5, 0.5]
+
+
+def test_token_char_probs_resamples_to_text_length():
+    # 解码后文本比 piece 总长短（如去掉前导空格）时按比例映射
+    assert _token_char_probs([" ab", "c"], [0.2, 0.8], 2) == [0.2, 0.2]
+    assert _token_char_probs([], [], 3) == []
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.batching import BatchScheduler
+from app.single_flight import SingleFlight
+
+
+class FakeRegistry:
+    aliases = {"base": "base_model", "personal": "personal_model"}
+
+    def resolve(self, model_id):
+        return self.aliases.get(model_id, model_id)
+
+
+class FakeService:
+    """按输入顺序返回结果，记录每次 transcribe_batch 的批大小与模型"""
+
+    def __init__(self):
+        self.registry = FakeRegistry()
+        self.inflight = SingleFlight(enabled=False)
+        self.batches = []
+
+    def flight_key(self, audio_path, model_type, content_hash=None):
+        return None
+
+    def _model_name(self, model_type):
+        return self.registry.resolve(model_type)
+
+    def executor_for(self, model_type):
+        return None
+
+    def parallelism(self):
+        return 1
+
+    def transcribe_batch(self, paths, model_type="base", content_hashes=None, use_cache=True):
+        self.batches.append((model_type, list(paths)))
+        return [{"text": path, "model_type": model_type} for path in paths]
+
+
+def test_alias_and_canonical_id_share_one_queue_and_batch():
+    service = FakeService()
+
+    async def run():
+        scheduler = BatchScheduler(service, max_batch_size=8, max_wait_ms=50)
+        results = await asyncio.gather(
+            scheduler.submit("a.wav", "base"),
+            scheduler.submit("b.wav", "base_model"),
+            scheduler.submit("c.wav", "personal"),
+        )
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    assert sorted(service.batches) == [("base_model", ["a.wav", "b.wav"]), ("personal_model", ["c.wav"])]
+    assert set(scheduler.stats()["models"]) == {"base_model", "personal_model"}
+    assert scheduler.stats()["models"]["base_model"]["requests"] == 2
+    # 结果中的 model_type 保持调用方请求的名称
+    assert [(r["text"], r["model_type"]) for r in results] == [
+        ("a.wav", "base"), ("b.wav", "base_model"), ("c.wav", "personal")]
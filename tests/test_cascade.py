@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+from app.cascade import transcribe_cascade
+
+
+class FakeService:
+    """记录每次 transcribe_batch 调用；置信度按模型固定"""
+
+    def __init__(self, audio, confidence):
+        self.audio = audio
+        self.confidence = confidence
+        self.calls = []
+
+    def decode(self, audio_path):
+        return self.audio
+
+    def executor_for(self, model_type):
+        return None
+
+    def transcribe_batch(self, audios, model_type="base", content_hashes=None, use_cache=True):
+        self.calls.append({"model_type": model_type, "count": len(audios), "use_cache": use_cache,
+                           "samples": [len(a) for a in audios]})
+        conf = self.confidence[model_type]
+        return [{"text": model_type, "model_name": model_type,
+                 "sentences": [{"text": model_type, "confidence": conf}]} for _ in audios]
+
+
+def _speech(seconds, amplitude=0.3, sr=16000):
+    t = np.arange(int(seconds * sr)) / sr
+    return (amplitude * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+
+
+def test_segments_bypass_the_result_cache():
+    service = FakeService(_speech(2.0), {"personal": 0.5, "base": 0.9})
+    result = asyncio.run(transcribe_cascade(service, "a.wav", "personal", "base", threshold=0.8))
+    assert service.calls and all(call["use_cache"] is False for call in service.calls)
+    assert [call["model_type"] for call in service.calls] == ["personal", "base"]
+    assert result["cascade"]["escalated"] == result["cascade"]["replaced"] == result["cascade"]["segments"]
+
+
+def test_no_speech_detected_runs_primary_on_whole_buffer():
+    audio = np.zeros(16000 * 3, dtype=np.float32)
+    service = FakeService(audio, {"personal": 0.95, "base": 0.9})
+    result = asyncio.run(transcribe_cascade(service, "a.wav", "personal", "base", threshold=0.8))
+    assert service.calls == [{"model_type": "personal", "count": 1, "use_cache": False, "samples": [len(audio)]}]
+    assert result["text"] == "personal"
+    assert result["segments"][0]["start_ms"] == 0 and result["segments"][0]["end_ms"] == 3000
+
+
+def test_empty_audio_runs_no_model():
+    service = FakeService(np.zeros(0, dtype=np.float32), {"personal": 0.95, "base": 0.9})
+    result = asyncio.run(transcribe_cascade(service, "a.wav", "personal", "base"))
+    assert service.calls == [] and result["text"] == ""
@@ -0,0 +1,69 @@
+import re
+
+import numpy as np
+import pytest
+
+from app.confidence import DEFAULT_CONFIDENCE, align_char_probs, build_sentences_batch, to_prob_array
+
+
+def _split(text):
+    return [s for s in re.split(r"(?<=[。！？])", text) if s]
+
+
+def test_to_prob_array_numeric_list():
+    arr = to_prob_array([0.1, 0.5, 1])
+    assert arr.dtype == np.float64
+    assert arr.tolist() == [0.1, 0.5, 1.0]
+
+
+def test_to_prob_array_empty():
+    assert to_prob_array([]).shape == (0,)
+
+
+def test_to_prob_array_complex_elements():
+    raw = [{"prob": 0.8}, {"score": [0.2, 0.4]}, {"p": {"confidence": 0.6}}, None, "0.5", {"other": 1}]
+    assert to_prob_array(raw).tolist() == pytest.approx([0.8, 0.3, 0.6, 0.0, 0.5, 0.0])
+
+
+def test_align_char_probs_same_length_is_identity():
+    probs = np.array([0.1, 0.2, 0.3])
+    assert align_char_probs(probs, 3, 3) is probs
+
+
+def test_align_char_probs_scales_to_post_processed_text():
+    probs = np.array([0.1, 0.2, 0.3, 0.4])
+    assert align_char_probs(probs, 4, 2).tolist() == [0.1, 0.3]
+    assert align_char_probs(probs, 4, 8).tolist() == [0.1, 0.1, 0.2, 0.2, 0.3, 0.3, 0.4, 0.4]
+
+
+def test_align_char_probs_length_mismatch_falls_back_to_mean_or_default():
+    assert align_char_probs(np.array([0.2, 0.4]), 5, 3).tolist() == pytest.approx([0.3] * 3)
+    assert align_char_probs(np.zeros(0), 5, 2).tolist() == [DEFAULT_CONFIDENCE] * 2
+
+
+def test_build_sentences_batch_sentence_and_word_means():
+    texts = ["好的。再见！", "hi there"]
+    probs = [np.array([1.0, 0.8, 0.6, 0.4, 0.2, 0.0]), np.array([0.9] * 2 + [0.5] + [0.3] * 5)]
+    first, second = build_sentences_batch(texts, probs, _split)
+
+    assert [s["text"] for s in first] == ["好的。", "再见！"]
+    assert first[0]["confidence"] == pytest.approx(0.8)
+    assert first[1]["confidence"] == pytest.approx(0.2)
+    assert first[0]["words"] == [{"text": "好的。", "confidence": pytest.approx(0.8)}]
+
+    assert second[0]["confidence"] == pytest.approx((0.9 * 2 + 0.5 + 0.3 * 5) / 8)
+    assert [w["text"] for w in second[0]["words"]] == ["hi", "there"]
+    assert second[0]["words"][0]["confidence"] == pytest.approx(0.9)
+    assert second[0]["words"][1]["confidence"] == pytest.approx(0.3)
+
+
+def test_build_sentences_batch_probs_shorter_than_text():
+    (sentences,) = build_sentences_batch(["一二。三四。"], [np.array([0.5, 0.7])], _split)
+    assert sentences[0]["confidence"] == pytest.approx(0.6)
+    # 超出概率数组的句子为空区间，置信度为 0
+    assert sentences[1]["confidence"] == 0.0
+
+
+def test_build_sentences_batch_empty():
+    assert build_sentences_batch([], [], _split) == []
+    assert build_sentences_batch([""], [np.zeros(0)], _split) == [[]]
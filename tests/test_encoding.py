@@ -0,0 +1,93 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app import encoding
+from app.encoding import (
+    MSGPACK_MEDIA_TYPE, ResponseOptions, encode_response, negotiate_encoding, parse_options, project,
+)
+
+CONTENT = {
+    "comparison": {
+        "statistics": {"cer": 1.5, "wer": 2.0},
+        "base_model": {"text": "你好", "raw_prob": [0.5, 0.25], "sentences": [{"text": "你好", "words": []}]},
+    },
+    "filename": "a.wav",
+}
+
+
+@pytest.mark.parametrize("header,available,expected", [
+    ("gzip, deflate, br", ["br", "gzip"], "br"),
+    ("gzip, br;q=0.5", ["br", "gzip"], "gzip"),
+    ("br", ["gzip"], None),
+    ("*", ["gzip"], "gzip"),
+    ("gzip;q=0", ["br", "gzip"], None),
+    ("", ["br", "gzip"], None),
+])
+def test_negotiate_encoding(header, available, expected):
+    assert negotiate_encoding(header, available) == expected
+
+
+def test_parse_options_defaults():
+    options = parse_options({}, {})
+    assert options.is_default
+
+
+def test_parse_options_fields_exclude_and_format():
+    options = parse_options({"fields": "comparison.statistics, filename", "exclude": "raw_prob,words"},
+                            {"accept-encoding": "gzip"})
+    assert options.fields == [["comparison", "statistics"], ["filename"]]
+    assert options.exclude == {"raw_prob", "words"}
+    assert options.format == "json"
+    assert options.encoding in ("br", "gzip")
+
+
+def test_parse_options_rejects_unknown_format():
+    with pytest.raises(HTTPException) as exc:
+        parse_options({"format": "xml"}, {})
+    assert exc.value.status_code == 400
+
+
+def test_project_selects_fields():
+    options = ResponseOptions(fields=[["comparison", "statistics"], ["filename"]])
+    assert project(CONTENT, options) == {"comparison": {"statistics": {"cer": 1.5, "wer": 2.0}}, "filename": "a.wav"}
+
+
+def test_project_excludes_at_any_depth_without_mutating_input():
+    projected = project(CONTENT, ResponseOptions(exclude={"raw_prob", "words"}))
+    assert "raw_prob" not in projected["comparison"]["base_model"]
+    assert projected["comparison"]["base_model"]["sentences"] == [{"text": "你好"}]
+    assert "raw_prob" in CONTENT["comparison"]["base_model"]
+
+
+def test_encode_response_default_is_plain_json():
+    response = encode_response(CONTENT, None)
+    assert json.loads(response.body) == CONTENT
+    assert "content-encoding" not in response.headers
+
+
+def test_encode_response_compresses_large_bodies():
+    content = {"text": "字" * 2000}
+    response = encode_response(content, ResponseOptions(encoding="gzip"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == content
+
+
+def test_encode_response_skips_compression_below_threshold():
+    response = encode_response({"ok": True}, ResponseOptions(encoding="gzip"))
+    assert "content-encoding" not in response.headers
+    assert json.loads(response.body) == {"ok": True}
+
+
+@pytest.mark.skipif(encoding.msgpack is None, reason="msgpack not installed")
+def test_encode_response_msgpack_packs_raw_prob_as_float32():
+    response = encode_response(CONTENT, ResponseOptions(format="msgpack"))
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    decoded = encoding.msgpack.unpackb(response.body, raw=False)
+    packed = decoded["comparison"]["base_model"]["raw_prob"]
+    assert np.frombuffer(packed, dtype="<f4").tolist() == [0.5, 0.25]
+    assert decoded["filename"] == "a.wav"
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from app.evaluate import load_completed, run_evaluation
+
+
+def _voice_dir(tmp_path):
+    for name in ("a.wav", "b.wav"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "a.txt").write_text("你好", encoding="utf-8")
+    return tmp_path
+
+
+def _run(voice_dir, models, out_path, calls):
+    async def transcribe(audio_path, model_type):
+        calls.append((audio_path.rsplit("/", 1)[-1], model_type))
+        return {"text": "你好", "sentences": [{"text": "你好", "confidence": 0.9}]}
+
+    async def collect():
+        return [event async for event in run_evaluation(transcribe, str(voice_dir), models, str(out_path),
+                                                         concurrency=1)]
+
+    return asyncio.run(collect())
+
+
+def test_resume_skips_files_completed_with_the_same_models(tmp_path):
+    voice_dir, out_path = _voice_dir(tmp_path), tmp_path / "evaluations" / "run.ndjson"
+    calls = []
+    _run(voice_dir, ["base"], out_path, calls)
+    assert sorted(calls) == [("a.wav", "base"), ("b.wav", "base")]
+
+    calls.clear()
+    events = _run(voice_dir, ["base"], out_path, calls)
+    assert calls == []
+    assert events[0]["skipped"] == 2
+    assert events[-1]["aggregate"]["models"]["base"]["files"] == 2
+
+
+def test_resume_with_new_model_runs_only_the_missing_model(tmp_path):
+    voice_dir, out_path = _voice_dir(tmp_path), tmp_path / "run.ndjson"
+    _run(voice_dir, ["base"], out_path, [])
+
+    calls = []
+    events = _run(voice_dir, ["base", "personal"], out_path, calls)
+    assert sorted(calls) == [("a.wav", "personal"), ("b.wav", "personal")]
+    assert events[0]["skipped"] == 0 and events[0]["partial"] == 2
+    summary = events[-1]["aggregate"]
+    assert summary["files"] == 2
+    assert summary["models"]["base"]["files"] == summary["models"]["personal"]["files"] == 2
+    assert summary["models"]["personal"]["cer"] == 0.0
+
+    # 合并后的记录追加在末尾，之后的续跑以它为准
+    completed = load_completed(str(out_path))
+    assert all(set(r["models"]) == {"base", "personal"} for r in completed.values())
+    lines = [json.loads(line) for line in out_path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 4
+
+    calls.clear()
+    assert _run(voice_dir, ["base", "personal"], out_path, calls)[0]["skipped"] == 2
+    assert calls == []
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+def test_first_caller_leads_and_identical_callers_join():
+    sf = SingleFlight()
+    leader_flight, leader = sf.join("k", "base")
+    follower_flight, follower = sf.join("k", "base")
+    assert leader and not follower
+    assert follower_flight is leader_flight
+    assert sf.stats()["in_flight"] == 1
+
+    other, other_leader = sf.join("other", "base")
+    assert other_leader and other is not leader_flight
+
+
+def test_followers_get_independent_copies():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.join("k")
+    result = {"text": "你好", "sentences": [{"text": "你好"}]}
+    sf.finish(flight, result)
+
+    leader_result = sf.wait_sync(flight, leader=True)
+    follower_result = sf.wait_sync(flight, leader=False)
+    assert follower_result["coalesced"] is True
+    assert "coalesced" not in leader_result
+    follower_result["sentences"].append({"text": "x"})
+    assert leader_result["sentences"] == [{"text": "你好"}]
+
+    stats = sf.stats()
+    assert stats == {"enabled": True, "in_flight": 0, "inferences": 1, "coalesced": 1, "coalesced_ratio": 0.5}
+
+
+def test_sole_leader_gets_result_without_copy():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    result = {"text": "a"}
+    sf.finish(flight, result)
+    assert sf.wait_sync(flight, leader=True) is result
+
+
+def test_finished_flight_is_not_joined_again():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.finish(flight, {"text": "a"})
+    again, leader = sf.join("k")
+    assert leader and again is not flight
+
+
+def test_wait_queued_false_only_joins_started_flights():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    assert sf.join("k", wait_queued=False) == (None, False)
+    sf.start(flight)
+    joined, leader = sf.join("k", wait_queued=False)
+    assert joined is flight and not leader
+
+
+def test_error_propagates_to_waiters():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.join("k")
+    sf.finish(flight, error=RuntimeError("boom"))
+    with pytest.raises(RuntimeError, match="boom"):
+        sf.wait_sync(flight, leader=False)
+
+
+def test_abandon_if_unwaited_only_when_every_caller_left():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.join("k")
+    sf.leave(flight)
+    assert not sf.abandon_if_unwaited(flight)
+    sf.leave(flight)
+    assert sf.abandon_if_unwaited(flight)
+    assert flight.future.cancelled()
+    assert sf.stats()["in_flight"] == 0
+    # 放弃后相同请求成为新的 leader，而不是加入已取消的 flight
+    again, leader = sf.join("k")
+    assert leader and again is not flight
+
+
+def test_abandon_if_unwaited_keeps_finished_flights():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.finish(flight, {"text": "a"})
+    sf.leave(flight)
+    assert not sf.abandon_if_unwaited(flight)
+    assert flight.future.result() == {"text": "a"}
+
+
+def test_follower_timeout_does_not_affect_leader():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.join("k")
+
+    async def follower():
+        await sf.wait(flight, leader=False, timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(follower())
+    assert not flight.future.done()
+
+    threading.Timer(0.01, sf.finish, args=(flight, {"text": "a"})).start()
+    assert sf.wait_sync(flight, leader=True, timeout=5) == {"text": "a"}
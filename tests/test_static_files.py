@@ -0,0 +1,82 @@
+import gzip
+from email.utils import formatdate
+
+import pytest
+from starlette.requests import Request
+
+from app.static_files import IMMUTABLE_CACHE, REVALIDATE_CACHE, StaticAssets, not_modified, parse_range
+
+
+def _request(headers=None, method="GET"):
+    raw = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": method, "path": "/", "headers": raw, "query_string": b""})
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=-", None),
+    # 多区间与其他单位按整个文件返回
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-4", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_not_modified_by_etag():
+    etag = '"abc-10"'
+    assert not_modified(_request({"If-None-Match": etag}), etag, 0)
+    assert not_modified(_request({"If-None-Match": f'"other", W/{etag}'}), etag, 0)
+    assert not_modified(_request({"If-None-Match": "*"}), etag, 0)
+    assert not not_modified(_request({"If-None-Match": '"other"'}), etag, 0)
+
+
+def test_not_modified_etag_takes_precedence_over_date():
+    headers = {"If-None-Match": '"other"', "If-Modified-Since": formatdate(2000, usegmt=True)}
+    assert not not_modified(_request(headers), '"abc"', 1000)
+
+
+def test_not_modified_by_date():
+    assert not_modified(_request({"If-Modified-Since": formatdate(1000, usegmt=True)}), '"abc"', 1000.5)
+    assert not not_modified(_request({"If-Modified-Since": formatdate(999, usegmt=True)}), '"abc"', 1000)
+    assert not not_modified(_request({"If-Modified-Since": "not a date"}), '"abc"', 1000)
+    assert not not_modified(_request(), '"abc"', 1000)
+
+
+def test_static_assets_cache_headers_and_precompressed_variant(tmp_path):
+    (tmp_path / "index.html").write_text("<html></html>")
+    (tmp_path / "assets").mkdir()
+    script = b"console.log('x');" * 100
+    (tmp_path / "assets" / "index-3f2a9c1b.js").write_bytes(script)
+    (tmp_path / "assets" / "index-3f2a9c1b.js.gz").write_bytes(gzip.compress(script))
+    assets = StaticAssets(str(tmp_path))
+    assets.scan()
+
+    page = assets.response(_request(), "index.html")
+    assert page.status_code == 200
+    assert page.headers["cache-control"] == REVALIDATE_CACHE
+    assert page.headers["content-type"] == "text/html; charset=utf-8"
+
+    js = assets.response(_request({"Accept-Encoding": "gzip"}), "assets/index-3f2a9c1b.js")
+    assert js.headers["cache-control"] == IMMUTABLE_CACHE
+    assert js.headers["content-encoding"] == "gzip"
+    # mimetypes 按平台给出 text/javascript 或 application/javascript，charset 只出现一次
+    assert js.headers["content-type"].endswith("javascript; charset=utf-8")
+    assert js.headers["content-type"].count("charset") == 1
+    assert gzip.decompress(js.body) == script
+
+    revalidated = assets.response(_request({"If-None-Match": page.headers["etag"]}), "index.html")
+    assert revalidated.status_code == 304
+    assert assets.response(_request(), "missing.js") is None
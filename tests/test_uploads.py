@@ -0,0 +1,67 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.uploads import UploadLimitMiddleware
+
+MB = 1024 * 1024
+
+
+def _client():
+    app = FastAPI()
+    # 与 app.main 相同的配置方式：普通接口 1 MB，长音频接口 10 MB
+    app.add_middleware(UploadLimitMiddleware, max_bytes=1 * MB,
+                       route_limits=[(r"^/api/transcribe/[^/]+/long$", 10 * MB)])
+
+    @app.post("/api/transcribe/{model_type}")
+    async def transcribe(model_type: str, file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @app.post("/api/transcribe/{model_type}/long")
+    async def transcribe_long(model_type: str, file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return TestClient(app)
+
+
+def _upload(client, path, size):
+    return client.post(path, files={"file": ("a.wav", b"\0" * size, "audio/wav")})
+
+
+def test_limit_for_matches_route_patterns():
+    middleware = UploadLimitMiddleware(None, max_bytes=1 * MB,
+                                       route_limits=[(r"^/api/transcribe/[^/]+/long$", 10 * MB)])
+    assert middleware.limit_for("/api/transcribe/base/long") == 10 * MB
+    assert middleware.limit_for("/api/transcribe/base") == 1 * MB
+    assert middleware.limit_for("/api/compare") == 1 * MB
+
+
+def test_normal_endpoint_rejects_upload_over_global_limit():
+    response = _upload(_client(), "/api/transcribe/base", 3 * MB)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "上传文件超过大小限制 1 MB"
+
+
+def test_long_endpoint_accepts_upload_within_its_own_limit():
+    response = _upload(_client(), "/api/transcribe/base/long", 3 * MB)
+    assert response.status_code == 200
+    assert response.json() == {"size": 3 * MB}
+
+
+def test_long_endpoint_rejects_upload_over_its_own_limit():
+    response = _upload(_client(), "/api/transcribe/base/long", 12 * MB)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "上传文件超过大小限制 10 MB"
+
+
+def test_chunked_upload_without_content_length_is_cut_off():
+    body = b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.wav\"\r\n\r\n" \
+        + b"\0" * (3 * MB) + b"\r\n--x--\r\n"
+
+    def chunks():
+        for i in range(0, len(body), 64 * 1024):
+            yield body[i:i + 64 * 1024]
+
+    client = _client()
+    headers = {"Content-Type": "multipart/form-data; boundary=x"}
+    assert client.post("/api/transcribe/base", content=chunks(), headers=headers).status_code == 413
+    assert client.post("/api/transcribe/base/long", content=chunks(), headers=headers).status_code == 200